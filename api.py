@@ -0,0 +1,238 @@
+#----------------------------------------------------------------------------#
+# JSON API.
+#----------------------------------------------------------------------------#
+
+import json
+from operator import itemgetter
+from flask import current_app, request, Response, abort, url_for
+from datetime import datetime
+from functools import lru_cache
+from sqlalchemy import bindparam
+from sqlalchemy.util import LRUCache
+try:
+  # optional: serialises the /api responses several times faster than json
+  import orjson
+except ImportError:
+  orjson = None
+
+from extensions import db
+from models import Venue, Artist, Show
+from views import (Routes, conditional_response, detail_validators, search_entities,
+                   upcoming_show_counts, genre_names, venue_detail, artist_detail,
+                   shows_page, show_rows, calendar_window, venue_calendar, availability_args,
+                   available_venues)
+
+route = Routes()
+
+#  JSON API
+#  ----------------------------------------------------------------
+# /api/v1 serves the data behind the pages from the same queries. lists are
+# keyset-paginated (?after=, ?limit=), ?fields=a,b trims every object to
+# those fields -- and, for venue/artist lists, the SELECT too -- and bodies
+# are {"data": ..., "next": url or null}.
+
+API_FIELDS = {
+  'venues': ['id', 'name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+             'website_link', 'seeking_talent', 'seeking_description', 'genres',
+             'num_upcoming_shows', 'created_at', 'updated_at'],
+  'artists': ['id', 'name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+              'website_link', 'seeking_venue', 'seeking_description', 'genres',
+              'num_upcoming_shows', 'created_at', 'updated_at'],
+  'shows': ['id', 'start_time', 'end_time', 'venue_id', 'venue_name', 'artist_id', 'artist_name',
+            'artist_image_link'],
+}
+
+# fields that are not columns of the venue/artist table
+API_COMPUTED_FIELDS = ('genres', 'num_upcoming_shows')
+
+# without ?fields= the venue/artist lists and searches leave out the
+# upcoming-show count, a probe of the shows index per row
+API_DEFAULT_FIELDS = dict((kind, [field for field in fields if field != 'num_upcoming_shows'])
+                          for kind, fields in API_FIELDS.items())
+
+def json_default(value):
+  if isinstance(value, datetime):
+      return value.isoformat()
+  raise TypeError('%r is not JSON serializable' % (value,))
+
+def api_response(payload, status=200):
+  if orjson is not None:
+      body = orjson.dumps(payload)
+  else:
+      body = json.dumps(payload, default=json_default, separators=(',', ':'))
+  response = Response(body, status, mimetype='application/json')
+  # the paging links again as a Link header, for clients that walk a list
+  # without reading the bodies
+  links = ['<%s>; rel="%s"' % (payload[rel], rel) for rel in ('prev', 'next') if payload.get(rel)]
+  if links:
+      response.headers['Link'] = ', '.join(links)
+  return response
+
+def api_fields(available, default=None):
+  # the ?fields= selection, in request order; 400 on unknown names
+  if not request.args.get('fields'):
+      return list(default or available)
+  fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+  if not fields or any(field not in available for field in fields):
+      abort(400)
+  return fields
+
+def api_limit():
+  limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int)
+  return max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+
+def api_columns(model, fields):
+  # only the requested columns; id is always selected since paging needs it.
+  # an upcoming-show count comes along as a correlated subquery, a probe of
+  # the (venue_id|artist_id, start_time) index per row, rather than as a
+  # second query with an IN list of the page's ids
+  columns = [getattr(model, field) for field in fields
+             if field not in API_COMPUTED_FIELDS and field != 'id']
+  if 'num_upcoming_shows' in fields:
+      fk_column = Show.venue_id if model is Venue else Show.artist_id
+      # the time is taken when the statement runs, so a cached one stays right
+      now = bindparam('now', callable_=datetime.now, type_=Show.start_time.type)
+      columns.append(db.select([db.func.count(Show.id)])
+                       .where(db.and_(fk_column == model.id, Show.start_time > now))
+                       .as_scalar().label('num_upcoming_shows'))
+  return columns
+
+def api_entity_data(kind, rows, fields):
+  # the objects are built straight from the row tuples, by position. genres
+  # cost one batched query, and only when they were asked for; so do
+  # upcoming-show counts when the rows don't carry them (see api_columns)
+  if not rows:
+      return []
+  keys = list(rows[0].keys())
+  positions = [keys.index(field) if field in keys else None for field in fields]
+  if positions == list(range(len(fields))):
+      return [dict(zip(fields, row)) for row in rows]
+  if None not in positions:
+      values = itemgetter(*positions) if len(positions) > 1 else lambda row: (row[positions[0]],)
+      return [dict(zip(fields, values(row))) for row in rows]
+  ids = [row.id for row in rows]
+  computed = {}
+  if 'genres' in fields:
+      genres = genre_names(kind, ids)
+      computed['genres'] = [genres.get(entity_id, []) for entity_id in ids]
+  if 'num_upcoming_shows' in fields and 'num_upcoming_shows' not in keys:
+      counts = upcoming_show_counts(Show.venue_id if kind == 'venues' else Show.artist_id, ids)
+      computed['num_upcoming_shows'] = [counts.get(entity_id, 0) for entity_id in ids]
+  return [dict((field, row[position] if position is not None else computed[field][number])
+               for field, position in zip(fields, positions))
+          for number, row in enumerate(rows)]
+
+# the list query of each kind, field list and page size is built once, and
+# compiled once per database into API_COMPILED; a request only binds ?after=.
+# (baked, as shows_page() is, saves the building but not the ORM's per-row
+# work, which on a page of a thousand rows is as much again)
+API_COMPILED = LRUCache(512)
+
+@lru_cache(maxsize=256)
+def api_list_statement(kind, fields, limit):
+  model = Venue if kind == 'venues' else Artist
+  return db.session.query(model.id, *api_columns(model, fields)) \
+                   .filter(model.id > bindparam('after'), model.deleted_at.is_(None)) \
+                   .order_by(model.id) \
+                   .limit(limit + 1) \
+                   .statement
+
+@route('/api/v1/<any(venues, artists):kind>')
+def api_entities(kind):
+  # ?after=<id of the last item seen>
+  fields = api_fields(API_FIELDS[kind], API_DEFAULT_FIELDS[kind])
+  limit = api_limit()
+  statement = api_list_statement(kind, tuple(fields), limit)
+  connection = db.session.connection(clause=statement).execution_options(compiled_cache=API_COMPILED)
+  rows = connection.execute(statement, after=request.args.get('after', 0, type=int)).fetchall()
+  next_url = None
+  if len(rows) > limit:
+      rows = rows[:limit]
+      next_url = url_for('api_entities', kind=kind, after=rows[-1].id, limit=limit,
+                         fields=request.args.get('fields'))
+  return api_response({'data': api_entity_data(kind, rows, fields), 'next': next_url})
+
+@route('/api/v1/<any(venues, artists):kind>/search')
+def api_search(kind):
+  # ?q= -- the ranked matches of the search pages, at most SEARCH_RESULT_LIMIT
+  fields = api_fields(API_FIELDS[kind], API_DEFAULT_FIELDS[kind])
+  model = Venue if kind == 'venues' else Artist
+  # name is always part of the ranked query, so it is not asked for twice
+  columns = [column for column in api_columns(model, fields) if column.key != 'name']
+  total, rows = search_entities(model, request.args.get('q', '').strip(), columns)
+  return api_response({'count': total, 'data': api_entity_data(kind, rows, fields)})
+
+@route('/api/v1/venues/available')
+def api_venues_available():
+  # ?city=&state=&from=&to= -- the venues with nothing booked in the window,
+  # paged by id like /api/v1/venues
+  fields = api_fields(API_FIELDS['venues'], API_DEFAULT_FIELDS['venues'])
+  limit = api_limit()
+  city, state, start, end = availability_args()
+  rows = available_venues(api_columns(Venue, fields), city, state, start, end,
+                          request.args.get('after', 0, type=int), limit)
+  next_url = None
+  if len(rows) > limit:
+      rows = rows[:limit]
+      next_url = url_for('api_venues_available', after=rows[-1].id, limit=limit,
+                         fields=request.args.get('fields'),
+                         **dict((name, request.args[name]) for name in ('city', 'state', 'from', 'to')))
+  return api_response({'data': api_entity_data('venues', rows, fields), 'next': next_url})
+
+@route('/api/v1/<any(venues, artists):kind>/<int:entity_id>')
+def api_entity(kind, entity_id):
+  # the venue/artist page as JSON, with the same validators
+  if kind == 'venues':
+      validators = detail_validators(Venue, Show.venue_id, Artist, Show.artist_id, entity_id)
+      detail = venue_detail
+  else:
+      validators = detail_validators(Artist, Show.artist_id, Venue, Show.venue_id, entity_id)
+      detail = artist_detail
+  if validators is None:
+      abort(404)
+
+  def render():
+      data = detail(entity_id)
+      # the pages call it website
+      data['website_link'] = data.pop('website')
+      fields = api_fields(data)
+      return api_response({'data': dict((field, data[field]) for field in fields)})
+  return conditional_response(*validators, render=render)
+
+# keys of the calendar feed, for ?fields=
+CALENDAR_FIELDS = ['id', 'name', 'from', 'to', 'days', 'shows', 'shows_count']
+
+@route('/api/v1/venues/<int:venue_id>/calendar')
+def api_venue_calendar(venue_id):
+  # the calendar page as JSON: ?from=/?to= as there, and ?fields=days (or
+  # anything without shows) skips reading the shows for a month overview
+  fields = api_fields(CALENDAR_FIELDS)
+  start, end = calendar_window()
+  data = venue_calendar(venue_id, start, end, shows='shows' in fields)
+  return api_response({'data': dict((field, data[field]) for field in fields)})
+
+@route('/api/v1/shows')
+def api_shows():
+  # same paging arguments as /shows: ?after=/?before=<cursor>, ?upcoming=1,
+  # ?from=/?to=
+  fields = api_fields(API_FIELDS['shows'])
+  limit = api_limit()
+  rows, filters, prev_cursor, next_cursor = shows_page(limit)
+  filters.update(limit=limit, fields=request.args.get('fields'))
+  return api_response({
+    'data': [dict((field, getattr(row, field)) for field in fields) for row in rows],
+    'prev': prev_cursor and url_for('api_shows', before=prev_cursor, **filters),
+    'next': next_cursor and url_for('api_shows', after=next_cursor, **filters),
+  })
+
+@route('/api/v1/shows/<int:show_id>')
+def api_show(show_id):
+  fields = api_fields(API_FIELDS['shows'])
+  row = show_rows().filter(Show.id == show_id).first()
+  if row is None:
+      abort(404)
+  return api_response({'data': dict((field, getattr(row, field)) for field in fields)})
+
+
+def init_app(app):
+  route.register(app)
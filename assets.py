@@ -0,0 +1,311 @@
+#----------------------------------------------------------------------------#
+# Static assets.
+#
+#   flask assets build [--clean]
+#
+# Copies every file under static/ to static/dist/ with a hash of its content
+# in the name, joins the stylesheets and scripts of layouts/main.html into
+# the BUNDLES (comments and whitespace stripped), and writes
+# static/dist/manifest.json, which maps each original path to its hashed
+# one. Text files get pre-compressed .gz siblings (and .br ones with the
+# brotli package), and the images in RESPONSIVE get resized JPEG/WebP copies
+# for srcset (with Pillow). Old hashed files are kept, since pages rendered
+# before a deploy still point at them; --clean removes them.
+#
+# Templates call asset_url(path), asset_urls(bundle) and
+# asset_srcset(path, format). With a manifest they point at the hashed
+# files, which send_static() serves with a year-long immutable
+# Cache-Control -- their URL changes whenever their content does -- and in
+# the smallest encoding the client accepts. Without one (a checkout where
+# the build hasn't run) they fall back to the plain /static files, one per
+# bundle member. The manifest is read when the app is created: restart
+# after a build.
+#----------------------------------------------------------------------------#
+
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import with_appcontext
+
+# where the build goes, under the static folder
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+
+# bundle name -> members, in load order
+BUNDLES = {
+    'bundle/main.css': ['css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css',
+                        'css/main.responsive.css', 'css/main.quickfix.css'],
+    'bundle/head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'],
+    'bundle/main.js': ['js/script.js', 'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js'],
+}
+
+# image -> srcset widths (px); widths not smaller than the image are skipped
+RESPONSIVE = {
+    'img/front-splash.jpg': (480, 960, 1440),
+}
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+# extensions worth pre-compressing; a variant is only kept if it saves 10%
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.eot', '.ttf', '.otf', '.ico')
+# encoding -> suffix, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CSS_TOKENS = re.compile(r'/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'', re.S)
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+SOURCE_MAP = re.compile(r'^\s*(//|/\*)[#@] sourceMappingURL=.*$', re.M)
+
+
+def fingerprint(path, content):
+    # css/main.css -> dist/css/main.<hash>.css
+    root, ext = posixpath.splitext(path)
+    return '%s/%s.%s%s' % (DIST, root, hashlib.sha256(content).hexdigest()[:12], ext)
+
+
+def _squeeze_css(css):
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}')
+
+
+def minify_css(css):
+    # strips comments (but /*! licences */) and whitespace; strings are
+    # copied as they are
+    out, text, pos = [], [], 0
+    for match in CSS_TOKENS.finditer(css):
+        text.append(css[pos:match.start()])
+        token = match.group(0)
+        if not token.startswith('/*') or token.startswith('/*!'):
+            out.extend([_squeeze_css(''.join(text)), token])
+            text = []
+        pos = match.end()
+    text.append(css[pos:])
+    out.append(_squeeze_css(''.join(text)))
+    return ''.join(out).strip()
+
+
+def minify_js(js):
+    # conservative: drops indentation, blank lines and whole-line comments
+    # only, so no parsing is needed; *.min.js files are left alone
+    lines = []
+    for line in js.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def rewrite_css_urls(css, source, target, files):
+    # url()s in `source` (a path under static/) made to work from a file in
+    # `target`'s directory: to the hashed file when there is one, else to
+    # the original
+    def replace(match):
+        url = match.group(2).strip()
+        if re.match(r'^([a-z]+:|/|#)', url):
+            return match.group(0)
+        path, suffix = re.match(r'^([^?#]*)(.*)$', url).groups()
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+        path = files.get(path, path)
+        return 'url(%s%s)' % (posixpath.relpath(path, posixpath.dirname(target)), suffix)
+    return CSS_URL.sub(replace, css)
+
+
+def build(static_folder, clean=False):
+    # returns (logical path, hashed path, bytes, {encoding: bytes}) per output
+    manifest = {'files': {}, 'srcset': {}, 'encodings': {}}
+    written = []
+
+    def write(path, content):
+        hashed = fingerprint(path, content)
+        destination = os.path.join(static_folder, hashed)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        with open(destination, 'wb') as out:
+            out.write(content)
+        sizes = {}
+        if hashed.endswith(COMPRESSIBLE):
+            for encoding, compressed in compress(content):
+                if len(compressed) < len(content) * 0.9:
+                    with open(destination + dict(ENCODINGS)[encoding], 'wb') as out:
+                        out.write(compressed)
+                    sizes[encoding] = len(compressed)
+            if sizes:
+                manifest['encodings'][hashed] = [encoding for encoding, _ in ENCODINGS if encoding in sizes]
+        written.append((path, hashed, len(content), sizes))
+        return hashed
+
+    sources = []
+    for directory, subdirectories, names in os.walk(static_folder):
+        relative = os.path.relpath(directory, static_folder).replace(os.sep, '/')
+        if relative == DIST or relative.startswith(DIST + '/'):
+            subdirectories[:] = []
+            continue
+        for name in names:
+            if not name.startswith('.'):
+                sources.append(posixpath.normpath(posixpath.join(relative, name)))
+    # stylesheets last: their url()s point at the hashed fonts and images
+    sources.sort(key=lambda path: (path.endswith('.css'), path))
+
+    def read(path):
+        with open(os.path.join(static_folder, path), 'rb') as source:
+            return source.read()
+
+    for path in sources:
+        content = read(path)
+        if path.endswith('.css'):
+            content = rewrite_css_urls(content.decode('utf-8'), path, '%s/%s' % (DIST, path),
+                                       manifest['files']).encode('utf-8')
+        manifest['files'][path] = write(path, content)
+
+    for bundle, members in sorted(BUNDLES.items()):
+        parts = []
+        for member in members:
+            text = SOURCE_MAP.sub('', read(member).decode('utf-8'))
+            if bundle.endswith('.css'):
+                parts.append(rewrite_css_urls(minify_css(text), member,
+                                              '%s/%s' % (DIST, bundle), manifest['files']))
+            else:
+                parts.append(text if member.endswith('.min.js') else minify_js(text))
+        content = ('\n' if bundle.endswith('.css') else '\n;\n').join(parts).encode('utf-8')
+        manifest['files'][bundle] = write(bundle, content)
+
+    for path, widths in sorted(RESPONSIVE.items()):
+        for fmt, width, content in resize(os.path.join(static_folder, path), widths):
+            root, ext = posixpath.splitext(path)
+            variant = '%s-%dw%s' % (root, width, '.webp' if fmt == 'webp' else ext)
+            hashed = manifest['files'][path] if content is None else write(variant, content)
+            manifest['srcset'].setdefault(path, {}).setdefault(fmt, []).append([width, hashed])
+
+    partial = os.path.join(static_folder, DIST, MANIFEST + '.tmp')
+    with open(partial, 'w') as out:
+        json.dump(manifest, out, indent=2, sort_keys=True)
+    os.replace(partial, os.path.join(static_folder, DIST, MANIFEST))
+    if clean:
+        remove_stale(static_folder, set(hashed for _, hashed, _, _ in written))
+    return written
+
+
+def compress(content):
+    yield 'gzip', gzip.compress(content, compresslevel=9, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        return
+    yield 'br', brotli.compress(content, quality=11)
+
+
+def resize(path, widths):
+    # (format, width, bytes) for each srcset variant, the original last with
+    # bytes None; nothing without Pillow
+    try:
+        from PIL import Image, features
+    except ImportError:
+        click.echo('Pillow is not installed; skipping the resized copies of %s' % path)
+        return
+    with Image.open(path) as image:
+        image = image.convert('RGB')
+        formats = [('jpeg', 'JPEG', {'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True})]
+        if features.check('webp'):
+            formats.append(('webp', 'WEBP', {'quality': WEBP_QUALITY, 'method': 6}))
+        for width in widths:
+            if width >= image.width:
+                continue
+            resized = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+            for fmt, pil_format, options in formats:
+                out = io.BytesIO()
+                resized.save(out, pil_format, **options)
+                yield fmt, width, out.getvalue()
+        yield 'jpeg', image.width, None
+
+
+def remove_stale(static_folder, keep):
+    dist = os.path.join(static_folder, DIST)
+    for directory, _, names in os.walk(dist):
+        for name in names:
+            path = os.path.relpath(os.path.join(directory, name), static_folder).replace(os.sep, '/')
+            base = path[:-3] if path.endswith(('.br', '.gz')) else path
+            if base not in keep and name != MANIFEST:
+                os.remove(os.path.join(directory, name))
+
+
+class StaticAssets(object):
+
+    def __init__(self):
+        self.load(None)
+
+    def init_app(self, app):
+        self.max_age = app.config.get('ASSETS_MAX_AGE', 365 * 24 * 3600)
+        self.load(os.path.join(app.static_folder, DIST, MANIFEST))
+        app.view_functions['static'] = self.send_static
+        app.jinja_env.globals.update(asset_url=self.url, asset_urls=self.urls, asset_srcset=self.srcset)
+        app.cli.add_command(assets_command)
+
+    def load(self, path):
+        # no manifest (None, or not built yet) serves the plain files
+        self.manifest = {'files': {}, 'srcset': {}, 'encodings': {}}
+        if path and os.path.exists(path):
+            with open(path) as source:
+                self.manifest = json.load(source)
+        hashed = set(self.manifest['files'].values())
+        for formats in self.manifest['srcset'].values():
+            hashed.update(variant for variants in formats.values() for _, variant in variants)
+        self.immutable = frozenset(hashed)
+
+    # template helpers
+
+    def url(self, path):
+        return url_for('static', filename=self.manifest['files'].get(path, path))
+
+    def urls(self, path):
+        # a built bundle is one file; unbuilt, it is its members
+        if path in BUNDLES and path not in self.manifest['files']:
+            return [self.url(member) for member in BUNDLES[path]]
+        return [self.url(path)]
+
+    def srcset(self, path, format='jpeg'):
+        variants = self.manifest['srcset'].get(path, {}).get(format, [])
+        return ', '.join('%s %dw' % (url_for('static', filename=variant), width) for width, variant in variants)
+
+    # serving
+
+    def send_static(self, filename):
+        if filename not in self.immutable:
+            return current_app.send_static_file(filename)
+        encoding = next((encoding for encoding in self.manifest['encodings'].get(filename, ())
+                         if request.accept_encodings.quality(encoding)), None)
+        sent = filename + dict(ENCODINGS)[encoding] if encoding else filename
+        response = send_from_directory(current_app.static_folder, sent, max_age=self.max_age, etag=True,
+                                       mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                                       download_name=posixpath.basename(filename))
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if filename in self.manifest['encodings']:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+@click.group('assets')
+def assets_command():
+    """Fingerprinted, bundled and pre-compressed static files."""
+
+
+@assets_command.command('build')
+@click.option('--clean', is_flag=True, help='remove hashed files of earlier builds')
+@with_appcontext
+def build_command(clean):
+    """Build static/dist/ and its manifest."""
+    written = build(current_app.static_folder, clean=clean)
+    for path, hashed, size, sizes in written:
+        click.echo('%-50s %9d bytes  %s' % (hashed, size, '  '.join(
+            '%s=%d' % (encoding, sizes[encoding]) for encoding, _ in ENCODINGS if encoding in sizes)))
+    click.echo('%d files written to %s' % (len(written), os.path.join(current_app.static_folder, DIST)))
@@ -0,0 +1,123 @@
+"""Requests per second of the /api/v1 endpoints against the pages they mirror.
+
+Usage:
+    python -m benchmarks.api_bench                       # scratch sqlite, seeded
+    python -m benchmarks.api_bench --database-url postgresql://... --no-seed
+
+Each pair serves the same rows from the same queries, one as HTML and one
+as JSON, through the Flask test client with the page cache off, so the
+ratio is what templating costs over serialising. The listing pages show
+every venue or artist in one response; their API side pages through the
+whole list, and a full walk counts as one request.
+
+Every pair has a target. The venue and artist lists must be at least 2x
+their pages. The shows list is held to 1.4x (it measures 1.6-1.9x): on a
+30-row page the per-request cost of Flask and the shared keyset query is
+most of either side, which puts 2x out of reach. The detail pages and the search, which
+carry the same data either way, must be 1.2x. --min-speedup replaces every
+target. The run fails (exit status 1) when an endpoint misses its target.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from app import app, db, page_cache
+from benchmarks.routes import sample_ids
+from benchmarks.seed import seed, use_database
+
+
+def pairs(venue_id, artist_id):
+    # name -> (html request, api request, target speedup) asking for the same
+    # data; searches are POSTs on the pages. the listing pages show every
+    # venue/artist at once, so their api side is a walk through all the
+    # pages, as large as the API allows (fetch)
+    return [
+        ('venues list', ('GET', '/venues', None),
+         ('WALK', '/api/v1/venues?limit=1000&fields=id,name,city,state,num_upcoming_shows', None), 2.0),
+        ('artists list', ('GET', '/artists', None),
+         ('WALK', '/api/v1/artists?limit=1000&fields=id,name', None), 2.0),
+        ('shows page', ('GET', '/shows', None), ('GET', '/api/v1/shows', None), 1.4),
+        ('venue detail', ('GET', '/venues/%d' % venue_id, None),
+         ('GET', '/api/v1/venues/%d' % venue_id, None), 1.2),
+        ('artist detail', ('GET', '/artists/%d' % artist_id, None),
+         ('GET', '/api/v1/artists/%d' % artist_id, None), 1.2),
+        ('venue search', ('POST', '/venues/search', {'search_term': 'the'}),
+         ('GET', '/api/v1/venues/search?q=the&fields=id,name,num_upcoming_shows', None), 1.2),
+    ]
+
+
+def fetch(client, method, url, data):
+    # one request, or with WALK every page of an api list following its next link
+    if method != 'WALK':
+        response = client.open(url, method=method, data=data)
+        assert response.status_code == 200, (method, url, response.status_code)
+        return
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+        # the Link header, so the walk doesn't pay for decoding the bodies
+        # any more than the page side does
+        url = response.headers.get('Link', '').partition('>; rel="next"')[0].rpartition('<')[2] or None
+
+
+def throughput(client, method, url, data, seconds):
+    fetch(client, method, url, data)  # warm up
+    requests = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        fetch(client, method, url, data)
+        requests += 1
+    return requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    parser.add_argument('--no-seed', action='store_true', help='use the data already there')
+    parser.add_argument('--venues', type=int, default=500)
+    parser.add_argument('--artists', type=int, default=500)
+    parser.add_argument('--shows', type=int, default=5000)
+    parser.add_argument('--seconds', type=float, default=2.0, help='per endpoint')
+    parser.add_argument('--min-speedup', type=float, help='one target for every endpoint')
+    args = parser.parse_args()
+
+    scratch = None
+    if args.database_url:
+        use_database(args.database_url)
+    else:
+        scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        scratch.close()
+        use_database('sqlite:///' + scratch.name)
+    app.config['WTF_CSRF_ENABLED'] = False
+    page_cache.enabled = False
+
+    failures = []
+    try:
+        with app.app_context():
+            if scratch:
+                db.create_all()
+            if not args.no_seed:
+                seed(args.venues, args.artists, args.shows)
+            venue_id, artist_id, _ = sample_ids()
+            client = app.test_client()
+            for name, html, api, target in pairs(venue_id, artist_id):
+                target = args.min_speedup or target
+                html_rate = throughput(client, *html, seconds=args.seconds)
+                api_rate = throughput(client, *api, seconds=args.seconds)
+                print('%-14s html=%8.1f req/s  api=%8.1f req/s  x%.2f (target x%.1f)' % (
+                    name, html_rate, api_rate, api_rate / html_rate, target))
+                if api_rate < html_rate * target:
+                    failures.append((name, target))
+    finally:
+        if scratch:
+            os.unlink(scratch.name)
+
+    for name, target in failures:
+        print('TOO SLOW %s: api under %.1fx the page' % (name, target))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
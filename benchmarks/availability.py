@@ -0,0 +1,155 @@
+"""Latency of the double-booking check and of the venue availability search with 100k venues.
+
+Usage:
+    python -m benchmarks.availability
+    python -m benchmarks.availability --venues 100000 --shows 1000000 --budget 20
+
+A scratch SQLite database is filled by benchmarks.seed. A show is then
+posted to /shows/create at a time the busiest venue already has one, and
+must be turned down. The overlap query behind that check is timed on its
+own too, next to the same query without the lower start_time bound that
+MAX_SHOW_DURATION allows, which has to read the venue's whole history. The
+availability search of the busiest venue's city is asked for a window
+around one of that venue's shows, as a page and through the API. Paging
+through the whole API result must give exactly the live venues of the area
+that a full scan of the shows finds free. The run fails (exit status 1) on a
+wrong answer, or when the p50 of the check or of a search page is over
+--budget ms.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from sqlalchemy import exists, func
+
+from app import app, db, page_cache, Venue, Show
+from benchmarks.search_bench import percentile
+from benchmarks.seed import seed, use_database
+
+
+def timed(action, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        action()
+        samples.append((time.perf_counter() - started) * 1000)
+    return percentile(samples, 50), percentile(samples, 95)
+
+
+def busy_query(venue_id, start, end, bounded):
+    if bounded:
+        overlap = Show.overlapping(Show.venue_id, venue_id, start, end)
+    else:
+        overlap = db.and_(Show.venue_id == venue_id, Show.start_time < end, Show.end_time > start)
+    return db.session.query(exists().where(overlap)).scalar()
+
+
+def free_venues(city, state, start, end):
+    # the answer the search must give, from a full scan of the window's shows
+    busy = set(venue_id for venue_id, in db.session.query(Show.venue_id)
+               .filter(Show.start_time < end, Show.end_time > start))
+    return [venue_id for venue_id, in db.session.query(Venue.id)
+            .filter(Venue.deleted_at.is_(None), Venue.city == city, Venue.state == state)
+            .order_by(Venue.id) if venue_id not in busy]
+
+
+def api_walk(client, path):
+    # every venue id of a paged API result
+    ids = []
+    while path:
+        response = client.get(path)
+        assert response.status_code == 200, (path, response.status_code)
+        body = response.get_json()
+        ids.extend(venue['id'] for venue in body['data'])
+        path = body['next']
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--venues', type=int, default=100000)
+    parser.add_argument('--artists', type=int, default=10000)
+    parser.add_argument('--shows', type=int, default=300000)
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--budget', type=float, default=20.0, help='allowed p50 of every check and page, in ms')
+    args = parser.parse_args()
+
+    scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    scratch.close()
+    use_database('sqlite:///' + scratch.name)
+    page_cache.enabled = False
+    failures = []
+    try:
+        with app.app_context():
+            db.create_all()
+            seed(args.venues, args.artists, args.shows)
+            venue_id, count = db.session.query(Show.venue_id, func.count(Show.id)).group_by(Show.venue_id) \
+                                        .order_by(func.count(Show.id).desc()).first()
+            city, state = db.session.query(Venue.city, Venue.state).filter(Venue.id == venue_id).one()
+            booked = db.session.query(Show).filter(Show.venue_id == venue_id) \
+                                           .order_by(Show.start_time.desc()).first()
+            artist_id, start, end = booked.artist_id, booked.start_time, booked.end_time
+            db.session.close()
+            print('%d venues, %d shows; venue %d in %s, %s has %d' % (
+                args.venues, args.shows, venue_id, city, state, count))
+            client = app.test_client()
+
+            # the double-booking check
+            form = {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': str(start + timedelta(minutes=30))}
+            before = Show.query.count()
+            p50, p95 = timed(lambda: client.post('/shows/create', data=form), args.rounds)
+            if Show.query.count() != before:
+                failures.append('a show overlapping show %d of venue %d was listed' % (booked.id, venue_id))
+            print('%-44s p50=%7.2fms  p95=%7.2fms' % ('POST /shows/create (double-booked)', p50, p95))
+            if p50 > args.budget:
+                failures.append('double-booked POST /shows/create: p50 %.2fms, budget %.2fms' % (p50, args.budget))
+            rng = random.Random(0)
+            times = [start - timedelta(hours=rng.randint(0, 24 * 365 * 3)) for _ in range(args.rounds)]
+            for bounded in (True, False):
+                samples = iter(times * 2)
+
+                def check():
+                    when = next(samples)
+                    busy_query(venue_id, when, when + timedelta(hours=2), bounded)
+                p50, p95 = timed(check, args.rounds)
+                label = 'overlap query' if bounded else 'overlap query, no start_time bound'
+                print('%-44s p50=%7.2fms  p95=%7.2fms' % (label, p50, p95))
+                if bounded and p50 > args.budget:
+                    failures.append('overlap query: p50 %.2fms, budget %.2fms' % (p50, args.budget))
+
+            # the availability search
+            window = {'city': city, 'state': state, 'from': str(start), 'to': str(end)}
+            expected = free_venues(city, state, start, end)
+            found = api_walk(client, '/api/v1/venues/available?' + urlencode(dict(window, limit=100)))
+            if found != expected:
+                failures.append('the search found %d venues, a full scan %d' % (len(found), len(expected)))
+            if venue_id in found:
+                failures.append('venue %d is booked but was found free' % venue_id)
+            print('%d of the venues in %s, %s are free' % (len(expected), city, state))
+            last = expected[-5] if len(expected) > 5 else 0
+            paths = [('/venues/available', window), ('/api/v1/venues/available', window),
+                     ('/api/v1/venues/available', dict(window, after=last))]
+            for path, query in paths:
+                def search():
+                    response = client.get(path, query_string=query)
+                    assert response.status_code == 200, (path, response.status_code)
+                p50, p95 = timed(search, args.rounds)
+                label = path + (' (last page)' if 'after' in query else '')
+                print('%-44s p50=%7.2fms  p95=%7.2fms' % (label, p50, p95))
+                if p50 > args.budget:
+                    failures.append('%s: p50 %.2fms, budget %.2fms' % (label, p50, args.budget))
+    finally:
+        os.unlink(scratch.name)
+
+    for failure in failures:
+        print('REGRESSION ' + failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Latency of the venue calendar for a venue with years of history.
+
+Usage:
+    python -m benchmarks.calendar
+    python -m benchmarks.calendar --years 10 --per-day 4 --shows 500000
+
+A scratch SQLite database is filled by benchmarks.seed (--shows spread over
+the other venues) plus one venue with --per-day shows on every day of the
+last --years years and the next one. The calendar page and its JSON feed are
+then timed for a month in the middle of that history, and the feed's per-day
+counts alone for a whole year, the way a month overview asks for them. The
+run fails (exit status 1) when the p50 of any of them is over --budget ms.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app import app, db, page_cache, Venue, Artist, Show
+from benchmarks.search_bench import percentile
+from benchmarks.seed import seed, use_database
+
+CHUNK_SIZE = 10000
+
+
+def venue_with_history(years, per_day):
+    # a venue with per_day shows a day from `years` ago until a year from now
+    venue = Venue(name='Old Hall', city='Austin', state='TX')
+    db.session.add(venue)
+    db.session.commit()
+    artist_ids = [artist_id for artist_id, in db.session.query(Artist.id)]
+    first = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=365 * years)
+    rows = [{'venue_id': venue.id, 'artist_id': artist_ids[i % len(artist_ids)],
+             'start_time': first + timedelta(hours=24.0 * i / per_day)}
+            for i in range(365 * (years + 1) * per_day)]
+    for offset in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(Show.__table__.insert(), rows[offset:offset + CHUNK_SIZE])
+    db.session.commit()
+    return venue.id, len(rows)
+
+
+def timed(client, path, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        response = client.get(path)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, (path, response.status_code)
+    return percentile(samples, 50), percentile(samples, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--per-day', type=int, default=3)
+    parser.add_argument('--venues', type=int, default=500)
+    parser.add_argument('--artists', type=int, default=500)
+    parser.add_argument('--shows', type=int, default=100000)
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--budget', type=float, default=10.0, help='allowed p50 of every request, in ms')
+    args = parser.parse_args()
+
+    scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    scratch.close()
+    use_database('sqlite:///' + scratch.name)
+    page_cache.enabled = False
+    failures = []
+    try:
+        with app.app_context():
+            db.create_all()
+            seed(args.venues, args.artists, args.shows)
+            venue_id, count = venue_with_history(args.years, args.per_day)
+            print('venue %d with %d shows over %d years' % (venue_id, count, args.years + 1))
+            month = (datetime.now() - timedelta(days=365 * args.years // 2)).strftime('%Y-%m-01')
+            year = '%d-01-01' % datetime.now().year, '%d-01-01' % (datetime.now().year + 1)
+            client = app.test_client()
+            paths = ['/venues/%d/calendar?from=%s' % (venue_id, month),
+                     '/api/v1/venues/%d/calendar?from=%s' % (venue_id, month),
+                     '/api/v1/venues/%d/calendar?from=%s&to=%s&fields=days' % ((venue_id,) + year)]
+            for path in paths:
+                client.get(path)
+                p50, p95 = timed(client, path, args.rounds)
+                print('%-72s p50=%6.2fms  p95=%6.2fms' % (path, p50, p95))
+                if p50 > args.budget:
+                    failures.append('%s: p50 %.2fms, budget %.2fms' % (path, p50, args.budget))
+    finally:
+        os.unlink(scratch.name)
+
+    for failure in failures:
+        print('REGRESSION ' + failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
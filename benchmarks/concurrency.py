@@ -0,0 +1,161 @@
+"""Requests/sec of the read endpoints at 1, 50 and 500 concurrent clients.
+
+Usage:
+    # against a server that is already running
+    python -m benchmarks.concurrency --url http://127.0.0.1:8000
+
+    # start gunicorn (gunicorn.conf.py) with each worker class in turn
+    python -m benchmarks.concurrency --serve sync --serve gevent --workers 2
+
+Every client keeps one HTTP/1.1 keep-alive connection open and sends the
+next request as soon as the previous response is in, cycling through
+--path (the listing, search and detail pages by default), for --duration
+seconds per concurrency level. The server needs data in it: seed it with
+benchmarks.seed first, and set DATABASE_URL for --serve.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+from benchmarks.search_bench import percentile
+
+PATHS = ['/venues', '/artists', '/shows', '/venues/1', '/artists/1',
+         '/api/v1/venues/search?q=the', '/api/v1/artists/search?q=band']
+
+
+async def read_response(reader):
+    # (status, headers, body) of one response; headers['connection'] says
+    # whether the connection can be reused
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    version, status = status_line.split()[:2]
+    status = int(status)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    # HTTP/1.0 servers (e.g. the flask dev server) close unless told otherwise
+    keep_alive = headers.get('connection', '').lower() != 'close' and \
+        (version != b'HTTP/1.0' or headers.get('connection', '').lower() == 'keep-alive')
+    headers['connection'] = 'keep-alive' if keep_alive else 'close'
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        body = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if not size:
+                await reader.readline()
+                break
+            body.append(await reader.readexactly(size))
+            await reader.readline()
+        return status, headers, b''.join(body)
+    if 'content-length' not in headers:
+        return status, headers, await reader.read()
+    return status, headers, await reader.readexactly(int(headers['content-length']))
+
+
+async def client(host, port, paths, deadline, samples, errors):
+    reader = writer = None
+    for path in paths:
+        if time.perf_counter() >= deadline:
+            break
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            started = time.perf_counter()
+            writer.write(('GET %s HTTP/1.1\r\nHost: %s\r\nConnection: keep-alive\r\n\r\n'
+                          % (path, host)).encode('latin-1'))
+            status, headers, _ = await read_response(reader)
+            samples.append((time.perf_counter() - started) * 1000)
+            if status >= 400:
+                errors.append(status)
+            if headers['connection'] == 'close':
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as error:
+            errors.append(type(error).__name__)
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def run_level(host, port, paths, clients, duration):
+    samples, errors = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        client(host, port, itertools.islice(itertools.cycle(paths), number, None), deadline, samples, errors)
+        for number in range(clients)])
+    elapsed = time.perf_counter() - started
+    return {'clients': clients, 'requests': len(samples), 'rps': len(samples) / elapsed,
+            'p50_ms': percentile(samples, 50) if samples else None,
+            'p99_ms': percentile(samples, 99) if samples else None, 'errors': len(errors)}
+
+
+def serve(worker_class, port, workers):
+    env = dict(os.environ, GUNICORN_WORKER_CLASS=worker_class)
+    server = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers),
+                               '--bind', '127.0.0.1:%d' % port, 'app:app'], env=env)
+    for _ in range(100):
+        try:
+            urllib.request.urlopen('http://127.0.0.1:%d/' % port, timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError('gunicorn (%s) did not come up' % worker_class)
+
+
+def bench(url, paths, levels, duration):
+    parsed = urllib.parse.urlparse(url)
+    results = []
+    for clients in levels:
+        result = asyncio.run(run_level(parsed.hostname, parsed.port or 80, paths, clients, duration))
+        print('%4d clients  %8.1f req/s  p50=%8.2fms  p99=%8.2fms  errors=%d' % (
+            clients, result['rps'], result['p50_ms'] or 0, result['p99_ms'] or 0, result['errors']))
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--serve', action='append', default=[], metavar='WORKER_CLASS',
+                        help='start gunicorn with this worker class (sync, gevent); repeatable')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--levels', default='1,50,500', help='comma-separated client counts')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per level')
+    parser.add_argument('--path', action='append', dest='paths', help='default: %s' % ', '.join(PATHS))
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(',')]
+    paths = args.paths or PATHS
+
+    if not args.serve:
+        bench(args.url, paths, levels, args.duration)
+        return 0
+    port = urllib.parse.urlparse(args.url).port or 8000
+    for worker_class in args.serve:
+        print('gunicorn --workers %d -k %s' % (args.workers, worker_class))
+        server = serve(worker_class, port, args.workers)
+        try:
+            bench('http://127.0.0.1:%d' % port, paths, levels, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
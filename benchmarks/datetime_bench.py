@@ -0,0 +1,70 @@
+"""Per-label cost of the `datetime` filter before and after formatting.py.
+
+Usage:
+    python -m benchmarks.datetime_bench
+    python -m benchmarks.datetime_bench --labels 500 --distinct 120
+
+A page of --labels show times drawn from --distinct distinct timestamps
+is formatted --rounds times: with the old filter (babel.dates.format_datetime
+with the raw pattern on every call), with DateFormatter.format per label --
+first with a cold cache, then warm -- and with one format_many() call per
+page.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+
+from formatting import DateFormatter, PATTERNS
+
+
+def old_filter(value, format='medium'):
+    # the filter as it was: pattern string resolved by babel on every call
+    return babel.dates.format_datetime(value, PATTERNS.get(format, format), locale='en')
+
+
+def page_of_times(labels, distinct, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2030, 1, 1, 20, 0)
+    times = [start + timedelta(days=rng.randrange(365), hours=rng.randrange(6)) for _ in range(distinct)]
+    return [rng.choice(times) for _ in range(labels)]
+
+
+def timed(run, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        run()
+    return (time.perf_counter() - started) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--labels', type=int, default=300, help='show times per page')
+    parser.add_argument('--distinct', type=int, default=60, help='distinct timestamps per page')
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    page = page_of_times(args.labels, args.distinct)
+    formatter = DateFormatter()
+    assert [old_filter(value, 'full') for value in page] == formatter.format_many(page, 'full')
+
+    def cold():
+        formatter.clear()
+        [formatter.format(value, 'full') for value in page]
+
+    results = [
+        ('old filter', timed(lambda: [old_filter(value, 'full') for value in page], args.rounds)),
+        ('format, cold cache', timed(cold, args.rounds)),
+        ('format, warm cache', timed(lambda: [formatter.format(value, 'full') for value in page], args.rounds)),
+        ('format_many', timed(lambda: formatter.format_many(page, 'full'), args.rounds)),
+    ]
+    baseline = results[0][1]
+    for name, seconds in results:
+        print('%-20s %8.3fms/page %7.2fus/label  x%.1f' % (
+            name, seconds * 1000, seconds * 1e6 / args.labels, baseline / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Latency of DELETE /venues/<id> against the venue's show count, and what the purge after it costs.
+
+Usage:
+    python -m benchmarks.deletes
+    python -m benchmarks.deletes --shows 10 --shows 1000 --shows 50000 --batch-size 500
+
+For every --shows count a venue with that many shows is created in a
+scratch SQLite database and deleted through the Flask test client, the way
+the venue page's button does it. The request only marks the venue deleted;
+the purger (purger.py) then deletes the shows in batches, run here in the
+foreground so each batch can be timed. For comparison the same number of
+shows is deleted the old way, in a single transaction, whose duration is
+how long those rows stayed locked. The run fails (exit status 1) when the
+request for the largest venue takes more than --tolerance times the one for
+the smallest -- i.e. when it stops being constant time.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app import app, db, page_cache, Venue, Artist, Show
+from benchmarks.seed import use_database
+from extensions import purger
+
+CHUNK_SIZE = 10000
+
+
+def venue_with_shows(count, artist_id):
+    venue = Venue(name='Busy Venue', city='Austin', state='TX')
+    db.session.add(venue)
+    db.session.commit()
+    start = datetime(2020, 1, 1, 20, 0)
+    rows = [{'venue_id': venue.id, 'artist_id': artist_id, 'start_time': start + timedelta(days=i)}
+            for i in range(count)]
+    for offset in range(0, count, CHUNK_SIZE):
+        db.session.execute(Show.__table__.insert(), rows[offset:offset + CHUNK_SIZE])
+    db.session.commit()
+    return venue.id
+
+
+def timed_purge():
+    # (batches, slowest batch ms, total ms) of purging everything left
+    batches, slowest = 0, 0.0
+    started = time.perf_counter()
+    while True:
+        batch_started = time.perf_counter()
+        if not purger.purge_batch():
+            break
+        batches += 1
+        slowest = max(slowest, (time.perf_counter() - batch_started) * 1000)
+    return batches, slowest, (time.perf_counter() - started) * 1000
+
+
+def hard_delete(venue_id):
+    # the old delete_venue with a cascade: one transaction over every row
+    started = time.perf_counter()
+    Show.query.filter_by(venue_id=venue_id).delete(synchronize_session=False)
+    Venue.query.filter_by(id=venue_id).delete(synchronize_session=False)
+    db.session.commit()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', type=int, action='append', help='default: 10 1000 20000')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=3.0,
+                        help='allowed slowdown of the largest delete against the smallest')
+    args = parser.parse_args()
+    counts = sorted(args.shows or [10, 1000, 20000])
+
+    scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    scratch.close()
+    use_database('sqlite:///' + scratch.name)
+    page_cache.enabled = False
+    purger.background = False
+    purger.batch_size = args.batch_size
+    purger.pause = 0
+    requests = {}
+    try:
+        with app.app_context():
+            db.create_all()
+            artist = Artist(name='Busy Artist', city='Austin', state='TX')
+            db.session.add(artist)
+            db.session.commit()
+            artist_id = artist.id  # the request closes the session
+            client = app.test_client()
+            for count in counts:
+                samples, purges = [], []
+                for _ in range(args.rounds):
+                    venue_id = venue_with_shows(count, artist_id)
+                    started = time.perf_counter()
+                    response = client.delete('/venues/%d' % venue_id)
+                    samples.append((time.perf_counter() - started) * 1000)
+                    assert response.status_code == 200, response.status_code
+                    purges.append(timed_purge())
+                    assert not Show.query.filter_by(venue_id=venue_id).count()
+                requests[count] = sorted(samples)[len(samples) // 2]
+                batches, slowest, total = sorted(purges, key=lambda purge: purge[2])[len(purges) // 2]
+                single = hard_delete(venue_with_shows(count, artist_id))
+                print('%6d shows  request=%7.2fms  purge: batches=%4d slowest=%7.2fms total=%8.2fms'
+                      '  single transaction=%8.2fms' % (count, requests[count], batches, slowest, total, single))
+    finally:
+        os.unlink(scratch.name)
+
+    smallest, largest = requests[counts[0]], requests[counts[-1]]
+    if largest > smallest * args.tolerance:
+        print('REGRESSION deleting a venue with %d shows takes %.2fms, with %d shows %.2fms' % (
+            counts[-1], largest, counts[0], smallest))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
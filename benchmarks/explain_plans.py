@@ -0,0 +1,149 @@
+"""Capture query plans and timings with and without the show/venue indexes.
+
+Usage:
+    python -m benchmarks.seed --database-url postgresql://... --venues 10000 --shows 5000000
+    python -m benchmarks.explain_plans --database-url postgresql://... --output plans.json
+
+The indexes from migrations a83f4c21d6e7, c4d8e2f61a93 and f2a6c9e0d4b8 are
+dropped, every query is explained and timed, then the indexes are recreated
+and the run repeated. The venue queries filter on deleted_at IS NULL like the
+pages do, which is what lets the planner use the partial indexes. The venue
+calendar's per-day counts should read the shows from the index alone, and
+the availability search should walk the area's venues in id order off
+ix_venues_live_city_state_id, probing the shows index once per venue.
+Comparing the saved JSON between runs catches plan regressions.
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect, text
+
+from app import app, db, Venue, Show
+from models import MAX_SHOW_DURATION
+from benchmarks.seed import use_database
+
+INDEX_NAMES = ('ix_shows_venue_id_start_time_artist_id', 'ix_shows_artist_id_start_time',
+               'ix_venues_live_city_state_id', 'ix_venues_live_id')
+
+QUERIES = {
+    'venue_upcoming_shows':
+        'SELECT * FROM shows WHERE venue_id = :venue_id AND start_time > :now',
+    'artist_upcoming_shows':
+        'SELECT * FROM shows WHERE artist_id = :artist_id AND start_time > :now',
+    'venue_detail_shows':
+        'SELECT shows.*, artists.name FROM shows JOIN artists ON artists.id = shows.artist_id '
+        'WHERE shows.venue_id = :venue_id',
+    'venue_calendar_days':
+        'SELECT date(shows.start_time), count(shows.id) FROM shows '
+        'JOIN artists ON artists.id = shows.artist_id '
+        'WHERE shows.venue_id = :venue_id AND shows.start_time >= :now AND shows.start_time < :year_later '
+        'AND artists.deleted_at IS NULL GROUP BY date(shows.start_time)',
+    'venues_in_area':
+        'SELECT id, name FROM venues WHERE city = :city AND state = :state AND deleted_at IS NULL',
+    'venues_available':
+        'SELECT id, name FROM venues WHERE city = :city AND state = :state AND deleted_at IS NULL '
+        'AND NOT EXISTS (SELECT 1 FROM shows WHERE shows.venue_id = venues.id '
+        'AND shows.start_time > :overlap_from AND shows.start_time < :window_end AND shows.end_time > :now) '
+        'ORDER BY id LIMIT 51',
+    'venues_page':
+        'SELECT id, name FROM venues WHERE id > :venue_id AND deleted_at IS NULL ORDER BY id LIMIT 30',
+    'upcoming_counts_batch':
+        'SELECT venue_id, count(id) FROM shows WHERE venue_id IN (:venue_id, :venue_id + 1) '
+        'AND start_time > :now GROUP BY venue_id',
+}
+
+
+def managed_indexes():
+    tables = (Show.__table__, Venue.__table__)
+    return [index for table in tables for index in table.indexes if index.name in INDEX_NAMES]
+
+
+def index_exists(index):
+    existing = inspect(db.engine).get_indexes(index.table.name)
+    return any(found['name'] == index.name for found in existing)
+
+
+def explain(sql, params):
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        rows = db.session.execute(text('EXPLAIN (ANALYZE, BUFFERS) ' + sql), params)
+        return [row[0] for row in rows]
+    if dialect == 'sqlite':
+        rows = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql), params)
+        return [row[-1] for row in rows]
+    rows = db.session.execute(text('EXPLAIN ' + sql), params)
+    return [' '.join(str(col) for col in row) for row in rows]
+
+
+def timed(sql, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        db.session.execute(text(sql), params).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return min(samples), sorted(samples)[len(samples) // 2]
+
+
+def capture(params, repeat):
+    result = {}
+    for name, sql in QUERIES.items():
+        best, median = timed(sql, params, repeat)
+        result[name] = {'plan': explain(sql, params), 'best_ms': best, 'median_ms': median}
+    return result
+
+
+def sample_params():
+    # a busy venue/artist, so the comparison reflects the pages that hurt
+    venue_id = db.session.execute(text(
+        'SELECT venue_id FROM shows GROUP BY venue_id ORDER BY count(*) DESC LIMIT 1')).scalar()
+    artist_id = db.session.execute(text(
+        'SELECT artist_id FROM shows GROUP BY artist_id ORDER BY count(*) DESC LIMIT 1')).scalar()
+    venue = db.session.query(Venue).get(venue_id)
+    now = datetime.now()
+    return {'venue_id': venue_id, 'artist_id': artist_id, 'now': now, 'year_later': now + timedelta(days=365),
+            'city': venue.city, 'state': venue.state,
+            'overlap_from': now - MAX_SHOW_DURATION, 'window_end': now + timedelta(hours=3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='write the before/after report as JSON')
+    args = parser.parse_args()
+    use_database(args.database_url)
+
+    with app.app_context():
+        params = sample_params()
+        indexes = managed_indexes()
+        db.session.commit()
+        for index in indexes:
+            if index_exists(index):
+                index.drop(db.engine)
+        before = capture(params, args.repeat)
+        db.session.commit()
+        for index in indexes:
+            if not index_exists(index):
+                index.create(db.engine)
+        db.session.execute(text('ANALYZE'))
+        after = capture(params, args.repeat)
+        db.session.commit()
+
+    for name in QUERIES:
+        print('%-24s before %9.2fms  after %9.2fms' % (
+            name, before[name]['median_ms'], after[name]['median_ms']))
+        for label, report in (('before', before), ('after', after)):
+            print('  %s:' % label)
+            for line in report[name]['plan']:
+                print('    ' + line)
+    if args.output:
+        for name in ('now', 'year_later', 'overlap_from', 'window_end'):
+            params[name] = params[name].isoformat()
+        with open(args.output, 'w') as out:
+            json.dump({'params': params, 'before': before, 'after': after}, out, indent=2)
+
+
+if __name__ == '__main__':
+    main()
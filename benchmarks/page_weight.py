@@ -0,0 +1,131 @@
+"""Bytes and requests of a first and a repeat page visit, with and without `flask assets build`.
+
+Usage:
+    python -m benchmarks.page_weight
+    python -m benchmarks.page_weight --path / --path /shows --width 1110
+
+Every page is fetched the way a browser would on a first visit: the HTML,
+then each stylesheet, script and image it links to under /static, with
+`Accept-Encoding: gzip, deflate, br` and, for a srcset, the candidate a
+--width px slot needs. The repeat visit sends no request for assets whose
+Cache-Control allows reuse and a conditional request for the rest. This
+runs once on the plain /static files and once on a build of a copy of
+static/ (the checkout's own static/dist/ is not touched). The run fails
+(exit status 1) when the built repeat visit still requests any asset.
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+from app import app, db, page_cache
+from assets import DIST, MANIFEST, build
+from benchmarks.seed import use_database
+from extensions import assets
+
+ACCEPT_ENCODING = 'gzip, deflate, br'
+ASSET = re.compile(r'<(?:link|script|img|source)\b[^>]*>')
+URL = re.compile(r'\b(srcset|href|src)="([^"]+)"')
+# the IE-only scripts and the jQuery CDN fallback are not loaded by browsers in use
+SKIPPED = re.compile(r'<!--\[if.*?<!\[endif\]-->|document\.write\(.*?\)', re.S)
+
+
+def pick(srcset, width):
+    # the first candidate at least `width` wide, else the widest
+    candidates = sorted((int(size[:-1]), url) for url, size in
+                        (candidate.split() for candidate in srcset.split(',')))
+    return next((url for size, url in candidates if size >= width), candidates[-1][1])
+
+
+def asset_urls(html, width):
+    # one URL per <link>/<script>/<img>, the webp <source> winning over its <img>
+    urls, source = [], False
+    for match in ASSET.finditer(SKIPPED.sub('', html)):
+        tag = match.group(0)
+        attributes = dict(URL.findall(tag))
+        if 'srcset' in attributes:
+            url = pick(attributes['srcset'], width)
+        else:
+            url = attributes.get('href') or attributes.get('src')
+        if url and not (source and tag.startswith('<img')):
+            urls.append(url)
+        source = tag.startswith('<source')
+    return [url for url in urls if url.startswith('/static/')]
+
+
+def visit(client, path, width):
+    first = {'html': 0, 'assets': 0, 'requests': 1}
+    repeat = {'assets': 0, 'requests': 0}
+    html = client.get(path, headers={'Accept-Encoding': ACCEPT_ENCODING})
+    first['html'] = len(html.data)
+    for url in asset_urls(html.get_data(as_text=True), width):
+        response = client.get(url, headers={'Accept-Encoding': ACCEPT_ENCODING})
+        first['requests'] += 1
+        if response.status_code != 200:
+            continue
+        first['assets'] += len(response.data)
+        if response.cache_control.max_age:
+            continue  # fresh in the browser cache: no request at all
+        headers = {'Accept-Encoding': ACCEPT_ENCODING}
+        if response.headers.get('ETag'):
+            headers['If-None-Match'] = response.headers['ETag']
+        if response.headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = response.headers['Last-Modified']
+        revalidated = client.get(url, headers=headers)
+        repeat['requests'] += 1
+        repeat['assets'] += len(revalidated.data)
+    return first, repeat
+
+
+def report(label, client, paths, width):
+    requested = 0
+    for path in paths:
+        first, repeat = visit(client, path, width)
+        print('%-7s %-10s first: html=%7d assets=%9d requests=%3d   repeat: assets=%9d requests=%3d' % (
+            label, path, first['html'], first['assets'], first['requests'],
+            repeat['assets'], repeat['requests']))
+        requested += repeat['requests']
+    return requested
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', action='append', dest='paths', help='default: / /venues /shows')
+    parser.add_argument('--width', type=int, default=555, help='px the splash image is shown at')
+    args = parser.parse_args()
+    paths = args.paths or ['/', '/venues', '/shows']
+
+    scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    scratch.close()
+    use_database('sqlite:///' + scratch.name)
+    page_cache.enabled = False
+    static = tempfile.mkdtemp()
+    static_folder = app.static_folder
+    try:
+        with app.app_context():
+            db.create_all()
+            client = app.test_client()
+            assets.load(None)
+            report('plain', client, paths, args.width)
+
+            shutil.rmtree(static)
+            shutil.copytree(static_folder, static, ignore=lambda directory, names:
+                            [DIST] if os.path.samefile(directory, static_folder) else [])
+            build(static)
+            app.static_folder = static
+            assets.load(os.path.join(static, DIST, MANIFEST))
+            requested = report('built', client, paths, args.width)
+    finally:
+        app.static_folder = static_folder
+        shutil.rmtree(static, ignore_errors=True)
+        os.unlink(scratch.name)
+    if requested:
+        print('REGRESSION the repeat visit still requests %d built assets' % requested)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""Partition pruning of the upcoming-show queries on the partitioned shows table.
+
+Usage:
+    DATABASE_URL=postgresql://... flask db upgrade
+    python -m benchmarks.seed --database-url postgresql://... --venues 10000 --artists 10000 --shows 10000000
+    python -m benchmarks.partitions --database-url postgresql://... --compare
+
+PostgreSQL only, after migration b5e9d3a7c1f4. Seeded shows that landed in
+shows_default are first moved into monthly partitions, as
+`flask partitions create` would. The queries the pages run for upcoming
+shows are then built with the ORM, the same way views.py builds them. Each is
+run under EXPLAIN ANALYZE, which shows the partitions it read. The hot
+partitions are shows_default and the months that have not ended yet. With
+--compare the shows are copied into an unpartitioned table with the same
+indexes, and every query is timed on both. The run fails (exit status 1)
+when an upcoming-show query reads a partition outside the hot ones. A venue
+page's whole history is shown for contrast, without being checked.
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import func, and_
+
+from app import app, db, Venue, Show
+from benchmarks.search_bench import percentile
+from benchmarks.seed import use_database
+from partitions import DEFAULT_PARTITION, create_partitions, is_partitioned, partitions
+from views import show_rows
+
+FLAT_TABLE = 'shows_flat'
+FLAT_INDEXES = [('venue_id', 'start_time', 'artist_id'), ('artist_id', 'start_time'),
+                ('updated_at', 'id'), ('start_time', 'id')]
+
+
+def queries(now):
+    # name -> (ORM query, whether it must stay on the hot partitions)
+    venue_id, = db.session.query(Show.venue_id).filter(Show.start_time > now) \
+                          .group_by(Show.venue_id).order_by(func.count(Show.id).desc()).first()
+    venue_ids = [venue_id for venue_id, in db.session.query(Venue.id).order_by(Venue.id).limit(50)]
+    next_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0) + relativedelta(months=1)
+    return {
+        # /venues
+        'venues_upcoming_counts': (db.session.query(Venue.id, func.count(Show.id))
+                                   .outerjoin(Show, and_(Show.venue_id == Venue.id, Show.start_time > now))
+                                   .filter(Venue.deleted_at.is_(None))
+                                   .group_by(Venue.id), True),
+        # search results, /api/v1/venues
+        'upcoming_show_counts': (db.session.query(Show.venue_id, func.count(Show.id))
+                                 .filter(Show.venue_id.in_(venue_ids), Show.start_time > now)
+                                 .group_by(Show.venue_id), True),
+        # /shows?upcoming=1
+        'shows_upcoming_page': (show_rows().filter(Show.start_time > now)
+                                .order_by(Show.start_time, Show.id).limit(30), True),
+        # /venues/<id>/calendar?from=<next month>
+        'venue_calendar_next_month': (db.session.query(func.date(Show.start_time), func.count(Show.id))
+                                      .filter(Show.venue_id == venue_id, Show.start_time >= next_month,
+                                              Show.start_time < next_month + relativedelta(months=1))
+                                      .group_by(func.date(Show.start_time)), True),
+        # /venues/<id>: every past and upcoming show
+        'venue_detail_history': (db.session.query(Show.id, Show.start_time)
+                                 .filter(Show.venue_id == venue_id), False),
+    }
+
+
+def compiled(query):
+    # SQL text and parameters; psycopg2 inlines the parameters, so the
+    # planner sees start_time's bounds and prunes while planning
+    statement = query.statement.compile(dialect=db.engine.dialect)
+    return str(statement), statement.params
+
+
+def scanned_relations(plan):
+    # the tables the plan read; nodes pruned while executing ran 0 times
+    found = set()
+    if 'Relation Name' in plan and plan.get('Actual Loops', 1) > 0:
+        found.add(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        found |= scanned_relations(child)
+    return found
+
+
+def explain(sql, params):
+    connection = db.session.connection()
+    plan = connection.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return scanned_relations(plan[0]['Plan'])
+
+
+def timed(sql, params, rounds):
+    connection = db.session.connection()
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        connection.execute(sql, params).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return percentile(samples, 50)
+
+
+def create_flat_copy():
+    db.session.execute('DROP TABLE IF EXISTS %s' % FLAT_TABLE)
+    db.session.execute('CREATE TABLE %s AS TABLE shows' % FLAT_TABLE)
+    for columns in FLAT_INDEXES:
+        db.session.execute('CREATE INDEX ON %s (%s)' % (FLAT_TABLE, ', '.join(columns)))
+    db.session.execute('ANALYZE %s' % FLAT_TABLE)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--compare', action='store_true',
+                        help='also time the queries on an unpartitioned copy of shows')
+    parser.add_argument('--keep-copy', action='store_true', help='leave the unpartitioned copy behind')
+    args = parser.parse_args()
+    use_database(args.database_url)
+
+    failures = []
+    with app.app_context():
+        if not is_partitioned(db):
+            parser.error('needs a PostgreSQL database with partitioned shows (flask db upgrade)')
+        for name, moved in create_partitions(db, app.config['SHOWS_PARTITIONS_AHEAD']):
+            print('%s created, %d shows moved from %s' % (name, moved, DEFAULT_PARTITION))
+        db.session.execute('ANALYZE shows')
+        now = datetime.now()
+        attached = partitions(db)
+        hot = set(name for month, name, _ in attached if month + relativedelta(months=1) > now)
+        hot.add(DEFAULT_PARTITION)
+        total = db.session.query(func.count(Show.id)).scalar()
+        print('%d shows in %d partitions, %d of them hot' % (total, len(attached) + 1, len(hot)))
+        if args.compare:
+            create_flat_copy()
+        try:
+            for name, (query, hot_only) in queries(now).items():
+                sql, params = compiled(query)
+                scanned = set(relation for relation in explain(sql, params)
+                              if relation == DEFAULT_PARTITION or relation.startswith('shows_p'))
+                line = '%-28s partitions read=%3d  p50=%8.2fms' % (name, len(scanned), timed(sql, params, args.rounds))
+                if args.compare:
+                    flat_sql = re.sub(r'\bshows\b', FLAT_TABLE, sql)
+                    line += '  unpartitioned p50=%8.2fms' % timed(flat_sql, params, args.rounds)
+                print(line)
+                cold = scanned - hot
+                if hot_only and cold:
+                    failures.append('%s reads %d cold partitions (%s)' % (name, len(cold), ', '.join(sorted(cold))))
+        finally:
+            db.session.rollback()
+            if args.compare and not args.keep_copy:
+                db.session.execute('DROP TABLE IF EXISTS %s' % FLAT_TABLE)
+                db.session.commit()
+
+    for failure in failures:
+        print('REGRESSION ' + failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""Latency percentiles and SQL query counts for every route of the app.
+
+Usage:
+    python -m benchmarks.routes                      # scratch sqlite, compare to baseline
+    python -m benchmarks.routes --update-baseline    # record new baseline numbers
+    python -m benchmarks.routes --database-url postgresql://... --no-seed
+
+Every request goes through the Flask test client with the page cache off,
+so the numbers are the real controller + database + template cost. By
+default a scratch SQLite database is created and filled by benchmarks.seed.
+The run fails (exit status 1) when a route issues more SQL statements than
+its baseline -- which is how an N+1 shows up -- or when its p95 latency
+grows past --tolerance times the baseline.
+
+Write routes (create/edit/delete) are exercised too; point --database-url
+only at a database you are happy to have rows added to.
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode
+
+from sqlalchemy import event, func
+
+from app import app, db, page_cache, Venue, Artist, Show, Genre
+from benchmarks.seed import seed, use_database
+from benchmarks.search_bench import percentile
+from extensions import purger, thumbnails
+from thumbnails import DiskCache
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+VENUE_FORM = {'name': 'Bench Venue', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+              'phone': '555-555-0000', 'image_link': '', 'facebook_link': 'https://facebook.com/x',
+              'website_link': '', 'seeking_description': '', 'genres': ['Jazz', 'Blues']}
+ARTIST_FORM = dict(VENUE_FORM, name='Bench Artist')
+del ARTIST_FORM['address']
+
+
+def sample_ids():
+    # the busiest venue/artist: their pages are the ones an N+1 hurts most
+    venue_id = db.session.query(Show.venue_id).group_by(Show.venue_id) \
+                         .order_by(func.count(Show.id).desc()).limit(1).scalar()
+    artist_id = db.session.query(Show.artist_id).group_by(Show.artist_id) \
+                          .order_by(func.count(Show.id).desc()).limit(1).scalar()
+    genre = db.session.query(Genre.name).order_by(Genre.id).limit(1).scalar()
+    return venue_id, artist_id, genre
+
+
+def throwaway_venue():
+    venue = Venue(name='Delete Me', city='Austin', state='TX')
+    db.session.add(venue)
+    db.session.commit()
+    return venue.id
+
+
+def throwaway_artist():
+    artist = Artist(name='Delete Me', city='Austin', state='TX')
+    db.session.add(artist)
+    db.session.commit()
+    return artist.id
+
+
+def thumbnail_url():
+    # a thumbnail of a local image, so no request leaves the machine; the
+    # first (warm-up) request resizes it, the measured ones are cache hits
+    src = 'file://' + os.path.join(app.static_folder, 'img', 'front-splash.jpg')
+    with app.test_request_context():
+        return thumbnails.url(src, 'tile', 'webp')
+
+
+def scenarios(venue_id, artist_id, genre):
+    # endpoint -> (method, url or callable returning url, form data or callable returning it)
+    # a new day every round, so the show is never turned down as a double booking
+    days = itertools.count()
+    show_form = lambda: {'artist_id': artist_id, 'venue_id': venue_id,
+                         'start_time': str(datetime(2030, 1, 1, 20) + timedelta(days=next(days)))}
+    city, state = db.session.query(Venue.city, Venue.state).filter(Venue.id == venue_id).one()
+    friday = date.today() + timedelta(days=(4 - date.today().weekday()) % 7)
+    window = urlencode({'city': city, 'state': state, 'from': '%s 20:00' % friday, 'to': '%s 23:00' % friday})
+    plan = {
+        'index': ('GET', '/', None),
+        'venues': ('GET', '/venues', None),
+        'search_venues': ('POST', '/venues/search', {'search_term': 'the'}),
+        'show_venue': ('GET', '/venues/%d' % venue_id, None),
+        'venue_calendar_page': ('GET', '/venues/%d/calendar' % venue_id, None),
+        'venues_available': ('GET', '/venues/available?' + window, None),
+        'create_venue_form': ('GET', '/venues/create', None),
+        'create_venue_submission': ('POST', '/venues/create', VENUE_FORM),
+        'delete_venue': ('DELETE', lambda: '/venues/%d' % throwaway_venue(), None),
+        'delete_artist': ('DELETE', lambda: '/artists/%d' % throwaway_artist(), None),
+        'artists': ('GET', '/artists', None),
+        'search_artists': ('POST', '/artists/search', {'search_term': 'band'}),
+        'show_artist': ('GET', '/artists/%d' % artist_id, None),
+        'edit_artist': ('GET', '/artists/%d/edit' % artist_id, None),
+        'edit_artist_submission': ('POST', '/artists/%d/edit' % artist_id, ARTIST_FORM),
+        'edit_venue': ('GET', '/venues/%d/edit' % venue_id, None),
+        'edit_venue_submission': ('POST', '/venues/%d/edit' % venue_id, VENUE_FORM),
+        'create_artist_form': ('GET', '/artists/create', None),
+        'create_artist_submission': ('POST', '/artists/create', ARTIST_FORM),
+        'show_genre': ('GET', '/genres/%s' % genre, None),
+        'shows': ('GET', '/shows', None),
+        'create_shows': ('GET', '/shows/create', None),
+        'create_show_submission': ('POST', '/shows/create', show_form),
+        'cache_stats': ('GET', '/_cache/stats', None),
+        'metrics': ('GET', '/_metrics', None),
+        'export': ('GET', '/export/shows', None),
+        'api_entities': ('GET', '/api/v1/venues', None),
+        'api_search': ('GET', '/api/v1/artists/search?q=band', None),
+        'api_entity': ('GET', '/api/v1/venues/%d' % venue_id, None),
+        'api_venue_calendar': ('GET', '/api/v1/venues/%d/calendar' % venue_id, None),
+        'api_venues_available': ('GET', '/api/v1/venues/available?' + window, None),
+        'api_shows': ('GET', '/api/v1/shows', None),
+        'api_show': ('GET', '/api/v1/shows/1', None),
+        'static': ('GET', '/static/css/main.css', None),
+    }
+    if thumbnails.enabled:
+        plan['thumbnail'] = ('GET', thumbnail_url(), None)
+    return plan
+
+
+class QueryCounter(object):
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args, **kwargs):
+        self.count += 1
+
+
+def measure(client, counter, method, url, data, rounds):
+    samples = []
+    queries = 0
+    for _ in range(rounds):
+        target = url() if callable(url) else url
+        counter.count = 0
+        started = time.perf_counter()
+        response = client.open(target, method=method, data=data() if callable(data) else data)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code < 400, (method, target, response.status_code)
+        assert b'An error occurred' not in response.data, (method, target)
+        queries = max(queries, counter.count)
+        # the flashes left by write routes would otherwise pile up in the session
+        with client.session_transaction() as session:
+            session.pop('_flashes', None)
+    return {'p50_ms': round(percentile(samples, 50), 2), 'p95_ms': round(percentile(samples, 95), 2),
+            'p99_ms': round(percentile(samples, 99), 2), 'queries': queries}
+
+
+def compare(results, baseline, tolerance):
+    failures = []
+    for endpoint, result in sorted(results.items()):
+        expected = baseline.get(endpoint)
+        if expected is None:
+            continue
+        if result['queries'] > expected['queries']:
+            failures.append('%s: %d queries, baseline %d' % (
+                endpoint, result['queries'], expected['queries']))
+        if result['p95_ms'] > expected['p95_ms'] * tolerance:
+            failures.append('%s: p95 %.2fms, baseline %.2fms' % (
+                endpoint, result['p95_ms'], expected['p95_ms']))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    parser.add_argument('--no-seed', action='store_true', help='use the data already there')
+    parser.add_argument('--venues', type=int, default=500)
+    parser.add_argument('--artists', type=int, default=500)
+    parser.add_argument('--shows', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--tolerance', type=float, default=2.0,
+                        help='allowed p95 slowdown against the baseline')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    scratch = None
+    if args.database_url:
+        use_database(args.database_url)
+    else:
+        scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        scratch.close()
+        use_database('sqlite:///' + scratch.name)
+    app.config['WTF_CSRF_ENABLED'] = False
+    page_cache.enabled = False
+    # the delete routes are timed alone, without the purge they start
+    purger.background = False
+    thumbnail_dir = tempfile.mkdtemp()
+    thumbnails.cache = DiskCache(thumbnail_dir, thumbnails.cache.max_bytes)
+    thumbnails.schemes += ('file',)
+
+    try:
+        with app.app_context():
+            if scratch:
+                db.create_all()
+            if not args.no_seed:
+                seed(args.venues, args.artists, args.shows)
+            plan = scenarios(*sample_ids())
+            counter = QueryCounter(db.engine)
+            client = app.test_client()
+
+            missing = set(rule.endpoint for rule in app.url_map.iter_rules()) - set(plan)
+            if missing:
+                print('no benchmark scenario for: %s' % ', '.join(sorted(missing)))
+                return 1
+
+            results = {}
+            for endpoint, (method, url, data) in sorted(plan.items()):
+                measure(client, counter, method, url, data, 1)  # warm up
+                results[endpoint] = measure(client, counter, method, url, data, args.rounds)
+                print('%-26s %-6s p50=%8.2fms p95=%8.2fms p99=%8.2fms queries=%d' % (
+                    endpoint, method, results[endpoint]['p50_ms'], results[endpoint]['p95_ms'],
+                    results[endpoint]['p99_ms'], results[endpoint]['queries']))
+    finally:
+        shutil.rmtree(thumbnail_dir, ignore_errors=True)
+        if scratch:
+            os.unlink(scratch.name)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as out:
+            json.dump(results, out, indent=2, sort_keys=True)
+        print('baseline written to %s' % args.baseline)
+        return 0
+    if not os.path.exists(args.baseline):
+        print('no baseline at %s; run with --update-baseline' % args.baseline)
+        return 0
+    with open(args.baseline) as baseline:
+        failures = compare(results, json.load(baseline), args.tolerance)
+    for failure in failures:
+        print('REGRESSION ' + failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""Latency percentiles for /venues/search and /artists/search.
+
+Usage:
+    python -m benchmarks.seed --database-url postgresql://... --venues 1000000 --artists 1000000
+    python -m benchmarks.search_bench --database-url postgresql://...
+
+Each term is POSTed through the Flask test client, so the numbers include
+the query, the batched upcoming-show count and template rendering.
+"""
+import argparse
+import time
+
+from app import app
+from benchmarks.seed import use_database
+
+TERMS = ['hop', 'Music', 'the', 'jazz', 'san francisco', 'Band 42', 'zzzz']
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(client, url, rounds):
+    samples = []
+    for _ in range(rounds):
+        for term in TERMS:
+            started = time.perf_counter()
+            response = client.post(url, data={'search_term': term})
+            samples.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.status_code
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+    use_database(args.database_url)
+    app.config['WTF_CSRF_ENABLED'] = False
+    client = app.test_client()
+    for url in ('/venues/search', '/artists/search'):
+        run(client, url, 1)  # warm up
+        samples = run(client, url, args.rounds)
+        print('%-16s n=%-5d p50=%7.2fms p95=%7.2fms p99=%7.2fms' % (
+            url, len(samples), percentile(samples, 50), percentile(samples, 95),
+            percentile(samples, 99)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""Bulk-load synthetic venues, artists and shows for benchmarking.
+
+Usage:
+    python -m benchmarks.seed --database-url postgresql://... --venues 1000000
+
+Rows are inserted through Core executemany in chunks, so a million rows
+load in minutes rather than hours through the ORM. The data is deterministic
+for a given --seed and skewed the way real traffic is: a few big cities hold
+most venues and artists, show counts per venue/artist follow a Zipf-like
+curve, and most shows are in the past. A venue's shows never overlap.
+"""
+import argparse
+import itertools
+import math
+import random
+from datetime import datetime, timedelta
+
+from app import app, db, Venue, Artist, Show, Genre, venue_genres, artist_genres
+
+CHUNK_SIZE = 10000
+
+CITIES = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'),
+          ('Seattle', 'WA'), ('Chicago', 'IL'), ('Nashville', 'TN'),
+          ('Denver', 'CO'), ('Portland', 'OR'), ('Boston', 'MA'), ('Atlanta', 'GA')]
+CITY_WEIGHTS = list(itertools.accumulate(1.0 / rank for rank in range(1, len(CITIES) + 1)))
+# exponent of the popularity curve used to pick the venue/artist of a show
+ZIPF_EXPONENT = 1.1
+# shows start on the hour, from three years back to six months ahead
+SHOW_HOURS_PAST = 24 * 365 * 3
+SHOW_HOURS = SHOW_HOURS_PAST + 24 * 180
+SHOW_DURATION = timedelta(hours=1)
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+          'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+          'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll',
+          'Soul', 'Other']
+WORDS = ['The', 'Musical', 'Hop', 'Park', 'Square', 'Live', 'Music', 'Coffee',
+         'Dueling', 'Pianos', 'Bar', 'Wild', 'Sax', 'Band', 'Guns', 'Petals',
+         'Blue', 'Moon', 'Hall', 'Room', 'Club', 'Lounge', 'Garden', 'House']
+
+
+def use_database(url):
+    # point the app at another database before the engine is first created
+    if url:
+        app.config['SQLALCHEMY_DATABASE_URI'] = url
+
+
+def _popularity(rng, count):
+    # cumulative Zipf weights over ids in a shuffled order, so popular rows
+    # are spread over the id range instead of being the lowest ids
+    order = list(range(count))
+    rng.shuffle(order)
+    weights = [0.0] * count
+    for rank, index in enumerate(order, 1):
+        weights[index] = 1.0 / rank ** ZIPF_EXPONENT
+    return list(itertools.accumulate(weights))
+
+
+class _Slots(object):
+    # hands out each venue's hourly slots in a scrambled order, without
+    # repeats: the k-th show of a venue gets slot (a * k + b) mod SHOW_HOURS
+    # with a coprime to SHOW_HOURS. shows are SHOW_DURATION long, so no two
+    # of a venue overlap, as the exclusion constraint on PostgreSQL requires
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.venues = {}
+
+    def next(self, venue_id):
+        if venue_id not in self.venues:
+            rng = random.Random('%d:%d' % (self.seed, venue_id))
+            step = rng.randrange(1, SHOW_HOURS)
+            while math.gcd(step, SHOW_HOURS) != 1:
+                step = rng.randrange(1, SHOW_HOURS)
+            self.venues[venue_id] = [step, rng.randrange(SHOW_HOURS), 0]
+        step, offset, used = self.venues[venue_id]
+        if used == SHOW_HOURS:
+            return None
+        self.venues[venue_id][2] += 1
+        return (step * used + offset) % SHOW_HOURS
+
+
+def _name(rng, i):
+    return '%s %s %s %d' % (rng.choice(WORDS), rng.choice(WORDS), rng.choice(WORDS), i)
+
+
+def _genre_ids():
+    # make sure every synthetic genre exists and return {name: id}
+    existing = dict(db.session.query(Genre.name, Genre.id))
+    missing = [{'name': name} for name in GENRES if name not in existing]
+    if missing:
+        _insert(Genre.__table__, missing)
+        existing = dict(db.session.query(Genre.name, Genre.id))
+    return existing
+
+
+def _genre_links(rng, genre_ids, key, owner_id):
+    return [{key: owner_id, 'genre_id': genre_ids[name]}
+            for name in rng.sample(GENRES, rng.randint(1, 3))]
+
+
+def _insert(table, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(table.insert(), rows[start:start + CHUNK_SIZE])
+    db.session.commit()
+
+
+def seed(venues, artists, shows, seed=0):
+    # deterministic for a given seed; appends to whatever is already there
+    rng = random.Random(seed)
+    first_venue = (db.session.query(db.func.max(Venue.id)).scalar() or 0) + 1
+    first_artist = (db.session.query(db.func.max(Artist.id)).scalar() or 0) + 1
+    genre_ids = _genre_ids()
+
+    rows, links = [], []
+    for i in range(venues):
+        city, state = rng.choices(CITIES, cum_weights=CITY_WEIGHTS)[0]
+        rows.append({'id': first_venue + i, 'name': _name(rng, i), 'city': city, 'state': state,
+                     'address': '%d Main St' % i, 'phone': '555-555-%04d' % (i % 10000),
+                     'seeking_talent': rng.random() < 0.3})
+        links.extend(_genre_links(rng, genre_ids, 'venue_id', first_venue + i))
+    _insert(Venue.__table__, rows)
+    _insert(venue_genres, links)
+
+    rows, links = [], []
+    for i in range(artists):
+        city, state = rng.choices(CITIES, cum_weights=CITY_WEIGHTS)[0]
+        rows.append({'id': first_artist + i, 'name': _name(rng, i), 'city': city, 'state': state,
+                     'phone': '555-555-%04d' % (i % 10000),
+                     'seeking_venue': rng.random() < 0.3})
+        links.extend(_genre_links(rng, genre_ids, 'artist_id', first_artist + i))
+    _insert(Artist.__table__, rows)
+    _insert(artist_genres, links)
+
+    venue_weights = _popularity(rng, venues)
+    artist_weights = _popularity(rng, artists)
+    venue_ids = range(first_venue, first_venue + venues)
+    artist_ids = range(first_artist, first_artist + artists)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    slots = _Slots(seed)
+    rows = []
+    for i in range(shows):
+        venue_id = rng.choices(venue_ids, cum_weights=venue_weights)[0]
+        hour = slots.next(venue_id)
+        while hour is None:
+            # every hour of the venue's calendar is taken
+            venue_id = rng.choices(venue_ids, cum_weights=venue_weights)[0]
+            hour = slots.next(venue_id)
+        start_time = now + timedelta(hours=hour - SHOW_HOURS_PAST)
+        rows.append({'venue_id': venue_id,
+                     'artist_id': rng.choices(artist_ids, cum_weights=artist_weights)[0],
+                     'start_time': start_time, 'end_time': start_time + SHOW_DURATION})
+        if len(rows) == CHUNK_SIZE:
+            _insert(Show.__table__, rows)
+            rows = []
+    _insert(Show.__table__, rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url')
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=1000)
+    parser.add_argument('--shows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--create-all', action='store_true',
+                        help='create the tables first (for scratch sqlite databases)')
+    args = parser.parse_args()
+    use_database(args.database_url)
+    with app.app_context():
+        if args.create_all:
+            db.create_all()
+        seed(args.venues, args.artists, args.shows, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Import and startup time of the app, from `python -X importtime`.
+
+Usage:
+    python -m benchmarks.startup                      # compare to baseline
+    python -m benchmarks.startup --update-baseline    # record new baseline numbers
+    python -m benchmarks.startup --top 20             # also list the slowest imports
+
+Each target runs in a fresh interpreter --rounds times and the median is
+kept: `import` is `import app` alone, `web` builds the app gunicorn serves
+(what --preload does in the master), `cli` the database-only app of
+create_app(web=False) that scripts and `flask import` use. The run fails
+(exit status 1) when a target's import time grows past --tolerance times
+the baseline, or when it imports one of the modules FORBIDDEN for it --
+e.g. alembic, which only the `flask db` commands need.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'startup_baseline.json')
+
+TARGETS = {
+    'import': 'import app',
+    'web': 'from app import create_app; create_app()',
+    'cli': 'from app import create_app; create_app(web=False)',
+}
+
+# modules a target must not import (top-level package names)
+FORBIDDEN = {
+    'import': ['flask_migrate', 'alembic', 'flask_wtf', 'babel', 'views', 'api'],
+    'web': ['flask_migrate', 'alembic', 'pkg_resources'],
+    'cli': ['flask_migrate', 'alembic', 'flask_wtf', 'babel', 'views', 'api'],
+}
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr):
+    # {module: (self us, cumulative us)} and the total of the top-level imports
+    modules, total = {}, 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(own), int(cumulative))
+        if not name[1:].startswith(' '):
+            total += int(cumulative)
+    return modules, total
+
+
+def run(code):
+    env = dict(os.environ, PYTHONWARNINGS='ignore')
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if process.returncode:
+        raise RuntimeError('%s failed:\n%s' % (code, process.stderr[-2000:]))
+    modules, total = parse_importtime(process.stderr)
+    return modules, total / 1000.0, wall_ms
+
+
+def measure(target, rounds):
+    imports, walls = [], []
+    for _ in range(rounds):
+        modules, import_ms, wall_ms = run(TARGETS[target])
+        imports.append(import_ms)
+        walls.append(wall_ms)
+    return modules, {'import_ms': round(statistics.median(imports), 1),
+                     'wall_ms': round(statistics.median(walls), 1),
+                     'modules': len(modules)}
+
+
+def compare(results, baseline, tolerance):
+    failures = []
+    for target, result in sorted(results.items()):
+        expected = baseline.get(target)
+        if expected is None:
+            continue
+        if result['import_ms'] > expected['import_ms'] * tolerance:
+            failures.append('%s: imports take %.1fms, baseline %.1fms' % (
+                target, result['import_ms'], expected['import_ms']))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', action='append', choices=sorted(TARGETS),
+                        help='default: all of them')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--top', type=int, default=0, help='list the N slowest imports per target')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='allowed import time growth against the baseline')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    results, failures = {}, []
+    for target in args.target or sorted(TARGETS):
+        modules, results[target] = measure(target, args.rounds)
+        print('%-8s imports=%8.1fms wall=%8.1fms modules=%d' % (
+            target, results[target]['import_ms'], results[target]['wall_ms'], results[target]['modules']))
+        for name, (own, cumulative) in sorted(modules.items(), key=lambda item: -item[1][0])[:args.top]:
+            print('    %-40s self=%7.1fms cumulative=%7.1fms' % (name, own / 1000.0, cumulative / 1000.0))
+        loaded = set(name.split('.')[0] for name in modules)
+        failures.extend('%s: imports %s' % (target, name) for name in FORBIDDEN[target] if name in loaded)
+
+    if args.update_baseline:
+        for failure in failures:
+            print('REGRESSION ' + failure)
+        if failures:
+            return 1
+        with open(args.baseline, 'w') as out:
+            json.dump(results, out, indent=2, sort_keys=True)
+        print('baseline written to %s' % args.baseline)
+        return 0
+    if not os.path.exists(args.baseline):
+        print('no baseline at %s; run with --update-baseline' % args.baseline)
+    else:
+        with open(args.baseline) as baseline:
+            failures.extend(compare(results, json.load(baseline), args.tolerance))
+    for failure in failures:
+        print('REGRESSION ' + failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
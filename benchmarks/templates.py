@@ -0,0 +1,127 @@
+"""Template compile time with and without the bytecode cache, and show-tile pages with and without fragment caching.
+
+Usage:
+    python -m benchmarks.templates
+    python -m benchmarks.templates --rounds 50 --shows 20000
+
+Compiling: every template under templates/ is loaded in a fresh interpreter,
+the way a new worker would: without a bytecode cache, with an empty one
+(compiling and writing it), and with the one that run left behind.
+
+Rendering: the busiest venue and artist pages and /shows of a scratch SQLite
+database (filled by benchmarks.seed) are rendered --rounds times with the
+{% cache %} fragments off, then on once every tile is cached. The run fails
+(exit status 1) when loading from the bytecode cache is not faster than
+compiling, or a page with cached fragments renders slower than without.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from app import app, db, page_cache
+from benchmarks.routes import sample_ids
+from benchmarks.search_bench import percentile
+from benchmarks.seed import seed, use_database
+from extensions import template_cache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# prints the ms it takes to load every template of the app
+LOAD_TEMPLATES = '''
+import time
+from app import create_app
+env = create_app().jinja_env
+started = time.perf_counter()
+for name in env.list_templates(extensions=['html']):
+    env.get_template(name)
+print((time.perf_counter() - started) * 1000)
+'''
+
+
+def load_templates(bytecode_cache_dir):
+    env = dict(os.environ, PYTHONWARNINGS='ignore', TEMPLATE_BYTECODE_CACHE_DIR=bytecode_cache_dir)
+    output = subprocess.check_output([sys.executable, '-c', LOAD_TEMPLATES], cwd=ROOT, env=env,
+                                     universal_newlines=True)
+    return float(output.split()[-1])
+
+
+def compile_times(rounds):
+    # median ms of loading every template: no cache, empty cache, filled cache
+    times = {'none': [], 'empty': [], 'filled': []}
+    for _ in range(rounds):
+        directory = tempfile.mkdtemp()
+        try:
+            times['none'].append(load_templates(''))
+            times['empty'].append(load_templates(directory))
+            times['filled'].append(load_templates(directory))
+        finally:
+            shutil.rmtree(directory)
+    return dict((kind, percentile(samples, 50)) for kind, samples in times.items())
+
+
+def render_times(client, path, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        response = client.get(path)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, (path, response.status_code)
+    return percentile(samples, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--venues', type=int, default=500)
+    parser.add_argument('--artists', type=int, default=500)
+    parser.add_argument('--shows', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--compile-rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    failures = []
+    compiled = compile_times(args.compile_rounds)
+    print('compile  no cache=%7.1fms  empty cache=%7.1fms  filled cache=%7.1fms' % (
+        compiled['none'], compiled['empty'], compiled['filled']))
+    if compiled['filled'] >= compiled['none']:
+        failures.append('templates load in %.1fms from the bytecode cache, %.1fms without' % (
+            compiled['filled'], compiled['none']))
+
+    scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    scratch.close()
+    use_database('sqlite:///' + scratch.name)
+    page_cache.enabled = False
+    fragments = template_cache.fragments
+    try:
+        with app.app_context():
+            db.create_all()
+            seed(args.venues, args.artists, args.shows)
+            venue_id, artist_id, _ = sample_ids()
+            client = app.test_client()
+            for path in ('/venues/%d' % venue_id, '/artists/%d' % artist_id, '/shows'):
+                fragments.enabled = False
+                client.get(path)
+                plain = render_times(client, path, args.rounds)
+                fragments.enabled = True
+                client.get(path)  # fills the cache
+                hits, misses = fragments.hits, fragments.misses
+                cached = render_times(client, path, args.rounds)
+                lookups = fragments.hits - hits + fragments.misses - misses
+                print('%-14s p50 no fragments=%7.2fms  cached fragments=%7.2fms  hit rate=%.2f' % (
+                    path, plain, cached, (fragments.hits - hits) / lookups if lookups else 0.0))
+                if cached > plain:
+                    failures.append('%s: %.2fms with cached fragments, %.2fms without' % (path, cached, plain))
+            print('fragments %s' % template_cache.stats())
+    finally:
+        os.unlink(scratch.name)
+
+    for failure in failures:
+        print('REGRESSION ' + failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
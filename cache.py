@@ -0,0 +1,291 @@
+#----------------------------------------------------------------------------#
+# Response cache.
+#
+# Rendered GET pages (and any other picklable view data) are cached under a
+# key plus a set of tags such as 'venues' or 'venue:3'. Writes invalidate
+# tags, not keys: every tag carries a version token, entries remember the
+# tokens they were built against, and replacing a tag's token makes every
+# entry that depends on it stale. That works the same for the in-process
+# LRU and for a shared backend (redis/memcached-like client) where there is
+# no way to enumerate keys by tag.
+#
+# The tokens live apart from the pages (TagVersions, or their own redis
+# keyspace), so a burst of pages never pushes a token out: a lost token
+# would silently make every page carrying the tag stale.
+#
+# A view whose data may trail the writes (read from a replica) sets
+# g.cache_min_age to that lag; its page is then not stored while one of its
+# tags was invalidated more recently than that, or a write still replicating
+# could be cached until the next invalidation.
+#----------------------------------------------------------------------------#
+
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, request, session, make_response
+
+# response headers stored with a cached page; validators are kept so hits
+# can still answer conditional requests with 304
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control')
+
+
+class LRUBackend(object):
+    # bounded in-process store: least recently used entries go first,
+    # entries older than ttl seconds are treated as missing
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TagVersions(object):
+    # the in-process tag tokens. They are never evicted one at a time;
+    # past max_tags the store starts over, which makes every cached page
+    # stale at once and is counted in resets
+    def __init__(self, max_tags=100000):
+        self.max_tags = max_tags
+        self.resets = 0
+        self.reset_at = 0.0
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, tag):
+        return self._versions.get(tag)
+
+    def set(self, tag, version, ttl=None):
+        with self._lock:
+            if tag not in self._versions and len(self._versions) >= self.max_tags:
+                self._versions.clear()
+                self.resets += 1
+                self.reset_at = time.time()
+            self._versions[tag] = version
+
+    def delete(self, tag):
+        with self._lock:
+            self._versions.pop(tag, None)
+
+    def clear(self):
+        with self._lock:
+            self._versions.clear()
+
+    def __len__(self):
+        return len(self._versions)
+
+
+class ClientBackend(object):
+    # shared store on top of any client with get(key) / set(key, value, ex=ttl)
+    # / delete(key), e.g. redis.Redis, so every worker sees the same entries
+    # and invalidations
+    def __init__(self, client, ttl=60, prefix='fyyur:cache:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.evictions = None  # decided by the server, not visible from here
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class ResponseCache(object):
+
+    def __init__(self, backend=None, tags=None):
+        # an empty store is falsy (it has __len__), so test for None
+        self.backend = LRUBackend() if backend is None else backend
+        self.tags = TagVersions() if tags is None else tags
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        # CACHE_REDIS_URL switches to the shared backend; redis is only
+        # imported when it is configured. the in-process LRU only sees
+        # invalidations made by its own worker, so run multi-worker
+        # deployments on the shared backend or keep CACHE_TTL short.
+        # on redis the tag tokens are the only keys without an expiry, so a
+        # volatile-* maxmemory-policy evicts pages and never a token.
+        self.enabled = app.config.get('CACHE_ENABLED', True)
+        ttl = app.config.get('CACHE_TTL', 60)
+        if app.config.get('CACHE_REDIS_URL'):
+            import redis
+            client = redis.Redis.from_url(app.config['CACHE_REDIS_URL'])
+            self.backend = ClientBackend(client, ttl=ttl)
+            self.tags = ClientBackend(client, ttl=0, prefix='fyyur:cache-tags:')
+        else:
+            self.backend = LRUBackend(app.config.get('CACHE_MAX_ENTRIES', 1024), ttl)
+            self.tags = TagVersions(app.config.get('CACHE_MAX_TAGS', 100000))
+
+    # tags
+
+    def _tag_version(self, tag):
+        # a tag that was never seen (or was lost in a reset) gets a fresh
+        # token, so losing a tag can only make entries stale, never revive them
+        version = self.tags.get(tag)
+        if version is None:
+            version = self._bump(tag)
+        return version
+
+    def _bump(self, tag):
+        # the token carries its creation time, see set(min_age=, started=)
+        version = '%s:%.6f' % (uuid.uuid4().hex, time.time())
+        self.tags.set(tag, version, ttl=0)
+        return version
+
+    @staticmethod
+    def _version_time(version):
+        try:
+            return float(version.rsplit(':', 1)[1])
+        except (IndexError, ValueError):
+            return 0.0  # a token written before times were added
+
+    def invalidate(self, *tags):
+        # make every entry built against these tags stale
+        for tag in tags:
+            self._bump(tag)
+            self.invalidations += 1
+
+    # entries
+
+    def get(self, key):
+        entry = self.backend.get('entry:' + key) if self.enabled else None
+        if entry is not None:
+            value, versions = entry
+            if all(self._tag_version(tag) == version for tag, version in versions.items()):
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def versions(self, tags):
+        return dict((tag, self._tag_version(tag)) for tag in tags)
+
+    def set(self, key, value, tags=(), versions=None, min_age=0, started=None):
+        # pass versions read *before* building the value so a write that
+        # lands while it is being built still invalidates it. tags only known
+        # once the value is built (add_cache_tags) can't be read before, so
+        # pass started, the time.time() the build began: nothing is stored if
+        # one of them changed since. with min_age, nothing is stored if a tag
+        # changed less than min_age seconds ago.
+        if not self.enabled:
+            return
+        versions = dict(versions or {})
+        late = dict((tag, self.tags.get(tag)) for tag in tags if tag not in versions)
+        if started is not None:
+            if getattr(self.tags, 'reset_at', 0) >= started or \
+                    any(version is not None and self._version_time(version) >= started
+                        for version in late.values()):
+                return
+        versions.update((tag, version or self._bump(tag)) for tag, version in late.items())
+        now = time.time()
+        if min_age and any(now - self._version_time(version) < min_age for version in versions.values()):
+            return
+        self.backend.set('entry:' + key, (value, versions))
+
+    def get_or_set(self, key, build, tags=()):
+        # cache a view-model dict (or anything picklable) built by build()
+        value = self.get(key)
+        if value is None:
+            versions = self.versions(tags)
+            value = build()
+            self.set(key, value, tags, versions)
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+                'evictions': self.backend.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self.backend) if hasattr(self.backend, '__len__') else None,
+                'tags': len(self.tags) if hasattr(self.tags, '__len__') else None,
+                'tag_resets': getattr(self.tags, 'resets', None)}
+
+    # views
+
+    def cached(self, *tags):
+        # cache a GET view's rendered body under its full path. the view can
+        # add data-dependent tags while it runs with add_cache_tags().
+        # requests carrying flashed messages bypass the cache both ways so a
+        # flash is neither swallowed nor served to somebody else.
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method != 'GET' or session.get('_flashes'):
+                    return view(*args, **kwargs)
+                key = 'page:' + request.full_path
+                page = self.get(key)
+                if page is not None:
+                    body, headers = page
+                    response = make_response(body, 200, headers)
+                    return response.make_conditional(request)
+                g.cache_tags = set(tags)
+                started = time.time()
+                versions = self.versions(tags)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.direct_passthrough \
+                        and not session.get('_flashes'):
+                    headers = [(name, value) for name, value in response.headers
+                               if name in CACHED_HEADERS]
+                    self.set(key, (response.get_data(), headers), g.cache_tags, versions,
+                             min_age=g.get('cache_min_age', 0), started=started)
+                return response
+            return wrapper
+        return decorator
+
+
+def add_cache_tags(*tags):
+    # called from inside a @cached view to tie its page to more tags
+    if 'cache_tags' in g:
+        g.cache_tags.update(tags)
@@ -3,31 +3,15 @@
 Created on Tue Oct 19 19:51:14 2021
 
 @author: Jinjin
-"""
-
-from app import db, Venue, Show, format_datetime
-
-
-# venue = Venue(name = 'abc',
-#               city = 'abc',
-#               state = 'abc',
-#               address = 'abc',
-#               phone = 'abc',
-#               image_link = 'abc',
-#               facebook_link = 'abc',
-#               genres = 'jazz',
-#               website_link = 'abc',
-#               looking4talent = True,
-#               seeking_description = 'ggg' )
 
+Fill the configured database with a small, deterministic set of venues,
+artists and shows for trying the app out locally. For larger datasets use
+the generator directly, e.g.:
+    python -m benchmarks.seed --venues 10000 --artists 10000 --shows 200000
+"""
 
-# db.session.add(venue)
-# db.session.commit()      
-
-show = Show(artist_id=1, venue_id=1, start_time= format_datetime("2021-10-01") ) 
-
-show2 = Show(artist_id=1, venue_id=1, start_time= format_datetime("2021-12-03") ) 
-
-db.session.add(show2)
-db.session.commit()
+from app import create_app
+from benchmarks.seed import seed
 
+with create_app(web=False).app_context():
+    seed(venues=20, artists=30, shows=200)
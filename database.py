@@ -0,0 +1,297 @@
+#----------------------------------------------------------------------------#
+# Connections: pool, statement timeouts and read replicas.
+#
+# The pool settings in config.py (DB_POOL_*; all read from the environment)
+# apply to every engine flask_sqlalchemy creates for a server database; sqlite
+# keeps flask_sqlalchemy's own pool choice. Checkouts go through TimedQueuePool,
+# which records how long each one waited, so the pool can be sized from the
+# numbers at /_metrics. On Postgres each request's connection gets the
+# statement_timeout configured for its endpoint. prewarm() opens connections
+# ahead of the first request; run it once per worker (see gunicorn.conf.py).
+#
+# With DATABASE_REPLICA_URLS set, GET/HEAD requests and the search forms
+# (POSTs that only read) read from a replica bind and everything else goes to
+# the primary. A client whose request wrote rows (e.g. the redirect from
+# edit_artist_submission to show_artist) keeps reading from the primary for
+# DB_REPLICA_STICKY_SECONDS, and a replica further behind
+# than DB_REPLICA_MAX_LAG seconds, or unreachable, is skipped until its next
+# lag check.
+#----------------------------------------------------------------------------#
+
+import bisect
+import itertools
+import threading
+import time
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, exc, orm
+from sqlalchemy.pool import QueuePool
+
+# upper bounds (ms) of the checkout wait histogram; the last bucket is open
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+# requests that may be served from a replica
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# ... and endpoints that take a POST but never write
+READ_ONLY_ENDPOINTS = ('search_venues', 'search_artists')
+
+# seconds a replica is behind the primary; 0 when it has replayed all it
+# received (an idle primary would otherwise look like growing lag)
+POSTGRES_LAG_QUERY = '''
+SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END
+'''
+
+
+class CheckoutStats(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def record(self, waited_ms, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_ms += waited_ms
+            self.max_ms = max(self.max_ms, waited_ms)
+            self.buckets[bisect.bisect_left(WAIT_BUCKETS_MS, waited_ms)] += 1
+
+    def report(self):
+        with self._lock:
+            labels = ['<=%dms' % bound for bound in WAIT_BUCKETS_MS] + ['>%dms' % WAIT_BUCKETS_MS[-1]]
+            attempts = self.checkouts + self.timeouts
+            return {'checkouts': self.checkouts,
+                    'timeouts': self.timeouts,
+                    'avg_wait_ms': self.total_ms / attempts if attempts else 0.0,
+                    'max_wait_ms': self.max_ms,
+                    'wait_histogram': dict(zip(labels, self.buckets))}
+
+
+class TimedQueuePool(QueuePool):
+    # a QueuePool that times every checkout, including the wait for a free
+    # connection and, on overflow, opening a new one
+
+    def __init__(self, *args, **kwargs):
+        QueuePool.__init__(self, *args, **kwargs)
+        self.checkout_stats = CheckoutStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = QueuePool._do_get(self)
+        except exc.TimeoutError:
+            self.checkout_stats.record((time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        self.checkout_stats.record((time.perf_counter() - started) * 1000)
+        return connection
+
+    def report(self):
+        return dict(self.checkout_stats.report(),
+                    size=self.size(), checked_in=self.checkedin(),
+                    checked_out=self.checkedout(), overflow=self.overflow())
+
+
+class RoutingSession(SignallingSession):
+    # reads go to the replica picked for the request, if any; flushes and
+    # anything after the first write in the session go to the primary
+
+    def __init__(self, db, **options):
+        self.db = db
+        SignallingSession.__init__(self, db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        replica = g.get('db_replica') if has_request_context() else None
+        if replica is not None and not self._flushing and self._is_clean():
+            return self.db.get_engine(self.app, bind=replica)
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+def wrote_rows():
+    # read by _stick_after_write; only requests that changed something pin
+    # their client to the primary
+    if has_request_context():
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(session, flush_context):
+    # new/dirty/deleted still hold what this flush sent; a dirty object whose
+    # attributes were set to the values they had wrote nothing
+    if session.new or session.deleted or any(session.is_modified(obj) for obj in session.dirty):
+        wrote_rows()
+
+
+@event.listens_for(RoutingSession, 'after_bulk_update')
+@event.listens_for(RoutingSession, 'after_bulk_delete')
+def _after_bulk_write(context):
+    # query.update()/delete(), e.g. the soft delete of a venue
+    if context.rowcount:
+        wrote_rows()
+
+
+class ReplicaLag(object):
+    # last measured lag per replica bind, refreshed at most every
+    # DB_REPLICA_LAG_CHECK seconds
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.measured = {}  # bind -> (checked_at, lag seconds or None if unreachable)
+
+    def get(self, bind, measure, interval):
+        now = time.monotonic()
+        with self._lock:
+            checked_at, lag = self.measured.get(bind, (None, None))
+            if checked_at is not None and now - checked_at < interval:
+                return lag
+            # other threads keep using the old value while this one measures
+            self.measured[bind] = (now, lag)
+        try:
+            lag = measure(bind)
+        except exc.SQLAlchemyError:
+            lag = None
+        with self._lock:
+            self.measured[bind] = (time.monotonic(), lag)
+        return lag
+
+
+class PooledSQLAlchemy(SQLAlchemy):
+
+    def __init__(self, app=None, **kwargs):
+        self.replica_lag = ReplicaLag()
+        self._next_replica = itertools.count()
+        SQLAlchemy.__init__(self, app, **kwargs)
+
+    def init_app(self, app):
+        SQLAlchemy.init_app(self, app)
+        app.before_request(self._route_request)
+        app.after_request(self._stick_after_write)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        SQLAlchemy.apply_driver_hacks(self, app, sa_url, options)
+        if sa_url.get_backend_name() != 'sqlite':
+            options.update(poolclass=TimedQueuePool,
+                           pool_size=app.config['DB_POOL_SIZE'],
+                           max_overflow=app.config['DB_POOL_MAX_OVERFLOW'],
+                           pool_timeout=app.config['DB_POOL_TIMEOUT'],
+                           pool_recycle=app.config['DB_POOL_RECYCLE'],
+                           pool_pre_ping=app.config['DB_POOL_PRE_PING'])
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = SQLAlchemy.create_engine(self, sa_url, engine_opts)
+        if engine.dialect.name == 'postgresql':
+            event.listen(engine, 'checkout', self._set_statement_timeout)
+        return engine
+
+    # statement timeouts
+
+    def statement_timeout(self, endpoint):
+        # ms for the endpoint; 0 (no limit) outside requests, e.g. for the
+        # import command or migrations
+        if endpoint is None:
+            return 0
+        config = self.get_app().config
+        return config['DB_STATEMENT_TIMEOUTS'].get(endpoint, config['DB_STATEMENT_TIMEOUT_MS'])
+
+    def _set_statement_timeout(self, dbapi_connection, connection_record, connection_proxy):
+        timeout = self.statement_timeout(request.endpoint if has_request_context() else None)
+        # connections remember their setting, so the SET is only sent when a
+        # connection moves to an endpoint with a different limit
+        if connection_record.info.get('statement_timeout') == timeout:
+            return
+        cursor = dbapi_connection.cursor()
+        cursor.execute('SET statement_timeout = %d' % timeout)
+        cursor.close()
+        # commit, or the pool's rollback on checkin would undo the SET
+        dbapi_connection.commit()
+        connection_record.info['statement_timeout'] = timeout
+
+    # replicas
+
+    def replicas(self):
+        return sorted(key for key in self.get_app().config.get('SQLALCHEMY_BINDS') or {}
+                      if key.startswith('replica'))
+
+    def measure_lag(self, bind):
+        engine = self.get_engine(self.get_app(), bind=bind)
+        if engine.dialect.name != 'postgresql':
+            # a local stand-in (e.g. a second sqlite file) has no lag to report
+            return 0.0
+        with engine.connect() as connection:
+            return float(connection.scalar(POSTGRES_LAG_QUERY) or 0)
+
+    def pick_replica(self):
+        # round-robin over the replicas that are reachable and close enough
+        # to the primary; None means read from the primary
+        config = self.get_app().config
+        replicas = self.replicas()
+        start = next(self._next_replica)
+        for offset in range(len(replicas)):
+            bind = replicas[(start + offset) % len(replicas)]
+            lag = self.replica_lag.get(bind, self.measure_lag, config['DB_REPLICA_LAG_CHECK'])
+            if lag is not None and lag <= config['DB_REPLICA_MAX_LAG']:
+                return bind
+        return None
+
+    def _route_request(self):
+        g.db_replica = None
+        g.db_wrote = False
+        reads_only = request.method in READ_METHODS or request.endpoint in READ_ONLY_ENDPOINTS
+        if reads_only and session.get('_db_primary_until', 0) < time.time() \
+                and self.replicas():
+            g.db_replica = self.pick_replica()
+            if g.db_replica is not None:
+                # the page may trail writes by up to the allowed lag; don't
+                # cache it if one of its tags was invalidated more recently
+                # (see cache.py)
+                g.cache_min_age = self.get_app().config['DB_REPLICA_MAX_LAG']
+
+    def _stick_after_write(self, response):
+        # read-your-writes: once a request has written rows, this client
+        # reads from the primary until the replicas have caught up. A POST
+        # that wrote nothing (a search, a form that failed validation) leaves
+        # the session cookie alone
+        if g.get('db_wrote') and self.replicas():
+            session['_db_primary_until'] = time.time() + self.get_app().config['DB_REPLICA_STICKY_SECONDS']
+        return response
+
+    # pool
+
+    def prewarm(self, app=None):
+        # open up to DB_POOL_PREWARM connections to the primary and to each
+        # replica and hand them back to their pools
+        app = self.get_app(app)
+        opened = 0
+        for bind in [None] + self.replicas():
+            engine = self.get_engine(app, bind=bind)
+            if not isinstance(engine.pool, TimedQueuePool):
+                continue
+            connections = []
+            try:
+                for _ in range(min(app.config['DB_POOL_PREWARM'], app.config['DB_POOL_SIZE'])):
+                    connections.append(engine.raw_connection())
+            finally:
+                for connection in connections:
+                    connection.close()
+            opened += len(connections)
+        return opened
+
+    def pool_report(self):
+        # checkout waits and occupancy per pool ('primary' and each replica);
+        # sqlite's pools are not timed and are left out
+        report = {}
+        for bind in [None] + self.replicas():
+            pool = self.get_engine(self.get_app(), bind=bind).pool
+            if isinstance(pool, TimedQueuePool):
+                report[bind or 'primary'] = pool.report()
+        return report
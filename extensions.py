@@ -0,0 +1,40 @@
+#----------------------------------------------------------------------------#
+# Extensions.
+#
+# Created unbound and attached to the app by create_app() (app.py), so the
+# models, the import command and scripts can use them without building the
+# web app first.
+#----------------------------------------------------------------------------#
+
+from assets import StaticAssets
+from cache import ResponseCache
+from database import PooledSQLAlchemy
+from formatting import DateFormatter
+from instrumentation import SQLInstrumentation
+from purger import Purger
+from template_cache import TemplateCache
+from thumbnails import Thumbnails
+
+# flask_sqlalchemy plus the pool/timeout/replica settings of config.py (see database.py)
+db = PooledSQLAlchemy()
+
+# rendered read pages, invalidated by tag from the write handlers (see cache.py)
+page_cache = ResponseCache()
+
+# per-request query counts / DB time / N+1 warnings, aggregated at /_metrics
+sql_metrics = SQLInstrumentation()
+
+# the `datetime` filter's formatter (see formatting.py)
+date_formatter = DateFormatter()
+
+# deletes the shows of soft-deleted venues/artists in the background (see purger.py)
+purger = Purger()
+
+# fingerprinted, pre-compressed static files and their template helpers (see assets.py)
+assets = StaticAssets()
+
+# compiled templates on disk and the {% cache %} fragments in memory (see template_cache.py)
+template_cache = TemplateCache()
+
+# cached, resized copies of the venue/artist image_links (see thumbnails.py)
+thumbnails = Thumbnails()
@@ -0,0 +1,71 @@
+#----------------------------------------------------------------------------#
+# Date formatting.
+#
+# The `datetime` Jinja filter runs once per show on the listing and detail
+# pages. babel re-resolves the locale and looks the pattern up on every
+# format_datetime() call. DateFormatter resolves the locale and compiles
+# the named patterns once, on first use rather than when create_app() runs.
+# Its results are kept in a bounded LRU keyed on (value, format), because a
+# page repeats the same few start times many times and they also recur from
+# one request to the next. format_many() formats a whole list in one call.
+#----------------------------------------------------------------------------#
+
+from datetime import timezone
+from functools import lru_cache
+
+# the filter's named formats; anything else is handed to babel as-is
+PATTERNS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+class DateFormatter(object):
+
+    def __init__(self, locale='en', patterns=PATTERNS, cache_size=4096):
+        self.locale_name = locale
+        self.pattern_strings = patterns
+        self.locale = None
+        self.patterns = None
+        self._cached = lru_cache(maxsize=cache_size)(self._format)
+
+    def init_app(self, app):
+        self._cached = lru_cache(maxsize=app.config.get('DATETIME_CACHE_SIZE', 4096))(self._format)
+
+    def _compile(self):
+        from babel import Locale
+        from babel.dates import parse_pattern
+        self.locale = Locale.parse(self.locale_name)
+        self.patterns = dict((name, parse_pattern(pattern)) for name, pattern in self.pattern_strings.items())
+
+    def _format(self, value, format):
+        if self.patterns is None:
+            self._compile()
+        if isinstance(value, str):
+            import dateutil.parser
+            value = dateutil.parser.parse(value)
+        pattern = self.patterns.get(format)
+        if pattern is None:
+            from babel.dates import format_datetime
+            return format_datetime(value, format, locale=self.locale)
+        # babel reads naive datetimes as UTC; keep that
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return pattern.apply(value, self.locale)
+
+    def format(self, value, format='medium'):
+        return self._cached(value, format)
+
+    def format_many(self, values, format='medium'):
+        # one label per value, in order; each distinct value is formatted once
+        labels = {}
+        for value in values:
+            if value not in labels:
+                labels[value] = self._cached(value, format)
+        return [labels[value] for value in values]
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+    def clear(self):
+        self._cached.cache_clear()
@@ -1,7 +1,9 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, NumberRange, Optional
+
+from models import DEFAULT_SHOW_DURATION, MAX_SHOW_DURATION
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -15,6 +17,12 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    # minutes
+    duration = IntegerField(
+        'duration',
+        validators=[Optional(), NumberRange(min=1, max=int(MAX_SHOW_DURATION.total_seconds() // 60))],
+        default=int(DEFAULT_SHOW_DURATION.total_seconds() // 60)
+    )
 
 class VenueForm(Form):
     name = StringField(
@@ -0,0 +1,356 @@
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+#   flask import venues venues.csv
+#   flask import shows shows.jsonl --chunk-size 5000
+#
+# Rows are streamed from CSV or JSON-lines files in chunks of --chunk-size, so
+# memory stays bounded whatever the file size. Every row is validated with the
+# same VenueForm / ArtistForm / ShowForm rules the web forms use; rejected rows
+# go to <file>.rejects.jsonl with their errors. Shows may reference venues and
+# artists by id or by name, and the references of a whole chunk are resolved
+# with one query per table. Shows that would double-book their venue or
+# artist, against the listed shows or an earlier row, are rejected too; the
+# listed shows a chunk could clash with are fetched in one query per table.
+# Accepted rows are written with COPY on Postgres and executemany elsewhere,
+# one transaction per chunk. After every chunk the number of consumed rows is
+# saved to <file>.checkpoint, and a re-run resumes after it (--restart starts
+# over). A show's duration column is in minutes (DEFAULT_SHOW_DURATION when
+# missing).
+#
+# CSV columns are the model column names; genres are ';'-separated.
+#----------------------------------------------------------------------------#
+
+import bisect
+import csv
+import io
+import itertools
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from werkzeug.datastructures import MultiDict
+
+from extensions import db, page_cache
+from models import venue_genres, artist_genres, Genre, Venue, Artist, Show, \
+    DEFAULT_SHOW_DURATION, MAX_SHOW_DURATION, lock_live
+
+TRUE_VALUES = ('1', 'true', 't', 'y', 'yes', 'on')
+
+
+def read_rows(path, fmt):
+    # yields one dict per input row without loading the file
+    with open(path, newline='' if fmt == 'csv' else None, encoding='utf-8') as source:
+        if fmt == 'csv':
+            for row in csv.DictReader(source):
+                if row.get('genres'):
+                    row['genres'] = [name.strip() for name in row['genres'].split(';')]
+                yield row
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def form_data(row):
+    # a row as the MultiDict a browser would post
+    data = MultiDict()
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key.startswith('seeking_') and not isinstance(value, bool):
+            value = str(value).strip().lower() in TRUE_VALUES
+        if isinstance(value, bool):
+            if value:
+                data.add(key, 'y')
+        elif isinstance(value, list):
+            for item in value:
+                data.add(key, str(item))
+        else:
+            data.add(key, str(value))
+    return data
+
+
+def parse_id(value):
+    # an id column's value as an int, or None when it isn't one
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        return None
+
+
+def overlaps(intervals, start, end):
+    # whether any of the sorted [(start_time, end_time)] overlaps [start, end);
+    # none is longer than MAX_SHOW_DURATION, so only the few starting in
+    # the MAX_SHOW_DURATION before end need a look
+    index = bisect.bisect_left(intervals, (end,))
+    while index > 0 and intervals[index - 1][0] > start - MAX_SHOW_DURATION:
+        index -= 1
+        if intervals[index][1] > start:
+            return True
+    return False
+
+
+def validate(form_class, row):
+    # (cleaned data, None) or (None, errors) using the web form's validators
+    form = form_class(formdata=form_data(row), meta={'csrf': False})
+    if form.validate():
+        return form.data, None
+    return None, form.errors
+
+
+class Writer(object):
+    # COPY on postgres, executemany everywhere else; runs inside the session's
+    # transaction so a chunk commits or rolls back as a whole
+
+    def __init__(self, db):
+        self.db = db
+        self.postgres = db.session.bind.dialect.name == 'postgresql'
+
+    def allocate_ids(self, table, count):
+        if not count:
+            return []
+        if self.postgres:
+            rows = self.db.session.execute(
+                "SELECT nextval(pg_get_serial_sequence('%s', 'id')) FROM generate_series(1, :n)"
+                % table.name, {'n': count})
+            return [row[0] for row in rows]
+        start = (self.db.session.execute(self.db.select([self.db.func.max(table.c.id)])).scalar() or 0) + 1
+        return list(range(start, start + count))
+
+    def write(self, table, rows):
+        if not rows:
+            return
+        if not self.postgres:
+            self.db.session.execute(table.insert(), rows)
+            return
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([r'\N' if row[column] is None else row[column] for column in columns])
+        buffer.seek(0)
+        cursor = self.db.session.connection().connection.cursor()
+        cursor.copy_expert('COPY %s (%s) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')'
+                           % (table.name, ', '.join(columns)), buffer)
+
+
+class Checkpoint(object):
+
+    def __init__(self, path):
+        self.path = path + '.checkpoint'
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path) as source:
+            return json.load(source)['rows']
+
+    def save(self, rows):
+        partial = self.path + '.tmp'
+        with open(partial, 'w') as out:
+            json.dump({'rows': rows}, out)
+        os.replace(partial, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Importer(object):
+
+    def __init__(self, kind):
+        # imported here, so registering the command doesn't load the forms
+        # (and flask_wtf) with it
+        from forms import VenueForm, ArtistForm, ShowForm
+        self.db = db
+        self.kind = kind
+        self.writer = Writer(db)
+        self.form_class = {'venues': VenueForm, 'artists': ArtistForm,
+                           'shows': ShowForm}[kind]
+        self.model = {'venues': Venue, 'artists': Artist, 'shows': Show}[kind]
+
+    def genre_ids(self, names):
+        # {name: id} for all names, inserting the missing genres in one go
+        found = dict(self.db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(names)))
+        missing = [{'name': name} for name in names if name not in found]
+        if missing:
+            self.db.session.execute(Genre.__table__.insert(), missing)
+            found = dict(self.db.session.query(Genre.name, Genre.id).filter(Genre.name.in_(names)))
+        return found
+
+    def resolve(self, model, rows, id_key, name_key):
+        # batch-resolve references given either as ids or as exact names;
+        # deleted venues/artists and ids that aren't integers count as unknown
+        row_ids = [parse_id(row[id_key]) if row.get(id_key) else None for row in rows]
+        ids = set(row_id for row_id in row_ids if row_id is not None)
+        names = set(row[name_key] for row in rows if not row.get(id_key) and row.get(name_key))
+        live = self.db.session.query(model.id, model.name).filter(model.deleted_at.is_(None))
+        known = set()
+        if ids:
+            known = set(found for found, _ in live.filter(model.id.in_(ids)))
+        by_name = {}
+        if names:
+            by_name = dict((name, found) for found, name in live.filter(model.name.in_(names)))
+        resolved = []
+        for row, row_id in zip(rows, row_ids):
+            if row.get(id_key):
+                resolved.append(row_id if row_id in known else None)
+            else:
+                resolved.append(by_name.get(row.get(name_key)))
+        return resolved
+
+    def load_chunk(self, chunk, rejects):
+        valid = []
+        for number, row in chunk:
+            data, errors = validate(self.form_class, row)
+            if errors:
+                rejects.append({'row': number, 'errors': errors, 'data': row})
+            else:
+                valid.append((number, row, data))
+        if self.kind == 'shows':
+            return self.load_shows(valid, rejects)
+        return self.load_entities(valid)
+
+    def load_entities(self, valid):
+        table = self.model.__table__
+        association, key = {'venues': (venue_genres, 'venue_id'),
+                            'artists': (artist_genres, 'artist_id')}[self.kind]
+        ids = self.writer.allocate_ids(table, len(valid))
+        genre_ids = self.genre_ids(sorted(set(name for _, _, data in valid for name in data['genres'])))
+        now = datetime.now()
+        rows, links = [], []
+        for entity_id, (_, _, data) in zip(ids, valid):
+            row = dict((column.name, data.get(column.name)) for column in table.columns
+                       if column.name in data and column.name != 'genres')
+            row.update(id=entity_id, created_at=now, updated_at=now)
+            rows.append(row)
+            links.extend({key: entity_id, 'genre_id': genre_ids[name]} for name in set(data['genres']))
+        self.writer.write(table, rows)
+        self.writer.write(association, links)
+        return len(rows), [self.kind]
+
+    def booked(self, column, ids, start, end):
+        # {id: sorted [(start_time, end_time)]} of the shows of those venues
+        # or artists that may overlap [start, end), in one query
+        booked = dict((entity_id, []) for entity_id in ids)
+        if ids:
+            shows = self.db.session.query(column, Show.start_time, Show.end_time).filter(
+                column.in_(ids), Show.start_time > start - MAX_SHOW_DURATION,
+                Show.start_time < end, Show.end_time > start)
+            for entity_id, start_time, end_time in shows:
+                booked[entity_id].append((start_time, end_time))
+        for intervals in booked.values():
+            intervals.sort()
+        return booked
+
+    def load_shows(self, valid, rejects):
+        venue_ids = self.resolve(Venue, [row for _, row, _ in valid], 'venue_id', 'venue_name')
+        artist_ids = self.resolve(Artist, [row for _, row, _ in valid], 'artist_id', 'artist_name')
+        now = datetime.now()
+        rows, tags = [], set(['shows', 'venues'])
+        shows = []
+        for (number, row, data), venue_id, artist_id in zip(valid, venue_ids, artist_ids):
+            if venue_id is None or artist_id is None:
+                rejects.append({'row': number, 'errors': {'reference': ['unknown venue or artist']},
+                                'data': row})
+                continue
+            duration = timedelta(minutes=data['duration']) if data.get('duration') else DEFAULT_SHOW_DURATION
+            shows.append((number, row, venue_id, artist_id, data['start_time'], data['start_time'] + duration))
+        if shows:
+            # locked like create_show_submission does (venues, then artists),
+            # so a concurrent booking can't slip in between the check and the
+            # write. a venue or artist deleted since resolve() isn't returned
+            live_venues = set(lock_live(Venue, sorted(set(show[2] for show in shows))))
+            live_artists = set(lock_live(Artist, sorted(set(show[3] for show in shows))))
+            start = min(show[4] for show in shows)
+            end = max(show[5] for show in shows)
+            venues = self.booked(Show.venue_id, set(show[2] for show in shows), start, end)
+            artists = self.booked(Show.artist_id, set(show[3] for show in shows), start, end)
+        for number, row, venue_id, artist_id, start_time, end_time in shows:
+            if venue_id not in live_venues or artist_id not in live_artists:
+                rejects.append({'row': number, 'errors': {'reference': ['venue or artist was deleted']},
+                                'data': row})
+                continue
+            # against the shows already listed and the earlier rows of the chunk
+            busy = [name for name, intervals in (('venue', venues[venue_id]), ('artist', artists[artist_id]))
+                    if overlaps(intervals, start_time, end_time)]
+            if busy:
+                rejects.append({'row': number, 'data': row, 'errors': {
+                    'start_time': ['the %s already has a show at that time' % name for name in busy]}})
+                continue
+            bisect.insort(venues[venue_id], (start_time, end_time))
+            bisect.insort(artists[artist_id], (start_time, end_time))
+            rows.append({'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time,
+                         'end_time': end_time, 'created_at': now, 'updated_at': now})
+            tags.update(['venue:%d' % venue_id, 'artist:%d' % artist_id])
+        self.writer.write(self.model.__table__, rows)
+        return len(rows), sorted(tags)
+
+    def run(self, path, fmt, chunk_size, restart):
+        checkpoint = Checkpoint(path)
+        if restart:
+            checkpoint.clear()
+        done = done_before = checkpoint.load()
+        if done:
+            click.echo('resuming after row %d' % done)
+        rows = enumerate(read_rows(path, fmt), 1)
+        rows = itertools.islice(rows, done, None)
+
+        imported = rejected = 0
+        started = time.perf_counter()
+        with open(path + '.rejects.jsonl', 'a' if done else 'w') as rejects_file:
+            for chunk in chunked(rows, chunk_size):
+                rejects = []
+                try:
+                    count, tags = self.load_chunk(chunk, rejects)
+                    self.db.session.commit()
+                except Exception:
+                    self.db.session.rollback()
+                    raise
+                page_cache.invalidate(*tags)
+                done = chunk[-1][0]
+                checkpoint.save(done)
+                for reject in rejects:
+                    rejects_file.write(json.dumps(reject, default=str) + '\n')
+                imported += count
+                rejected += len(rejects)
+                elapsed = time.perf_counter() - started
+                click.echo('%d rows read, %d imported, %d rejected, %.0f rows/sec'
+                           % (done, imported, rejected, imported / elapsed if elapsed else 0))
+        checkpoint.clear()
+        if not rejected and not done_before:
+            os.remove(path + '.rejects.jsonl')
+        elapsed = time.perf_counter() - started
+        click.echo('imported %d %s in %.1fs (%.0f rows/sec), %d rejected%s' % (
+            imported, self.kind, elapsed, imported / elapsed if elapsed else 0, rejected,
+            ' -- see %s.rejects.jsonl' % path if rejected else ''))
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help='defaults to the file extension')
+@click.option('--chunk-size', default=1000, show_default=True, help='rows per transaction')
+@click.option('--restart', is_flag=True, help='ignore an existing checkpoint')
+@with_appcontext
+def import_command(kind, path, fmt, chunk_size, restart):
+    """Stream venues, artists or shows from a CSV/JSON-lines file."""
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    # the forms need a request context even with CSRF off
+    with current_app.test_request_context():
+        Importer(kind).run(path, fmt, chunk_size, restart)
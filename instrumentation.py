@@ -0,0 +1,157 @@
+#----------------------------------------------------------------------------#
+# Per-request SQL instrumentation.
+#
+# Engine events time every statement issued while a request is being served.
+# At the end of the request the app logger gets a line when the request was
+# slow or when one statement shape ran more than SQL_NPLUSONE_THRESHOLD
+# times (a probable N+1), and the numbers are folded into per-endpoint
+# aggregates served at /_metrics.
+#----------------------------------------------------------------------------#
+
+import re
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# collapse bind-parameter lists and literals so "the same query with other
+# ids" maps to one shape
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))*\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_WHITESPACE = re.compile(r'\s+')
+# requests that matched no route (404s, 405s) share one aggregate, so
+# probing random paths can't grow the metrics without bound
+UNMATCHED = '<unmatched>'
+
+
+def statement_shape(statement):
+    shape = _WHITESPACE.sub(' ', statement).strip()
+    shape = _PLACEHOLDER_LIST.sub('(?)', shape)
+    return _NUMBER.sub('N', shape)
+
+
+class RequestSQL(object):
+    # what one request did against the database
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements = []  # (duration_ms, statement)
+        self.shapes = {}
+
+    def record(self, statement, duration_ms):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.statements.append((duration_ms, statement))
+        shape = statement_shape(statement)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def slowest(self, limit):
+        return sorted(self.statements, key=lambda item: item[0], reverse=True)[:limit]
+
+    def repeated(self, threshold):
+        return dict((shape, count) for shape, count in self.shapes.items() if count > threshold)
+
+
+class SQLInstrumentation(object):
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.threshold = app.config.get('SQL_NPLUSONE_THRESHOLD', 10)
+        self.slow_request_ms = app.config.get('SQL_SLOW_REQUEST_MS', 200)
+        self.keep = app.config.get('SQL_SLOWEST_KEPT', 5)
+        # listen on the Engine class rather than one engine: flask_sqlalchemy
+        # creates engines lazily (and one per bind), and every one of them
+        # should be covered (once, however many apps are created)
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(Engine, 'handle_error', self._handle_error)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    # engine hooks
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_start'].pop()
+        if has_request_context() and 'sql' in g:
+            g.sql.record(statement, (time.perf_counter() - started) * 1000)
+
+    def _handle_error(self, exception_context):
+        # a failed statement never reaches after_cursor_execute
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_start'):
+            connection.info['query_start'].pop()
+
+    # request hooks
+
+    def _start_request(self):
+        g.sql = RequestSQL()
+
+    def _finish_request(self, response):
+        sql = g.get('sql')
+        if sql is None:
+            return response
+        endpoint = request.endpoint or UNMATCHED
+        if response.is_streamed:
+            # a streamed body (/export) runs its statements after this hook,
+            # still under the request context and so into g.sql; report the
+            # request once the body is done. the headers are sent before it,
+            # so there's no Server-Timing header
+            response.call_on_close(lambda: self._report(endpoint, sql))
+            return response
+        g.pop('sql')
+        self._report(endpoint, sql)
+        response.headers.add('Server-Timing', 'db;dur=%.1f;desc="%d queries"' % (sql.total_ms, sql.count))
+        return response
+
+    def _report(self, endpoint, sql):
+        repeated = sql.repeated(self.threshold)
+        for shape, count in repeated.items():
+            self.app.logger.warning('probable N+1 in %s: %d x %s', endpoint, count, shape)
+        if sql.total_ms > self.slow_request_ms:
+            slowest_ms, slowest_statement = sql.slowest(1)[0]
+            self.app.logger.warning('slow SQL in %s: %d queries, %.1fms; slowest %.1fms: %s',
+                                    endpoint, sql.count, sql.total_ms, slowest_ms,
+                                    statement_shape(slowest_statement))
+        self._aggregate(endpoint, sql, repeated)
+
+    def _aggregate(self, endpoint, sql, repeated):
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0,
+                'max_db_ms': 0.0, 'nplusone_requests': 0, 'slowest': []})
+            stats['requests'] += 1
+            stats['queries'] += sql.count
+            stats['max_queries'] = max(stats['max_queries'], sql.count)
+            stats['db_ms'] += sql.total_ms
+            stats['max_db_ms'] = max(stats['max_db_ms'], sql.total_ms)
+            if repeated:
+                stats['nplusone_requests'] += 1
+            slowest = stats['slowest'] + [[round(ms, 3), statement] for ms, statement in sql.slowest(self.keep)]
+            stats['slowest'] = sorted(slowest, key=lambda item: item[0], reverse=True)[:self.keep]
+
+    def metrics(self):
+        with self._lock:
+            report = {}
+            for endpoint, stats in self.endpoints.items():
+                report[endpoint] = dict(stats,
+                                        avg_queries=float(stats['queries']) / stats['requests'],
+                                        avg_db_ms=stats['db_ms'] / stats['requests'],
+                                        slowest=list(stats['slowest']))
+            return report
+
+    def reset(self):
+        with self._lock:
+            self.endpoints.clear()
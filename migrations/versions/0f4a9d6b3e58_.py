@@ -0,0 +1,28 @@
+"""(updated_at, id) indexes for incremental exports
+
+Revision ID: 0f4a9d6b3e58
+Revises: e61c0b8a4f27
+Create Date: 2026-10-18 15:02:33.418862
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0f4a9d6b3e58'
+down_revision = 'e61c0b8a4f27'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists', 'shows')
+
+
+def upgrade():
+    for table in TABLES:
+        op.create_index('ix_%s_updated_at_id' % table, table, ['updated_at', 'id'])
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index('ix_%s_updated_at_id' % table, table_name=table)
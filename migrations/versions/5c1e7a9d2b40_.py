@@ -0,0 +1,44 @@
+"""trigram indexes for venue/artist search
+
+Revision ID: 5c1e7a9d2b40
+Revises: 4b50ea6eacbe
+Create Date: 2026-10-18 10:12:41.208311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e7a9d2b40'
+down_revision = '4b50ea6eacbe'
+branch_labels = None
+depends_on = None
+
+# (index name, table, column) for every column the search matches with ILIKE
+SEARCH_INDEXES = [
+    ('ix_venues_name_trgm', 'venues', 'name'),
+    ('ix_venues_city_trgm', 'venues', 'city'),
+    ('ix_venues_genres_trgm', 'venues', 'genres'),
+    ('ix_artists_name_trgm', 'artists', 'name'),
+    ('ix_artists_city_trgm', 'artists', 'city'),
+    ('ix_artists_genres_trgm', 'artists', 'genres'),
+]
+
+
+def upgrade():
+    # pg_trgm GIN indexes serve ILIKE '%term%' without a sequential scan.
+    # other backends keep the plain scan.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in SEARCH_INDEXES:
+        op.create_index(name, table, [column], postgresql_using='gin',
+                        postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, table, column in SEARCH_INDEXES:
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,24 @@
+"""(start_time, id) index for keyset pages of shows
+
+Revision ID: 7b3e1c9a5d20
+Revises: 0f4a9d6b3e58
+Create Date: 2026-10-18 16:40:12.208531
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b3e1c9a5d20'
+down_revision = '0f4a9d6b3e58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_shows_start_time_id', 'shows', ['start_time', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_shows_start_time_id', table_name='shows')
@@ -0,0 +1,93 @@
+"""partition shows by start_time month (postgres only)
+
+Revision ID: b5e9d3a7c1f4
+Revises: f2a6c9e0d4b8
+Create Date: 2026-10-18 21:37:52.904116
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e9d3a7c1f4'
+down_revision = 'f2a6c9e0d4b8'
+branch_labels = None
+depends_on = None
+
+# months ahead of the current one that get a partition right away; later
+# ones come from `flask partitions create` (see partitions.py)
+MONTHS_AHEAD = 12
+
+# (index name, columns) of the shows indexes, created on the partitioned
+# table and so on every partition
+SHOW_INDEXES = [
+    ('ix_shows_venue_id_start_time_artist_id', ['venue_id', 'start_time', 'artist_id']),
+    ('ix_shows_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_shows_updated_at_id', ['updated_at', 'id']),
+    ('ix_shows_start_time_id', ['start_time', 'id']),
+]
+
+COLUMNS = 'id, artist_id, venue_id, start_time, created_at, updated_at'
+
+
+def create_shows(old, partition_by=''):
+    # the shows table, taking over the id sequence of the old one. a
+    # partitioned table's primary key must include start_time
+    op.execute('ALTER SEQUENCE shows_id_seq OWNED BY NONE')
+    op.execute('ALTER TABLE shows RENAME TO %s' % old)
+    op.execute('ALTER TABLE %s RENAME CONSTRAINT shows_pkey TO %s_pkey' % (old, old))
+    for name, _ in SHOW_INDEXES:
+        op.drop_index(name, table_name=old)
+    op.execute("""
+        CREATE TABLE shows (
+            id integer NOT NULL DEFAULT nextval('shows_id_seq'),
+            artist_id integer NOT NULL CONSTRAINT shows_artist_id_fkey REFERENCES artists (id),
+            venue_id integer NOT NULL CONSTRAINT shows_venue_id_fkey REFERENCES venues (id),
+            start_time timestamp without time zone NOT NULL,
+            created_at timestamp without time zone NOT NULL DEFAULT now(),
+            updated_at timestamp without time zone NOT NULL DEFAULT now(),
+            PRIMARY KEY (%s)
+        ) %s""" % ('id, start_time' if partition_by else 'id', partition_by))
+    op.execute('ALTER SEQUENCE shows_id_seq OWNED BY shows.id')
+
+
+def copy_shows(old):
+    op.execute('INSERT INTO shows (%s) SELECT %s FROM %s' % (COLUMNS, COLUMNS, old))
+    op.execute('DROP TABLE %s' % old)
+    for name, columns in SHOW_INDEXES:
+        op.create_index(name, 'shows', columns)
+    op.execute('ANALYZE shows')
+
+
+def month_after(month):
+    return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    create_shows('shows_unpartitioned', 'PARTITION BY RANGE (start_time)')
+    op.execute('CREATE TABLE shows_default PARTITION OF shows DEFAULT')
+    # a partition for every month with shows, and for the coming ones
+    months = set(month for month, in op.get_bind().execute(
+        sa.text("SELECT DISTINCT date_trunc('month', start_time) FROM shows_unpartitioned")))
+    month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for _ in range(MONTHS_AHEAD + 1):
+        months.add(month)
+        month = month_after(month)
+    for month in sorted(months):
+        op.execute("CREATE TABLE shows_p%04d_%02d PARTITION OF shows FOR VALUES FROM ('%s') TO ('%s')"
+                   % (month.year, month.month, month, month_after(month)))
+    copy_shows('shows_unpartitioned')
+
+
+def downgrade():
+    # only the attached partitions come back; archived ones stay in the
+    # archive schema
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    create_shows('shows_partitioned')
+    copy_shows('shows_partitioned')
@@ -0,0 +1,70 @@
+"""soft delete of venues and artists, with partial indexes over the live rows
+
+Revision ID: c4d8e2f61a93
+Revises: 7b3e1c9a5d20
+Create Date: 2026-10-18 19:05:47.315402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8e2f61a93'
+down_revision = '7b3e1c9a5d20'
+branch_labels = None
+depends_on = None
+
+LIVE = sa.text('deleted_at IS NULL')
+DELETED = sa.text('deleted_at IS NOT NULL')
+
+# (index name, table, columns) of the listing indexes, over live rows only
+LIVE_INDEXES = [
+    ('ix_venues_live_city_state_id', 'venues', ['city', 'state', 'id']),
+    ('ix_venues_live_id', 'venues', ['id']),
+    ('ix_artists_live_id', 'artists', ['id']),
+]
+
+# the search's trigram indexes (postgres only, see 5c1e7a9d2b40)
+SEARCH_INDEXES = [
+    ('ix_venues_name_trgm', 'venues', 'name'),
+    ('ix_venues_city_trgm', 'venues', 'city'),
+    ('ix_artists_name_trgm', 'artists', 'name'),
+    ('ix_artists_city_trgm', 'artists', 'city'),
+]
+
+
+def create_search_indexes(where):
+    for name, table, column in SEARCH_INDEXES:
+        op.create_index(name, table, [column], postgresql_using='gin',
+                        postgresql_ops={column: 'gin_trgm_ops'}, postgresql_where=where)
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    for table in ('venues', 'artists'):
+        op.add_column(table, sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        op.create_index('ix_%s_deleted_at' % table, table, ['deleted_at'],
+                        postgresql_where=DELETED, sqlite_where=DELETED)
+    for name, table, columns in LIVE_INDEXES:
+        op.create_index(name, table, columns, postgresql_where=LIVE, sqlite_where=LIVE)
+    # superseded by ix_venues_live_city_state_id
+    op.drop_index('ix_venues_city_state', table_name='venues')
+    if postgresql:
+        for name, table, _ in SEARCH_INDEXES:
+            op.drop_index(name, table_name=table)
+        create_search_indexes(LIVE)
+
+
+def downgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    if postgresql:
+        for name, table, _ in SEARCH_INDEXES:
+            op.drop_index(name, table_name=table)
+        create_search_indexes(None)
+    op.create_index('ix_venues_city_state', 'venues', ['city', 'state'])
+    for name, table, _ in reversed(LIVE_INDEXES):
+        op.drop_index(name, table_name=table)
+    for table in ('artists', 'venues'):
+        op.drop_index('ix_%s_deleted_at' % table, table_name=table)
+        op.drop_column(table, 'deleted_at')
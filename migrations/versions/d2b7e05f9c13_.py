@@ -0,0 +1,98 @@
+"""normalize genres into genres/venue_genres/artist_genres
+
+Revision ID: d2b7e05f9c13
+Revises: a83f4c21d6e7
+Create Date: 2026-10-18 12:26:50.114937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b7e05f9c13'
+down_revision = 'a83f4c21d6e7'
+branch_labels = None
+depends_on = None
+
+# (owner table, association table, owner key column)
+OWNERS = [('venues', 'venue_genres', 'venue_id'),
+          ('artists', 'artist_genres', 'artist_id')]
+
+
+def parse_genres(value):
+    # '{Jazz,"Rock n Roll"}' as written by the old array-literal columns
+    if not value:
+        return []
+    names = [name.strip().strip('"').strip() for name in value.strip('{}').split(',')]
+    return [name for name in names if name]
+
+
+def upgrade():
+    op.create_table('genres',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for owner, association, key in OWNERS:
+        op.create_table(association,
+        sa.Column(key, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([key], [owner + '.id'], ),
+        sa.ForeignKeyConstraint(['genre_id'], ['genres.id'], ),
+        sa.PrimaryKeyConstraint(key, 'genre_id')
+        )
+        op.create_index(op.f('ix_%s_genre_id' % association), association, ['genre_id'])
+
+    # move the array-literal strings into the new tables
+    bind = op.get_bind()
+    genres = sa.table('genres', sa.column('id', sa.Integer), sa.column('name', sa.String))
+    parsed = {}
+    for owner, association, key in OWNERS:
+        rows = bind.execute(sa.text('SELECT id, genres FROM %s' % owner)).fetchall()
+        parsed[owner] = [(row[0], parse_genres(row[1])) for row in rows]
+    names = sorted({name for rows in parsed.values() for _, owned in rows for name in owned})
+    if names:
+        op.bulk_insert(genres, [{'name': name} for name in names])
+    genre_ids = dict((row[1], row[0]) for row in bind.execute(sa.select([genres.c.id, genres.c.name])))
+    for owner, association, key in OWNERS:
+        table = sa.table(association, sa.column(key, sa.Integer), sa.column('genre_id', sa.Integer))
+        links = [{key: owner_id, 'genre_id': genre_ids[name]}
+                 for owner_id, owned in parsed[owner] for name in set(owned)]
+        if links:
+            op.bulk_insert(table, links)
+
+    if bind.dialect.name == 'postgresql':
+        op.drop_index('ix_venues_genres_trgm', table_name='venues')
+        op.drop_index('ix_artists_genres_trgm', table_name='artists')
+    op.drop_column('venues', 'genres')
+    op.drop_column('artists', 'genres')
+
+
+def downgrade():
+    op.add_column('artists', sa.Column('genres', sa.String(length=120), nullable=True))
+    op.add_column('venues', sa.Column('genres', sa.String(length=120), nullable=True))
+
+    # rebuild the array-literal strings from the association tables
+    bind = op.get_bind()
+    for owner, association, key in OWNERS:
+        rows = bind.execute(sa.text(
+            'SELECT a.%s, g.name FROM %s a JOIN genres g ON g.id = a.genre_id ORDER BY g.name'
+            % (key, association))).fetchall()
+        owned = {}
+        for owner_id, name in rows:
+            owned.setdefault(owner_id, []).append('"%s"' % name if ' ' in name else name)
+        for owner_id, names in owned.items():
+            bind.execute(sa.text('UPDATE %s SET genres = :genres WHERE id = :id' % owner),
+                         genres='{%s}' % ','.join(names), id=owner_id)
+
+    if bind.dialect.name == 'postgresql':
+        op.create_index('ix_venues_genres_trgm', 'venues', ['genres'], postgresql_using='gin',
+                        postgresql_ops={'genres': 'gin_trgm_ops'})
+        op.create_index('ix_artists_genres_trgm', 'artists', ['genres'], postgresql_using='gin',
+                        postgresql_ops={'genres': 'gin_trgm_ops'})
+    for owner, association, key in OWNERS:
+        op.drop_index(op.f('ix_%s_genre_id' % association), table_name=association)
+        op.drop_table(association)
+    op.drop_table('genres')
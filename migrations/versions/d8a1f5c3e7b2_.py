@@ -0,0 +1,73 @@
+"""show end times, and an exclusion constraint against double-booked venues
+
+Revision ID: d8a1f5c3e7b2
+Revises: b5e9d3a7c1f4
+Create Date: 2026-10-18 23:12:30.417865
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8a1f5c3e7b2'
+down_revision = 'b5e9d3a7c1f4'
+branch_labels = None
+depends_on = None
+
+# models.DEFAULT_SHOW_DURATION when this was written
+DEFAULT_DURATION_HOURS = 2
+
+# no two shows of a venue overlap; postgres only, on every partition, since
+# a partitioned table can't have one of its own (see partitions.py)
+VENUE_NO_OVERLAP = ('ALTER TABLE %s ADD CONSTRAINT %s_venue_no_overlap '
+                    'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)')
+
+
+def show_tables(bind):
+    partitions = [name for name, in bind.execute(sa.text(
+        "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'shows'::regclass"))]
+    return partitions or ['shows']
+
+
+def upgrade():
+    bind = op.get_bind()
+    postgresql = bind.dialect.name == 'postgresql'
+    op.add_column('shows', sa.Column('end_time', sa.DateTime(), nullable=True))
+    # existing shows get the default duration, cut short where the venue's
+    # next show starts earlier: their real durations are unknown, and this
+    # way none of them overlaps (two shows at the same time leave the first
+    # one empty)
+    if postgresql:
+        op.execute("""
+            UPDATE shows SET end_time = LEAST(shows.start_time + interval '%d hours', following.next_start)
+            FROM (SELECT id, start_time,
+                         lead(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, id) AS next_start
+                  FROM shows) AS following
+            WHERE following.id = shows.id AND following.start_time = shows.start_time""" % DEFAULT_DURATION_HOURS)
+    else:
+        # the suffix keeps the fractional seconds datetime() drops
+        op.execute("""
+            UPDATE shows SET end_time = min(
+                datetime(start_time, '+%d hours') || substr(start_time, 20),
+                coalesce((SELECT min(later.start_time) FROM shows AS later
+                          WHERE later.venue_id = shows.venue_id
+                            AND (later.start_time > shows.start_time
+                                 OR (later.start_time = shows.start_time AND later.id > shows.id))),
+                         '9999-12-31'))""" % DEFAULT_DURATION_HOURS)
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+    if postgresql:
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for table in show_tables(bind):
+            op.execute(VENUE_NO_OVERLAP % (table, table))
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for table in show_tables(bind):
+            op.execute('ALTER TABLE %s DROP CONSTRAINT %s_venue_no_overlap' % (table, table))
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.drop_column('end_time')
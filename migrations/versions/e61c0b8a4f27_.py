@@ -0,0 +1,33 @@
+"""created_at/updated_at on venues, artists and shows
+
+Revision ID: e61c0b8a4f27
+Revises: d2b7e05f9c13
+Create Date: 2026-10-18 13:40:08.761520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e61c0b8a4f27'
+down_revision = 'd2b7e05f9c13'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists', 'shows')
+
+
+def upgrade():
+    # the server default backfills existing rows with the migration time
+    for table in TABLES:
+        op.add_column(table, sa.Column('created_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.func.now()))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.func.now()))
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'created_at')
@@ -0,0 +1,28 @@
+"""per-venue show index covering artist_id, for the venue calendar
+
+Revision ID: f2a6c9e0d4b8
+Revises: c4d8e2f61a93
+Create Date: 2026-10-18 20:41:09.562817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6c9e0d4b8'
+down_revision = 'c4d8e2f61a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # with artist_id in the index, the calendar's per-day counts (which join
+    # the artists to leave out deleted ones) never read the shows table
+    op.create_index('ix_shows_venue_id_start_time_artist_id', 'shows', ['venue_id', 'start_time', 'artist_id'])
+    op.drop_index('ix_shows_venue_id_start_time', table_name='shows')
+
+
+def downgrade():
+    op.create_index('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time'])
+    op.drop_index('ix_shows_venue_id_start_time_artist_id', table_name='shows')
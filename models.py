@@ -0,0 +1,174 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+
+from extensions import db
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+# venues and artists are soft-deleted: deleting one only sets deleted_at, and
+# purger.py removes its shows afterwards in small batches. the listing and
+# search indexes are partial, over the rows that are not deleted, and every
+# read filters on deleted_at IS NULL to match them
+LIVE = db.text('deleted_at IS NULL')
+
+def live_index(name, *columns, **options):
+    return db.Index(name, *columns, postgresql_where=LIVE, sqlite_where=LIVE, **options)
+
+def deleted_index(table):
+    # the few soft-deleted rows, for the purger
+    deleted = db.text('deleted_at IS NOT NULL')
+    return db.Index('ix_%s_deleted_at' % table, 'deleted_at', postgresql_where=deleted, sqlite_where=deleted)
+
+# a show runs from start_time to end_time. shows without a duration (the ones
+# from before end_time existed, imports without one) get DEFAULT_SHOW_DURATION,
+# and none is longer than MAX_SHOW_DURATION: that bound is what lets an overlap
+# check look a fixed distance back along the start_time indexes
+DEFAULT_SHOW_DURATION = timedelta(hours=2)
+MAX_SHOW_DURATION = timedelta(hours=12)
+
+def default_end_time(context):
+    return context.get_current_parameters()['start_time'] + DEFAULT_SHOW_DURATION
+
+def lock_live(model, ids):
+    # the ids of those venues/artists that aren't deleted, with their rows
+    # locked (FOR UPDATE) until the transaction ends; in id order, so two
+    # transactions locking overlapping sets never wait on each other in a cycle
+    return [row.id for row in db.session.query(model.id)
+                                .filter(model.id.in_(ids), model.deleted_at.is_(None))
+                                .order_by(model.id)
+                                .with_for_update()]
+
+# genres are normalized into their own table; the association tables are keyed
+# (owner_id, genre_id) with a genre_id index for the /genres/<name> lookups
+venue_genres = db.Table('venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venues.id'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id'), primary_key=True, index=True)
+)
+
+artist_genres = db.Table('artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artists.id'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id'), primary_key=True, index=True)
+)
+
+class Genre(db.Model):
+    __tablename__ = 'genres'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    def __repr__(self):
+        return "<Genre %s Name %s>" %(self.id, self.name)
+
+class Venue(db.Model):
+    __tablename__ = 'venues'
+    __table_args__ = (
+        db.Index('ix_venues_updated_at_id', 'updated_at', 'id'),
+        # /venues by area, and the API's pages by id
+        live_index('ix_venues_live_city_state_id', 'city', 'state', 'id'),
+        live_index('ix_venues_live_id', 'id'),
+        deleted_index('venues'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+    # done. added columns: genres, website_link, seeking_talent, seeking_description, and relations: shows
+    genres = db.relationship('Genre', secondary=venue_genres, order_by='Genre.name', lazy=True)
+    website_link = db.Column(db.String(120))
+    seeking_talent = db.Column(db.Boolean, default=False)
+    seeking_description = db.Column(db.String(120))
+    shows = db.relationship('Show', backref='venue', lazy=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now, server_default=db.func.now())
+    deleted_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return "<Venue %s Name %s>" %(self.id, self.name)
+
+class Artist(db.Model):
+    __tablename__ = 'artists'
+    __table_args__ = (
+        db.Index('ix_artists_updated_at_id', 'updated_at', 'id'),
+        # /artists and the API's pages by id
+        live_index('ix_artists_live_id', 'id'),
+        deleted_index('artists'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=artist_genres, order_by='Genre.name', lazy=True)
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+    # done. added columns: website_link, seeking_venue, seeking_description, and relations: shows
+    website_link = db.Column(db.String(120))
+    seeking_venue = db.Column(db.Boolean, default=False)
+    seeking_description = db.Column(db.String(120))
+    shows = db.relationship('Show', backref='artist', lazy=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now, server_default=db.func.now())
+    deleted_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return "<Artist %s Name %s>" %(self.id, self.name)
+
+# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+# done. Check details in each model class
+
+
+class Show(db.Model):
+    # on PostgreSQL the table is partitioned by start_time month (migration
+    # b5e9d3a7c1f4, partitions.py), with (id, start_time) as its primary key;
+    # id stays unique through its sequence, and create_all() builds it plain.
+    # there an exclusion constraint on every partition also keeps a venue's
+    # shows from overlapping (migration d8a1f5c3e7b2), but only two in the
+    # same month: across partitions, and for artists, the booking code's
+    # check under lock_live() is what holds
+    __tablename__ = 'shows'
+    # per-venue / per-artist time-window filters (venue_id = ? AND start_time > ?);
+    # the venue one covers artist_id too, so the venue calendar's per-day counts
+    # are read from the index alone
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time_artist_id', 'venue_id', 'start_time', 'artist_id'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_updated_at_id', 'updated_at', 'id'),
+        # keyset pages of /shows and /api/v1/shows, ordered by (start_time, id)
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
+    start_time = db.Column(db.DateTime, default=datetime.now(), nullable=False)
+    end_time = db.Column(db.DateTime, default=default_end_time, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now, server_default=db.func.now())
+
+    @classmethod
+    def overlapping(cls, fk_column, entity_id, start_time, end_time):
+        # the venue's/artist's shows that overlap [start_time, end_time):
+        # start_time is bounded on both sides, so this is a range scan of the
+        # (venue_id|artist_id, start_time) index rather than of every show
+        return db.and_(fk_column == entity_id,
+                       cls.start_time > start_time - MAX_SHOW_DURATION,
+                       cls.start_time < end_time,
+                       cls.end_time > start_time)
+
+    def __repr__(self):
+        return "<Show %s Artist %s Venue %s time %s>" %(self.id, self.artist_id, self.venue_id, self.start_time)
@@ -0,0 +1,198 @@
+#----------------------------------------------------------------------------#
+# Show partitions.
+#
+# On PostgreSQL the shows table is partitioned by start_time range (migration
+# b5e9d3a7c1f4): one partition per month, shows_p2026_10 and so on, plus
+# shows_default for any start_time no partition covers yet. Every page
+# asks for upcoming shows with start_time > now, and the planner prunes
+# that down to the few partitions from this month on. Years of past shows
+# stay in partitions those queries never open. Only the venue and artist
+# pages, which list a row's whole history, still read the old ones.
+#
+#   flask partitions create    # this month to SHOWS_PARTITIONS_AHEAD months ahead
+#   flask partitions archive   # detach months older than SHOWS_ARCHIVE_AFTER_MONTHS
+#   flask partitions list
+#
+# Run `create` from cron, e.g. monthly. A month without a partition still
+# works, since its shows land in shows_default. `create` then moves them
+# into the month's new partition. `archive` detaches old months and moves
+# them to the archive schema (or drops them with --drop), so past shows
+# disappear from the pages. It takes a short exclusive lock on shows each,
+# touches updated_at of the venues and artists that had shows in the month
+# and invalidates their cached pages (only seen by other workers with
+# CACHE_REDIS_URL, like the import command's).
+#----------------------------------------------------------------------------#
+
+import re
+from datetime import datetime
+
+import click
+from dateutil.relativedelta import relativedelta
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import text
+
+DEFAULT_PARTITION = 'shows_default'
+ARCHIVE_SCHEMA = 'archive'
+PARTITION_NAME = re.compile(r'^shows_p(\d{4})_(\d{2})$')
+# every partition keeps a venue's shows within it from overlapping (migration
+# d8a1f5c3e7b2); a partitioned table can't have an exclusion constraint itself,
+# so shows in different partitions are only kept apart by the booking code
+VENUE_NO_OVERLAP = ('ALTER TABLE %s ADD CONSTRAINT %s_venue_no_overlap '
+                    'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)')
+
+
+def month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def partition_name(month):
+    return 'shows_p%04d_%02d' % (month.year, month.month)
+
+
+def is_partitioned(db):
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'shows'::regclass)")).scalar()
+
+
+def partitions(db):
+    # [(first day of the month, partition name, estimated rows)] of the
+    # monthly partitions attached to shows, oldest first
+    rows = db.session.execute(text(
+        "SELECT child.relname, child.reltuples FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = 'shows'::regclass"))
+    found = []
+    for name, estimate in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            found.append((datetime(int(match.group(1)), int(match.group(2)), 1), name, max(int(estimate), 0)))
+    return sorted(found)
+
+
+def create_partition(db, month):
+    # a partition for the month, holding whatever shows_default had for it:
+    # the rows are moved into a plain table first, which is then attached,
+    # since attaching a range the default partition has rows in fails
+    name = partition_name(month)
+    lower, upper = month, month + relativedelta(months=1)
+    bounds = {'lower': lower, 'upper': upper}
+    db.session.execute(text('CREATE TABLE %s (LIKE shows INCLUDING DEFAULTS INCLUDING CONSTRAINTS)' % name))
+    db.session.execute(text(VENUE_NO_OVERLAP % (name, name)))
+    moved = db.session.execute(text(
+        'WITH moved AS (DELETE FROM %s WHERE start_time >= :lower AND start_time < :upper RETURNING *) '
+        'INSERT INTO %s SELECT * FROM moved' % (DEFAULT_PARTITION, name)), bounds).rowcount
+    # a CHECK matching the bounds lets ATTACH skip scanning the new table
+    db.session.execute(text(
+        "ALTER TABLE %s ADD CONSTRAINT %s_bounds CHECK (start_time >= '%s' AND start_time < '%s')"
+        % (name, name, lower, upper)))
+    db.session.execute(text(
+        "ALTER TABLE shows ATTACH PARTITION %s FOR VALUES FROM ('%s') TO ('%s')" % (name, lower, upper)))
+    db.session.execute(text('ALTER TABLE %s DROP CONSTRAINT %s_bounds' % (name, name)))
+    db.session.commit()
+    if moved:
+        # without statistics the planner takes the moved rows for an empty
+        # table until autovacuum gets to it, and plans the joins over the
+        # upcoming shows badly (850ms instead of 15ms in benchmarks.partitions)
+        db.session.execute(text('ANALYZE %s' % name))
+        db.session.commit()
+    return name, moved
+
+
+def create_partitions(db, months_ahead, now=None):
+    # partitions from this month to months_ahead months ahead, and for every
+    # month shows_default has rows in; returns [(name, rows moved)]
+    now = now or datetime.now()
+    existing = set(month for month, _, _ in partitions(db))
+    first = month_start(now)
+    months = set(first + relativedelta(months=offset) for offset in range(months_ahead + 1))
+    months.update(month for month, in db.session.execute(text(
+        "SELECT DISTINCT date_trunc('month', start_time) FROM %s" % DEFAULT_PARTITION)))
+    return [create_partition(db, month) for month in sorted(months - existing)]
+
+
+def archive_partitions(db, older_than_months, drop=False, now=None):
+    # detaches the partitions of months that ended more than
+    # older_than_months ago and moves them to the archive schema, or drops
+    # them; returns their names
+    from extensions import page_cache
+    cutoff = month_start(now or datetime.now()) - relativedelta(months=older_than_months)
+    archived = []
+    for month, name, _ in partitions(db):
+        if month + relativedelta(months=1) > cutoff:
+            break
+        # the venues and artists of these shows lose them from their pages:
+        # their updated_at moves on, which changes the pages' validators,
+        # and their cached pages are dropped once the partition is gone
+        tags = ['shows', 'venues', 'artists']
+        for table, column, prefix in (('venues', 'venue_id', 'venue'), ('artists', 'artist_id', 'artist')):
+            touched = db.session.execute(text(
+                'UPDATE %s SET updated_at = :now WHERE id IN (SELECT DISTINCT %s FROM %s) RETURNING id'
+                % (table, column, name)), {'now': datetime.now()})
+            tags.extend('%s:%d' % (prefix, entity_id) for entity_id, in touched)
+        db.session.execute(text('ALTER TABLE shows DETACH PARTITION %s' % name))
+        if drop:
+            db.session.execute(text('DROP TABLE %s' % name))
+        else:
+            db.session.execute(text('CREATE SCHEMA IF NOT EXISTS %s' % ARCHIVE_SCHEMA))
+            db.session.execute(text('ALTER TABLE %s SET SCHEMA %s' % (name, ARCHIVE_SCHEMA)))
+        db.session.commit()
+        page_cache.invalidate(*tags)
+        archived.append(name)
+    return archived
+
+
+def partitioned_db():
+    from extensions import db
+    if not is_partitioned(db):
+        raise click.ClickException('shows is not partitioned (PostgreSQL only, see migration b5e9d3a7c1f4)')
+    return db
+
+
+@click.group('partitions')
+def partitions_command():
+    """Monthly partitions of the shows table (PostgreSQL)."""
+
+
+@partitions_command.command('create')
+@click.option('--months-ahead', type=int, default=None,
+              help='default: SHOWS_PARTITIONS_AHEAD')
+@with_appcontext
+def create_command(months_ahead):
+    """Create the partitions of the coming months."""
+    db = partitioned_db()
+    if months_ahead is None:
+        months_ahead = current_app.config['SHOWS_PARTITIONS_AHEAD']
+    created = create_partitions(db, months_ahead)
+    for name, moved in created:
+        click.echo('%s created, %d shows moved from %s' % (name, moved, DEFAULT_PARTITION))
+    click.echo('%d partitions created' % len(created))
+
+
+@partitions_command.command('archive')
+@click.option('--older-than', 'older_than', type=int, default=None,
+              help='months; default: SHOWS_ARCHIVE_AFTER_MONTHS')
+@click.option('--drop', is_flag=True, help='drop the partitions instead of moving them to the archive schema')
+@with_appcontext
+def archive_command(older_than, drop):
+    """Detach the partitions of past months."""
+    db = partitioned_db()
+    if older_than is None:
+        older_than = current_app.config['SHOWS_ARCHIVE_AFTER_MONTHS']
+    archived = archive_partitions(db, older_than, drop)
+    for name in archived:
+        click.echo('%s %s' % (name, 'dropped' if drop else 'moved to %s.%s' % (ARCHIVE_SCHEMA, name)))
+    click.echo('%d partitions %s' % (len(archived), 'dropped' if drop else 'archived'))
+
+
+@partitions_command.command('list')
+@with_appcontext
+def list_command():
+    """The attached partitions, with estimated row counts."""
+    db = partitioned_db()
+    for month, name, estimate in partitions(db):
+        click.echo('%-16s %s  ~%d shows' % (name, month.strftime('%Y-%m'), estimate))
+    default_rows = db.session.execute(text('SELECT count(*) FROM %s' % DEFAULT_PARTITION)).scalar()
+    click.echo('%-16s          %d shows' % (DEFAULT_PARTITION, default_rows))
@@ -0,0 +1,122 @@
+#----------------------------------------------------------------------------#
+# Purger.
+#
+# Deleting a venue or an artist only sets its deleted_at (see models.py), so
+# the request is a single-row UPDATE however many shows hang off it. The
+# shows of soft-deleted venues and artists are deleted here afterwards,
+# PURGE_BATCH_SIZE at a time, each batch in its own short transaction with
+# PURGE_PAUSE seconds between them, so the purge never holds locks on
+# thousands of rows or keeps the database busy for the requests. The venue
+# or artist row itself stays as a tombstone, outside the partial indexes the
+# pages read; the incremental exports report it with its deleted_at.
+#
+# A delete wakes a background thread in the worker that handled it, which
+# runs until nothing is left. The batches are idempotent, so a worker
+# restarted mid-purge loses nothing: the next delete, or
+#
+#   flask purge    # purge everything that is left, e.g. from cron
+#
+# picks up where it stopped.
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+
+class Purger(object):
+
+    def __init__(self):
+        self.batch_size = 500
+        self.pause = 0.05
+        self.background = True
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending = False
+        self.purged = 0
+        self.batches = 0
+        self.errors = 0
+
+    def init_app(self, app):
+        self.batch_size = app.config.get('PURGE_BATCH_SIZE', 500)
+        self.pause = app.config.get('PURGE_PAUSE', 0.05)
+        self.background = app.config.get('PURGE_IN_BACKGROUND', True)
+        app.cli.add_command(purge_command)
+
+    def purge_batch(self):
+        # deletes up to batch_size shows of deleted venues, or else of deleted
+        # artists; returns how many. the ids are selected first, so every
+        # database can run the DELETE and it touches exactly those rows
+        from extensions import db
+        from models import Venue, Artist, Show
+        for model, fk_column in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+            deleted = db.session.query(model.id).filter(model.deleted_at.isnot(None))
+            ids = [show_id for show_id, in db.session.query(Show.id)
+                                                     .filter(fk_column.in_(deleted.subquery()))
+                                                     .limit(self.batch_size)]
+            if ids:
+                Show.query.filter(Show.id.in_(ids)).delete(synchronize_session=False)
+                db.session.commit()
+                self.purged += len(ids)
+                self.batches += 1
+                return len(ids)
+        db.session.commit()
+        return 0
+
+    def purge(self, max_batches=None):
+        # batches until nothing is left (or max_batches); returns the shows deleted
+        total = batches = 0
+        while max_batches is None or batches < max_batches:
+            count = self.purge_batch()
+            if not count:
+                break
+            total += count
+            batches += 1
+            time.sleep(self.pause)
+        return total
+
+    def wake(self):
+        # called once a delete has committed: starts this worker's purge
+        # thread, or has the running one go round once more
+        if not self.background:
+            return
+        app = current_app._get_current_object()
+        with self._lock:
+            self._pending = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, args=(app,), name='purger', daemon=True)
+                self._thread.start()
+
+    def _run(self, app):
+        from extensions import db
+        with app.app_context():
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        self._thread = None
+                        return
+                    self._pending = False
+                try:
+                    self.purge()
+                except Exception:
+                    db.session.rollback()
+                    self.errors += 1
+                    app.logger.exception('purge failed; retried on the next delete or `flask purge`')
+                finally:
+                    db.session.remove()
+
+    def stats(self):
+        return {'purged': self.purged, 'batches': self.batches, 'errors': self.errors,
+                'running': self._thread is not None}
+
+
+@click.command('purge')
+@click.option('--max-batches', type=int, default=None, help='stop after this many batches')
+@with_appcontext
+def purge_command(max_batches):
+    """Delete the shows of soft-deleted venues and artists."""
+    from extensions import purger
+    click.echo('%d shows deleted' % purger.purge(max_batches))
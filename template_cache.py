@@ -0,0 +1,150 @@
+#----------------------------------------------------------------------------#
+# Template caches.
+#
+# Compiled templates go to a bytecode cache on disk (TEMPLATE_BYTECODE_CACHE_DIR,
+# instance/jinja by default), so a new worker loads what another one already
+# compiled instead of parsing every template again. Jinja checks each file's
+# checksum against its template source, so an edited template is recompiled.
+#
+# Rendered fragments go to a bounded in-process LRU through the {% cache %} tag:
+#
+#   {% cache show.id, show.updated_at %} ...tile... {% endcache %}
+#
+# renders the body once per key (plus the template and line of the tag) and
+# reuses the markup on every later page and request. The key must name every
+# version the body depends on -- updated_at of each row it shows -- since
+# entries are never invalidated, only pushed out by newer ones. Hit rates are
+# at /_metrics.
+#----------------------------------------------------------------------------#
+
+import os
+import threading
+
+from jinja2 import FileSystemBytecodeCache, nodes, pass_context
+from jinja2.ext import Extension
+
+from cache import LRUBackend
+
+# Jinja only checks a cached template against its source, so code compiled by
+# an older FragmentCacheExtension would still be loaded; bump this whenever
+# the code the extension generates changes
+BYTECODE_VERSION = 2
+
+
+class SharedBytecodeCache(FileSystemBytecodeCache):
+    # several workers write to the directory: a file is written under a
+    # temporary name and renamed into place, so none of them reads half of one
+
+    def __init__(self, directory):
+        FileSystemBytecodeCache.__init__(self, directory, '__jinja2_%%s.v%d.cache' % BYTECODE_VERSION)
+
+    def dump_bytecode(self, bucket):
+        filename = self._get_cache_filename(bucket)
+        partial = '%s.%d.%d.tmp' % (filename, os.getpid(), threading.get_ident())
+        with open(partial, 'wb') as out:
+            bucket.write_bytecode(out)
+        os.replace(partial, filename)
+
+
+class FragmentCacheExtension(Extension):
+    # {% cache key, ... %}body{% endcache %} compiles to
+    #
+    #   {% set fragment = key|_fragment_get %}
+    #   {% if fragment is none %}{% set fragment %}body{% endset %}{{ fragment|_fragment_set(key) }}
+    #   {% else %}{{ fragment }}{% endif %}
+    #
+    # rather than the usual call to an extension method with the body as a
+    # caller() macro: filters are called directly, while a call goes through
+    # context.call() and builds a Macro per tile, which cost more than
+    # rendering the tile
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+        environment.filters['_fragment_get'] = self._get
+        environment.filters['_fragment_set'] = self._set
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        # the same key in two tags (a show tile on the venue and on the
+        # artist page) is two different fragments
+        key = [nodes.Const('%s:%d' % (parser.name, lineno)), parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        key = nodes.Tuple(key, 'load')
+        name = '_fragment_%d' % lineno
+        store, load = nodes.Name(name, 'store'), nodes.Name(name, 'load')
+        return [
+            nodes.Assign(store, nodes.Filter(key, '_fragment_get', [], [], None, None)),
+            nodes.If(nodes.Test(load, 'none', [], [], None, None), [
+                nodes.AssignBlock(store, None, body),
+                nodes.Output([nodes.Filter(load, '_fragment_set', [key], [], None, None)]),
+            ], [], [nodes.Output([load])]),
+        ]
+
+    @pass_context
+    def _get(self, context, key):
+        # pass_context keeps the optimizer from calling this at compile time
+        # when the key is a constant
+        cache = self.environment.fragment_cache
+        return cache.get(key) if cache is not None else None
+
+    def _set(self, markup, key):
+        cache = self.environment.fragment_cache
+        if cache is not None:
+            cache.set(key, markup)
+        return markup
+
+
+class FragmentCache(object):
+
+    def __init__(self, max_entries=10000):
+        self.backend = LRUBackend(max_entries, ttl=0)
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        markup = self.backend.get(key)
+        if markup is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return markup
+
+    def set(self, key, markup):
+        if self.enabled:
+            self.backend.set(key, markup)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.backend.evictions,
+                'entries': len(self.backend), 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+
+class TemplateCache(object):
+
+    def __init__(self):
+        self.fragments = FragmentCache()
+
+    def init_app(self, app):
+        directory = app.config.get('TEMPLATE_BYTECODE_CACHE_DIR')
+        if directory is None:
+            directory = os.path.join(app.instance_path, 'jinja')
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            app.jinja_env.bytecode_cache = SharedBytecodeCache(directory)
+        self.fragments = FragmentCache(app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 10000))
+        self.fragments.enabled = app.config.get('FRAGMENT_CACHE_ENABLED', True)
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self.fragments
+
+    def stats(self):
+        return dict(self.fragments.stats(), enabled=self.fragments.enabled)
@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from extensions import db
+
+
+@pytest.fixture(scope='session')
+def app():
+    return create_app('tests.settings')
+
+
+@pytest.fixture
+def client(app):
+    # a fresh schema for every test
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield app.test_client()
+        db.session.remove()
+
+
+@pytest.fixture
+def count_queries(app):
+    # count_queries(fn) -> how many statements fn() sent to the database
+    def count(fn):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            fn()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        return len(statements)
+    return count
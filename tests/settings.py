@@ -0,0 +1,18 @@
+# The app's config for the test suite: a scratch SQLite database, and no
+# caches or background threads that would let one test see another's state.
+import os
+import tempfile
+
+from config import *
+
+DEBUG = False
+TESTING = True
+LOG_FILE = ''
+SCRATCH_DIR = tempfile.mkdtemp(prefix='fyyur-tests-')
+SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(SCRATCH_DIR, 'test.db')
+TEMPLATE_BYTECODE_CACHE_DIR = os.path.join(SCRATCH_DIR, 'jinja')
+SQLALCHEMY_BINDS = {}
+CACHE_ENABLED = False
+FRAGMENT_CACHE_ENABLED = False
+PURGE_IN_BACKGROUND = False
+THUMBNAILS_ENABLED = False
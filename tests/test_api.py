@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Venue, Artist, Show
+
+
+def add_data():
+    # three venues; the second has two upcoming shows and a past one
+    venues = [Venue(name='Venue %d' % i, city='Austin', state='TX') for i in range(3)]
+    artist = Artist(name='Band', city='Austin', state='TX')
+    db.session.add_all(venues + [artist])
+    db.session.flush()
+    now = datetime.now()
+    for days in (-3, 2, 5):
+        db.session.add(Show(venue_id=venues[1].id, artist_id=artist.id, start_time=now + timedelta(days=days)))
+    db.session.commit()
+    return [venue.id for venue in venues], artist.id
+
+
+def test_list_pages_by_id_with_sparse_fields(client):
+    venue_ids, _ = add_data()
+    body = client.get('/api/v1/venues?limit=2&fields=id,name,num_upcoming_shows').get_json()
+    assert body['data'] == [{'id': venue_ids[0], 'name': 'Venue 0', 'num_upcoming_shows': 0},
+                            {'id': venue_ids[1], 'name': 'Venue 1', 'num_upcoming_shows': 2}]
+    body = client.get(body['next']).get_json()
+    assert [venue['id'] for venue in body['data']] == [venue_ids[2]]
+    assert body['next'] is None
+
+
+def test_unknown_field_is_a_bad_request(client):
+    assert client.get('/api/v1/venues?fields=id,password').status_code == 400
+
+
+def test_detail_splits_shows_and_answers_conditional_requests(client):
+    venue_ids, artist_id = add_data()
+    response = client.get('/api/v1/venues/%d' % venue_ids[1])
+    data = response.get_json()['data']
+    assert (data['past_shows_count'], data['upcoming_shows_count']) == (1, 2)
+    assert data['upcoming_shows'][0]['artist_id'] == artist_id
+    assert client.get('/api/v1/venues/%d' % venue_ids[1],
+                      headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get('/api/v1/venues/999').status_code == 404
+
+
+def test_search_matches_the_page(client):
+    add_data()
+    body = client.get('/api/v1/venues/search?q=venue 1&fields=name,num_upcoming_shows').get_json()
+    assert body['data'] == [{'name': 'Venue 1', 'num_upcoming_shows': 2}]
+
+
+def test_list_leaves_out_counts_unless_asked_and_links_the_next_page(client):
+    venue_ids, _ = add_data()
+    response = client.get('/api/v1/venues?limit=2')
+    body = response.get_json()
+    assert 'num_upcoming_shows' not in body['data'][0]
+    assert body['data'][0]['genres'] == []
+    assert response.headers['Link'] == '<%s>; rel="next"' % body['next']
+
+
+def test_cached_list_statement_counts_at_request_time(client):
+    venue_ids, _ = add_data()
+    path = '/api/v1/venues?fields=id,num_upcoming_shows'
+    assert client.get(path).get_json()['data'][1]['num_upcoming_shows'] == 2
+    Show.query.filter(Show.venue_id == venue_ids[1], Show.start_time > datetime.now()) \
+              .order_by(Show.start_time).first().start_time = datetime.now() - timedelta(days=1)
+    db.session.commit()
+    assert client.get(path).get_json()['data'][1]['num_upcoming_shows'] == 1
+
+
+def test_shows_pages_forward_and_back(client):
+    add_data()
+    first = client.get('/api/v1/shows?limit=2').get_json()
+    second = client.get(first['next']).get_json()
+    assert len(first['data']) == 2 and len(second['data']) == 1
+    assert client.get(second['prev']).get_json()['data'] == first['data']
+    upcoming = client.get('/api/v1/shows?upcoming=1').get_json()['data']
+    assert [show['id'] for show in upcoming] == [show['id'] for show in first['data'][1:] + second['data']]
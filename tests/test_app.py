@@ -0,0 +1,22 @@
+import pytest
+
+from app import create_app
+from benchmarks.startup import FORBIDDEN, TARGETS, run
+
+
+def test_cli_app_has_the_commands_but_no_pages():
+    app = create_app('tests.settings', web=False)
+    assert 'import' in app.cli.commands and 'partitions' in app.cli.commands
+    assert [rule.endpoint for rule in app.url_map.iter_rules()] == ['static']
+
+
+def test_web_app_serves_the_pages_and_the_api():
+    endpoints = set(rule.endpoint for rule in create_app('tests.settings').url_map.iter_rules())
+    assert {'index', 'venues', 'show_venue', 'api_entities'} <= endpoints
+
+
+@pytest.mark.parametrize('target', sorted(TARGETS))
+def test_startup_leaves_out_what_it_does_not_serve(target):
+    modules, _, _ = run(TARGETS[target])
+    loaded = set(name.split('.')[0] for name in modules)
+    assert loaded.isdisjoint(FORBIDDEN[target])
@@ -0,0 +1,81 @@
+import json
+import os
+
+import pytest
+from flask import Flask
+
+import assets
+from assets import StaticAssets, build
+
+CSS = b'/* site */\nbody {\n  background: url("../img/bg.png");\n}\n' * 20
+
+
+@pytest.fixture
+def static(tmp_path, monkeypatch):
+    # a static folder with one stylesheet, one script and one image, and a
+    # bundle of the first two
+    for path, content in (('css/site.css', CSS), ('js/site.js', b'var answer = 42;\n' * 50),
+                          ('img/bg.png', b'\x89PNG not really')):
+        os.makedirs(str(tmp_path / os.path.dirname(path)), exist_ok=True)
+        (tmp_path / path).write_bytes(content)
+    monkeypatch.setattr(assets, 'BUNDLES', {'bundle/site.css': ['css/site.css']})
+    monkeypatch.setattr(assets, 'RESPONSIVE', {})
+    return tmp_path
+
+
+def manifest(static):
+    with open(str(static / 'dist' / 'manifest.json')) as source:
+        return json.load(source)
+
+
+def test_build_fingerprints_bundles_and_compresses(static):
+    build(str(static))
+    files = manifest(static)['files']
+    image = files['img/bg.png']
+    assert image.startswith('dist/img/bg.') and (static / image).exists()
+    stylesheet = (static / files['css/site.css']).read_bytes()
+    # the url() points at the hashed image, relative to the hashed stylesheet
+    assert ('url(../%s)' % image[len('dist/'):]).encode() in stylesheet
+    bundle = (static / files['bundle/site.css']).read_bytes()
+    assert b'/* site */' not in bundle and len(bundle) < len(CSS)
+    assert (static / (files['js/site.js'] + '.gz')).exists()
+    assert not (static / (image + '.gz')).exists()
+
+
+def test_changed_file_gets_a_new_name_and_clean_drops_the_old(static):
+    build(str(static))
+    old = manifest(static)['files']['js/site.js']
+    (static / 'js' / 'site.js').write_bytes(b'var answer = 43;\n' * 50)
+    build(str(static))
+    new = manifest(static)['files']['js/site.js']
+    assert new != old and (static / old).exists()
+    build(str(static), clean=True)
+    assert not (static / old).exists() and not (static / (old + '.gz')).exists()
+    assert (static / new).exists()
+
+
+def test_hashed_files_are_immutable_and_sent_compressed(static):
+    build(str(static))
+    app = Flask(__name__, static_folder=str(static), static_url_path='/static')
+    served = StaticAssets()
+    served.init_app(app)
+    client = app.test_client()
+    with app.test_request_context():
+        url = served.url('js/site.js')
+        assert served.urls('bundle/site.css') == [served.url('bundle/site.css')]
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'Accept-Encoding' in response.headers['Vary']
+    plain = client.get('/static/js/site.js')
+    assert plain.status_code == 200
+    assert 'immutable' not in plain.headers.get('Cache-Control', '')
+    plain.close()
+
+
+def test_without_a_build_bundles_are_their_members(static):
+    app = Flask(__name__, static_folder=str(static), static_url_path='/static')
+    served = StaticAssets()
+    served.init_app(app)
+    with app.test_request_context():
+        assert served.urls('bundle/site.css') == ['/static/css/site.css']
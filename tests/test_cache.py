@@ -0,0 +1,45 @@
+from flask import Flask
+
+from cache import LRUBackend, ResponseCache, TagVersions, add_cache_tags
+
+
+def test_pages_do_not_push_out_tag_versions():
+    # room for two pages; the second carries more tags than that
+    cache = ResponseCache(LRUBackend(max_entries=2, ttl=0))
+    cache.set('venue', 'page', tags=['venue:1'])
+    cache.set('busy', 'page', tags=['artist:%d' % i for i in range(10)])
+    assert cache.get('venue') == 'page'
+    assert cache.get('busy') == 'page'
+    assert len(cache.tags) == 11
+
+
+def test_tag_store_starts_over_when_full():
+    cache = ResponseCache(LRUBackend(ttl=0), TagVersions(max_tags=2))
+    cache.set('page', 'body', tags=['a', 'b'])
+    assert cache.get('page') == 'body'
+    cache.invalidate('c')
+    assert cache.tags.resets == 1
+    assert cache.get('page') is None
+
+
+def test_tag_added_while_building_and_invalidated_is_not_cached():
+    app = Flask(__name__)
+    cache = ResponseCache(LRUBackend(ttl=0))
+    cache.invalidate('venue:1')
+
+    @app.route('/venue')
+    @cache.cached('venues')
+    def venue():
+        add_cache_tags('venue:1')
+        # an edit that lands while the page is being built
+        if app.config.get('EDIT_WHILE_BUILDING'):
+            cache.invalidate('venue:1')
+        return 'venue'
+
+    client = app.test_client()
+    app.config['EDIT_WHILE_BUILDING'] = True
+    client.get('/venue')
+    assert cache.get('page:/venue?') is None
+    app.config['EDIT_WHILE_BUILDING'] = False
+    client.get('/venue')
+    assert cache.get('page:/venue?') is not None
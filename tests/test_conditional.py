@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import views
+from extensions import db
+from models import Venue, Artist, Show
+
+
+@pytest.fixture
+def pages(client):
+    # a venue and an artist with one upcoming show; their page paths
+    venue = Venue(name='Hall', city='Austin', state='TX')
+    artist = Artist(name='Band', city='Austin', state='TX')
+    db.session.add_all([venue, artist])
+    db.session.flush()
+    db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime.now() + timedelta(days=7)))
+    db.session.commit()
+    return {'venue': '/venues/%d' % venue.id, 'artist': '/artists/%d' % artist.id,
+            'shows': '/shows', 'venue_id': venue.id}
+
+
+def not_rendered(*args, **kwargs):
+    raise AssertionError('a 304 must not render the template')
+
+
+@pytest.mark.parametrize('page', ['venue', 'artist', 'shows'])
+def test_matching_validators_get_a_304_without_rendering(client, pages, monkeypatch, page):
+    response = client.get(pages[page])
+    assert response.status_code == 200
+    etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+    monkeypatch.setattr(views, 'render_template', not_rendered)
+    assert client.get(pages[page], headers={'If-None-Match': etag}).status_code == 304
+    assert client.get(pages[page], headers={'If-Modified-Since': last_modified}).status_code == 304
+
+
+@pytest.mark.parametrize('page', ['venue', 'artist', 'shows'])
+def test_editing_the_venue_changes_every_page_that_shows_it(client, pages, page):
+    etag = client.get(pages[page]).headers['ETag']
+    Venue.query.get(pages['venue_id']).updated_at = datetime.now()
+    db.session.commit()
+    response = client.get(pages[page], headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_unknown_venue_is_not_found_before_any_validators(client):
+    assert client.get('/venues/1', headers={'If-None-Match': '"x"'}).status_code == 404
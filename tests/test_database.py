@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import create_engine, exc
+
+from config import env_timeouts
+from database import TimedQueuePool
+from extensions import db
+from models import Venue
+
+
+@pytest.fixture
+def replicas(client, monkeypatch):
+    # one replica configured; the requests that would read from it are
+    # recorded and served by the primary
+    routed = []
+    monkeypatch.setattr(db, 'replicas', lambda: ['replica_1'])
+    monkeypatch.setattr(db, 'pick_replica', lambda: routed.append(True))
+    return routed
+
+
+def sticks(client):
+    # whether the client's session pins it to the primary
+    with client.session_transaction() as session:
+        return '_db_primary_until' in session
+
+
+def test_searches_read_from_a_replica_and_do_not_stick(client, replicas):
+    for path in ('/venues/search', '/artists/search'):
+        assert client.post(path, data={'search_term': 'x'}).status_code == 200
+        assert not sticks(client)
+    assert len(replicas) == 2
+
+
+def test_only_requests_that_wrote_stick(client, replicas):
+    venue = Venue(name='Venue', city='Austin', state='TX')
+    db.session.add(venue)
+    db.session.commit()
+    venue_id = venue.id
+    client.delete('/venues/%d' % (venue_id + 1))
+    assert not sticks(client)
+    client.delete('/venues/%d' % venue_id)
+    assert sticks(client)
+    # the client now reads from the primary
+    client.get('/venues')
+    assert replicas == []
+
+
+def test_statement_timeouts_per_endpoint(app, monkeypatch):
+    monkeypatch.setenv('DB_STATEMENT_TIMEOUTS', 'search_venues=2000, export=0,junk')
+    assert env_timeouts('DB_STATEMENT_TIMEOUTS') == {'search_venues': 2000, 'export': 0}
+    monkeypatch.setitem(app.config, 'DB_STATEMENT_TIMEOUT_MS', 5000)
+    monkeypatch.setitem(app.config, 'DB_STATEMENT_TIMEOUTS', {'search_venues': 2000, 'export': 0})
+    with app.app_context():
+        assert db.statement_timeout('search_venues') == 2000
+        assert db.statement_timeout('export') == 0
+        assert db.statement_timeout('show_venue') == 5000
+        # the CLI and migrations run without a limit
+        assert db.statement_timeout(None) == 0
+
+
+def test_pool_records_checkout_waits_and_timeouts(tmp_path):
+    engine = create_engine('sqlite:///%s' % (tmp_path / 'pool.db'), poolclass=TimedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    held = engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    held.close()
+    engine.connect().close()
+    report = engine.pool.report()
+    assert (report['checkouts'], report['timeouts']) == (2, 1)
+    assert report['max_wait_ms'] >= 50
+    assert report['checked_out'] == 0
+    assert sum(report['wait_histogram'].values()) == 3
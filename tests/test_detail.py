@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Venue, Artist, Show
+
+
+def add_shows(past, upcoming):
+    # a venue and an artist with `past` shows behind them and `upcoming` ahead
+    venue = Venue(name='Hall', city='Austin', state='TX')
+    artist = Artist(name='Band', city='Austin', state='TX')
+    db.session.add_all([venue, artist])
+    db.session.flush()
+    now = datetime.now()
+    for days in list(range(-past, 0)) + list(range(1, upcoming + 1)):
+        db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=now + timedelta(days=days)))
+    db.session.commit()
+    return venue.id, artist.id
+
+
+def test_detail_pages_split_past_and_upcoming(client):
+    venue_id, artist_id = add_shows(past=1, upcoming=2)
+    for path in ('/venues/%d' % venue_id, '/artists/%d' % artist_id):
+        page = client.get(path).data
+        assert b'2 Upcoming Shows' in page
+        assert b'1 Past Show' in page
+
+
+def test_detail_query_count_does_not_grow_with_shows(client, count_queries):
+    venue_id, artist_id = add_shows(past=1, upcoming=1)
+    few = [count_queries(lambda: client.get('/venues/%d' % venue_id)),
+           count_queries(lambda: client.get('/artists/%d' % artist_id))]
+    db.session.remove()
+    busy_venue_id, busy_artist_id = add_shows(past=20, upcoming=20)
+    many = [count_queries(lambda: client.get('/venues/%d' % busy_venue_id)),
+            count_queries(lambda: client.get('/artists/%d' % busy_artist_id))]
+    assert many == few
+
@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Venue, Artist, Show, Genre
+
+
+def export(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    return list(csv.DictReader(io.StringIO(response.data.decode())))
+
+
+def test_cursor_resumes_inside_a_run_of_equal_timestamps(client):
+    stamp = datetime(2026, 1, 1, 12, 0, 0)
+    venues = [Venue(name='Venue %d' % i, city='Austin', state='TX', updated_at=stamp) for i in range(3)]
+    db.session.add_all(venues)
+    db.session.commit()
+    first = venues[0].id
+    rows = export(client, '/export/venues?since=%s&after=%d' % (stamp.isoformat(), first))
+    assert [int(row['id']) for row in rows] == [first + 1, first + 2]
+    rows = export(client, '/export/venues?since=%s' % stamp.isoformat())
+    assert len(rows) == 3
+
+
+def test_shows_feed_reports_deleted_venues_and_artists(client):
+    artist = Artist(name='Artist', city='Austin', state='TX')
+    dropped = Artist(name='Dropped', city='Austin', state='TX')
+    kept = Venue(name='Kept', city='Austin', state='TX')
+    gone = Venue(name='Gone', city='Austin', state='TX')
+    db.session.add_all([artist, dropped, kept, gone])
+    db.session.flush()
+    start = datetime.now() + timedelta(days=1)
+    db.session.add_all([Show(venue_id=kept.id, artist_id=artist.id, start_time=start),
+                        Show(venue_id=gone.id, artist_id=artist.id, start_time=start + timedelta(days=1))])
+    db.session.commit()
+    kept_id, gone_id, dropped_id = kept.id, gone.id, dropped.id
+    since = datetime.now() - timedelta(minutes=1)
+    assert client.delete('/venues/%d' % gone_id).status_code == 200
+    assert client.delete('/artists/%d' % dropped_id).status_code == 200
+    rows = export(client, '/export/shows?since=%s' % since.isoformat())
+    tombstone, artist_tombstone, show = rows
+    assert tombstone['id'] == '' and tombstone['venue_id'] == str(gone_id) and tombstone['deleted_at']
+    assert artist_tombstone['artist_id'] == str(dropped_id) and artist_tombstone['venue_id'] == ''
+    assert show['venue_id'] == str(kept_id) and show['deleted_at'] == ''
+
+
+def test_ndjson_export_streams_every_batch_with_genres(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'EXPORT_BATCH_SIZE', 2)
+    jazz = Genre(name='Jazz')
+    db.session.add_all([Artist(name='Artist %d' % i, city='Austin', state='TX', genres=[jazz] if i % 2 else [])
+                        for i in range(5)])
+    db.session.commit()
+    response = client.get('/export/artists?format=ndjson')
+    rows = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [row['name'] for row in rows] == ['Artist %d' % i for i in range(5)]
+    assert [row['genres'] for row in rows] == ['', 'Jazz', '', 'Jazz', '']
+    assert client.get('/export/artists?format=xml').status_code == 400
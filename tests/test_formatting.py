@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from babel.dates import format_datetime
+
+from formatting import DateFormatter, PATTERNS
+
+
+def test_matches_babel_for_every_named_pattern():
+    formatter = DateFormatter()
+    value = datetime(2030, 3, 7, 21, 5)
+    for name, pattern in PATTERNS.items():
+        assert formatter.format(value, name) == format_datetime(value, pattern, locale='en')
+
+
+def test_other_formats_and_strings_go_through_babel():
+    formatter = DateFormatter()
+    assert formatter.format('2030-03-07 21:05:00', 'yyyy-MM-dd HH:mm') == '2030-03-07 21:05'
+
+
+def test_repeated_values_come_from_the_cache():
+    formatter = DateFormatter(cache_size=2)
+    values = [datetime(2030, 1, 1, 20), datetime(2030, 1, 2, 20), datetime(2030, 1, 1, 20)]
+    labels = formatter.format_many(values, 'full')
+    assert labels == [formatter.format(value, 'full') for value in values]
+    assert labels[0] == labels[2] != labels[1]
+    info = formatter.cache_info()
+    assert info.misses == 2 and info.currsize == 2
@@ -0,0 +1,37 @@
+from extensions import db
+from models import Venue, Artist, Genre
+
+
+def form(name, genres, **fields):
+    # a create form for a venue or artist in Austin with the given genres
+    data = dict(name=name, city='Austin', state='TX', address='1 Main St', phone='', image_link='',
+                facebook_link='', website_link='', seeking_description='', genres=genres)
+    data.update(fields)
+    return data
+
+
+def test_submitted_genres_share_one_row_per_name(client):
+    client.post('/venues/create', data=form('Hall', ['Jazz', 'Rock', 'Jazz']))
+    client.post('/artists/create', data=form('Band', ['Jazz', 'Folk']))
+    assert sorted(genre.name for genre in Genre.query) == ['Folk', 'Jazz', 'Rock']
+    assert sorted(genre.name for genre in Venue.query.one().genres) == ['Jazz', 'Rock']
+    assert sorted(genre.name for genre in Artist.query.one().genres) == ['Folk', 'Jazz']
+
+
+def test_genre_page_lists_its_live_artists_and_venues(client):
+    jazz, rock = Genre(name='Jazz'), Genre(name='Rock')
+    db.session.add_all([Venue(name='Hall', city='Austin', state='TX', genres=[jazz]),
+                        Venue(name='Cellar', city='Austin', state='TX', genres=[rock]),
+                        Artist(name='Band', city='Austin', state='TX', genres=[jazz, rock]),
+                        Artist(name='Gone', city='Austin', state='TX', genres=[jazz])])
+    db.session.commit()
+    gone_id = Artist.query.filter_by(name='Gone').one().id
+    client.delete('/artists/%d' % gone_id)
+    page = client.get('/genres/Jazz').data
+    assert b'<h5>Band</h5>' in page and b'<h5>Hall</h5>' in page
+    assert b'Gone' not in page and b'Cellar' not in page
+    assert b'1 Artist' in page and b'1 Venue' in page
+
+
+def test_unknown_genre_is_not_found(client):
+    assert client.get('/genres/Polka').status_code == 404
@@ -0,0 +1,57 @@
+import importlib.util
+import logging
+import os
+import sys
+import types
+
+import pytest
+
+import app as app_module
+
+CONF = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py')
+
+
+def load_conf():
+    spec = importlib.util.spec_from_file_location('gunicorn_conf', CONF)
+    conf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(conf)
+    return conf
+
+
+def server(worker_class):
+    return types.SimpleNamespace(cfg=types.SimpleNamespace(worker_class_str=worker_class))
+
+
+@pytest.fixture
+def patched(monkeypatch):
+    # a stand-in psycogreen that records whether psycopg2 was patched
+    calls = []
+    module = types.ModuleType('psycogreen.gevent')
+    module.patch_psycopg = lambda: calls.append(True)
+    monkeypatch.setitem(sys.modules, 'psycogreen', types.ModuleType('psycogreen'))
+    monkeypatch.setitem(sys.modules, 'psycogreen.gevent', module)
+    return calls
+
+
+def test_worker_class_comes_from_the_environment(monkeypatch):
+    monkeypatch.delenv('GUNICORN_WORKER_CLASS', raising=False)
+    assert load_conf().worker_class == 'sync'
+    monkeypatch.setenv('GUNICORN_WORKER_CLASS', 'gevent')
+    assert load_conf().worker_class == 'gevent'
+
+
+def test_only_gevent_workers_make_psycopg2_cooperative(patched):
+    conf = load_conf()
+    conf.post_fork(server('sync'), None)
+    assert patched == []
+    conf.post_fork(server('gunicorn.workers.ggevent.GeventWorker'), None)
+    assert patched == [True]
+
+
+def test_worker_starts_when_the_pool_cannot_be_prewarmed(monkeypatch, caplog):
+    def unreachable(app=None):
+        raise RuntimeError('connection refused')
+    monkeypatch.setattr(app_module.db, 'prewarm', unreachable)
+    worker = types.SimpleNamespace(log=logging.getLogger('gunicorn.test'))
+    load_conf().post_worker_init(worker)
+    assert 'could not prewarm the connection pool' in caplog.text
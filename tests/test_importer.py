@@ -0,0 +1,97 @@
+import json
+from datetime import datetime
+
+from extensions import db
+from importer import Importer, import_command
+from models import Venue, Artist, Show, Genre
+
+
+def import_shows(app, tmp_path, rows):
+    # runs `flask import shows` on rows; returns the rejected row numbers
+    path = tmp_path / 'shows.jsonl'
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    result = app.test_cli_runner().invoke(import_command, ['shows', str(path)])
+    assert result.exception is None, result.output
+    rejects = tmp_path / 'shows.jsonl.rejects.jsonl'
+    if not rejects.exists():
+        return []
+    return [json.loads(line)['row'] for line in rejects.read_text().splitlines()]
+
+
+def test_non_numeric_ids_are_rejected_not_fatal(app, client, tmp_path):
+    db.session.add_all([Venue(name='Hall', city='Austin', state='TX'),
+                        Artist(name='Band', city='Austin', state='TX')])
+    db.session.commit()
+    rejected = import_shows(app, tmp_path, [
+        {'venue_id': 'abc', 'artist_id': 1, 'start_time': '2030-01-01 20:00:00'},
+        {'venue_id': 1, 'artist_id': '1.5', 'start_time': '2030-01-02 20:00:00'},
+        {'venue_id': 1, 'artist_id': 1, 'start_time': '2030-01-03 20:00:00'},
+    ])
+    assert rejected == [1, 2]
+    assert Show.query.count() == 1
+
+
+def test_venue_deleted_after_resolving_is_rejected(app, client, tmp_path, monkeypatch):
+    hall, club = Venue(name='Hall', city='Austin', state='TX'), Venue(name='Club', city='Austin', state='TX')
+    db.session.add_all([hall, club, Artist(name='Band', city='Austin', state='TX')])
+    db.session.commit()
+    hall_id, club_id = hall.id, club.id
+    resolve = Importer.resolve
+
+    def resolve_then_delete(self, model, rows, id_key, name_key):
+        # the venue is deleted by another request once it was resolved
+        resolved = resolve(self, model, rows, id_key, name_key)
+        if model is Venue:
+            Venue.query.filter_by(id=hall_id).update({'deleted_at': datetime.now()})
+        return resolved
+    monkeypatch.setattr(Importer, 'resolve', resolve_then_delete)
+    rejected = import_shows(app, tmp_path, [
+        {'venue_name': 'Hall', 'artist_id': 1, 'start_time': '2030-01-01 20:00:00'},
+        {'venue_name': 'Club', 'artist_id': 1, 'start_time': '2030-01-02 20:00:00'},
+    ])
+    assert rejected == [1]
+    assert [show.venue_id for show in Show.query] == [club_id]
+
+
+def test_csv_venues_share_genres_and_bad_rows_are_set_aside(app, client, tmp_path):
+    path = tmp_path / 'venues.csv'
+    path.write_text('name,city,state,address,phone,facebook_link,genres\n'
+                    'Hall,Austin,TX,1 Main St,512-555-0100,https://facebook.com/hall,Jazz;Blues\n'
+                    'Club,Austin,TX,2 Main St,512-555-0101,https://facebook.com/club,Jazz\n'
+                    'Nowhere,,TX,3 Main St,512-555-0102,https://facebook.com/nowhere,Jazz\n')
+    result = app.test_cli_runner().invoke(import_command, ['venues', str(path), '--chunk-size', '2'])
+    assert 'imported 2 venues' in result.output, result.output
+    assert sorted(genre.name for genre in Genre.query) == ['Blues', 'Jazz']
+    assert sorted(len(venue.genres) for venue in Venue.query) == [1, 2]
+    rejects = [json.loads(line) for line in (tmp_path / 'venues.csv.rejects.jsonl').read_text().splitlines()]
+    assert [(reject['row'], list(reject['errors'])) for reject in rejects] == [(3, ['city'])]
+
+
+def test_shows_by_name_without_double_booking(app, client, tmp_path):
+    db.session.add_all([Venue(name='Hall', city='Austin', state='TX'),
+                        Artist(name='Band', city='Austin', state='TX'),
+                        Artist(name='Duo', city='Austin', state='TX')])
+    db.session.commit()
+    rejected = import_shows(app, tmp_path, [
+        {'venue_name': 'Hall', 'artist_name': 'Band', 'start_time': '2030-01-01 20:00:00', 'duration': 90},
+        {'venue_name': 'Hall', 'artist_name': 'Duo', 'start_time': '2030-01-01 21:00:00'},
+        {'venue_name': 'Hall', 'artist_name': 'Duo', 'start_time': '2030-01-01 21:30:00'},
+        {'venue_name': 'Barn', 'artist_name': 'Duo', 'start_time': '2030-01-02 20:00:00'},
+    ])
+    assert sorted(rejected) == [2, 4]
+    assert [show.start_time for show in Show.query.order_by(Show.start_time)] == \
+        [datetime(2030, 1, 1, 20), datetime(2030, 1, 1, 21, 30)]
+
+
+def test_rerun_resumes_after_the_checkpoint(app, client, tmp_path):
+    db.session.add_all([Venue(name='Hall', city='Austin', state='TX'),
+                        Artist(name='Band', city='Austin', state='TX')])
+    db.session.commit()
+    path = tmp_path / 'shows.jsonl'
+    path.write_text(''.join(json.dumps({'venue_id': 1, 'artist_id': 1, 'start_time': '2030-01-0%d 20:00:00' % day})
+                            + '\n' for day in range(1, 5)))
+    (tmp_path / 'shows.jsonl.checkpoint').write_text(json.dumps({'rows': 2}))
+    result = app.test_cli_runner().invoke(import_command, ['shows', str(path)])
+    assert 'resuming after row 2' in result.output
+    assert [show.start_time.day for show in Show.query.order_by(Show.start_time)] == [3, 4]
+    assert not (tmp_path / 'shows.jsonl.checkpoint').exists()
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+import pytest
+
+from benchmarks.explain_plans import QUERIES, explain, sample_params
+from extensions import db
+from models import Venue, Artist, Show
+
+
+@pytest.mark.parametrize('name, index', [
+    ('venue_upcoming_shows', 'ix_shows_venue_id_start_time_artist_id (venue_id=? AND start_time>?)'),
+    ('artist_upcoming_shows', 'ix_shows_artist_id_start_time (artist_id=? AND start_time>?)'),
+    ('venue_detail_shows', 'ix_shows_venue_id_start_time_artist_id (venue_id=?)'),
+    ('upcoming_counts_batch', 'ix_shows_venue_id_start_time_artist_id (venue_id=? AND start_time>?)'),
+])
+def test_show_queries_search_the_composite_indexes(client, name, index):
+    venue = Venue(name='Hall', city='Austin', state='TX')
+    artist = Artist(name='Band', city='Austin', state='TX')
+    db.session.add_all([venue, artist])
+    db.session.flush()
+    db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime(2030, 1, 1, 20)))
+    db.session.commit()
+    plan = explain(QUERIES[name], sample_params())
+    assert any(line.startswith('SEARCH shows USING') and line.endswith(index) for line in plan), plan
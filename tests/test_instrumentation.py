@@ -0,0 +1,48 @@
+from extensions import sql_metrics
+from instrumentation import UNMATCHED, RequestSQL, statement_shape
+from tests.test_venues import add_venues
+
+
+def test_unmatched_paths_share_one_bucket(client):
+    sql_metrics.reset()
+    for i in range(5):
+        assert client.get('/no/such/page/%d' % i).status_code == 404
+    assert list(sql_metrics.metrics()) == [UNMATCHED]
+    assert sql_metrics.metrics()[UNMATCHED]['requests'] == 5
+
+
+def test_streamed_export_statements_are_counted(client):
+    add_venues(3)
+    sql_metrics.reset()
+    response = client.get('/export/venues')
+    assert response.data.count(b'\n') == 4
+    response.close()
+    stats = sql_metrics.metrics()['export']
+    assert stats['requests'] == 1
+    assert stats['queries'] >= 1
+    assert 'Server-Timing' not in response.headers
+
+
+def test_server_timing_header(client):
+    add_venues(2)
+    response = client.get('/venues')
+    assert 'queries' in response.headers['Server-Timing']
+
+
+def test_same_query_with_other_ids_is_one_shape():
+    assert statement_shape('SELECT * FROM shows\n WHERE venue_id = 12') == \
+        statement_shape('SELECT * FROM shows WHERE venue_id = 7')
+    assert statement_shape('SELECT * FROM genres WHERE id IN (?, ?, ?)') == \
+        'SELECT * FROM genres WHERE id IN (?)'
+
+
+def test_repeated_shape_is_reported_as_a_probable_n_plus_one(app, monkeypatch, caplog):
+    monkeypatch.setattr(sql_metrics, 'threshold', 2)
+    sql_metrics.reset()
+    sql = RequestSQL()
+    sql.record('SELECT * FROM venues', 1.0)
+    for venue_id in range(3):
+        sql.record('SELECT * FROM shows WHERE venue_id = %d' % venue_id, 1.0)
+    sql_metrics._report('venues', sql)
+    assert 'probable N+1 in venues: 3 x SELECT * FROM shows WHERE venue_id = N' in caplog.text
+    assert sql_metrics.metrics()['venues']['nplusone_requests'] == 1
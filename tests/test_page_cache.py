@@ -0,0 +1,62 @@
+import pytest
+
+from cache import LRUBackend, TagVersions
+from extensions import db, page_cache
+from models import Venue, Artist
+
+
+@pytest.fixture
+def cache(client, monkeypatch):
+    # the page cache switched on, with empty stores of its own
+    monkeypatch.setattr(page_cache, 'enabled', True)
+    monkeypatch.setattr(page_cache, 'backend', LRUBackend(ttl=0))
+    monkeypatch.setattr(page_cache, 'tags', TagVersions())
+    return page_cache
+
+
+def add_venue_and_artist():
+    venue = Venue(name='Hall', city='Austin', state='TX')
+    artist = Artist(name='Band', city='Austin', state='TX')
+    db.session.add_all([venue, artist])
+    db.session.commit()
+    return venue.id, artist.id
+
+
+def edit_form(name):
+    return dict(name=name, city='Austin', state='TX', address='1 Main St', phone='', image_link='',
+                facebook_link='', website_link='', seeking_description='', genres=['Jazz'])
+
+
+def test_repeated_page_is_served_without_queries(client, cache, count_queries):
+    venue_id, _ = add_venue_and_artist()
+    first = client.get('/venues/%d' % venue_id).data
+    hits = cache.hits
+    assert count_queries(lambda: client.get('/venues/%d' % venue_id)) == 0
+    assert cache.hits == hits + 1
+    assert client.get('/venues/%d' % venue_id).data == first
+
+
+def test_edit_invalidates_the_page_and_the_listing(client, cache):
+    venue_id, _ = add_venue_and_artist()
+    client.get('/venues/%d' % venue_id)
+    client.get('/venues')
+    client.post('/venues/%d/edit' % venue_id, data=edit_form('Renamed Hall'))
+    assert b'Renamed Hall' in client.get('/venues/%d' % venue_id).data
+    assert b'Renamed Hall' in client.get('/venues').data
+
+
+def test_new_show_invalidates_its_venue_and_artist_pages(client, cache):
+    venue_id, artist_id = add_venue_and_artist()
+    for path in ('/venues/%d' % venue_id, '/artists/%d' % artist_id):
+        assert b'0 Upcoming Shows' in client.get(path).data
+    client.post('/shows/create', data={'venue_id': venue_id, 'artist_id': artist_id,
+                                       'start_time': '2030-01-01 20:00:00'})
+    for path in ('/venues/%d' % venue_id, '/artists/%d' % artist_id):
+        assert b'1 Upcoming Show' in client.get(path).data
+
+
+def test_deleted_venue_page_is_not_served_from_the_cache(client, cache):
+    venue_id, _ = add_venue_and_artist()
+    assert client.get('/venues/%d' % venue_id).status_code == 200
+    client.delete('/venues/%d' % venue_id)
+    assert client.get('/venues/%d' % venue_id).status_code == 404
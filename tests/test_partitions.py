@@ -0,0 +1,114 @@
+# The shows partitions only exist on PostgreSQL. These tests run the
+# migrations and `flask partitions` against the database TEST_POSTGRES_URL
+# points at, which they empty first; without it (or psycopg2) they are skipped.
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import text
+
+pytest.importorskip('psycopg2')
+pytestmark = pytest.mark.skipif(not os.environ.get('TEST_POSTGRES_URL'),
+                                reason='TEST_POSTGRES_URL is not set')
+
+from flask_migrate import Migrate, upgrade, downgrade
+
+from app import create_app
+from extensions import db, page_cache
+from models import Venue, Artist, Show
+from partitions import month_start, partition_name, partitions, DEFAULT_PARTITION, ARCHIVE_SCHEMA
+
+BEFORE = 'f2a6c9e0d4b8'  # the revision before shows were partitioned
+
+
+@pytest.fixture
+def postgres():
+    app = create_app('tests.settings')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['TEST_POSTGRES_URL']
+    Migrate(app, db)
+    with app.app_context():
+        db.session.execute(text('DROP SCHEMA IF EXISTS public CASCADE'))
+        db.session.execute(text('DROP SCHEMA IF EXISTS %s CASCADE' % ARCHIVE_SCHEMA))
+        db.session.execute(text('CREATE SCHEMA public'))
+        # the first migration replaces the tables of the app's first version
+        db.session.execute(text('CREATE TABLE "Venue" (id serial PRIMARY KEY)'))
+        db.session.execute(text('CREATE TABLE "Artist" (id serial PRIMARY KEY)'))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.get_engine(app).dispose()
+
+
+def migrate(command, revision):
+    # alembic runs on a connection of its own; the session lets go of its
+    # locks first
+    db.session.remove()
+    command(revision=revision)
+
+
+def count(table):
+    return db.session.execute(text('SELECT count(*) FROM %s' % table)).scalar()
+
+
+def test_migrations_and_partition_commands(postgres):
+    runner = postgres.test_cli_runner()
+    migrate(upgrade, 'head')
+    this_month = month_start(datetime.now())
+    old = this_month - relativedelta(months=24)
+    venue = Venue(name='Hall', city='Austin', state='TX')
+    artist = Artist(name='Band', city='Austin', state='TX')
+    db.session.add_all([venue, artist])
+    db.session.flush()
+    for start in (old + timedelta(days=3), this_month + timedelta(days=40, hours=20)):
+        db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=start))
+    db.session.commit()
+    venue_id, artist_id = venue.id, artist.id
+
+    # down to an unpartitioned table and back: the rows come along, and
+    # every month with shows gets its partition
+    migrate(downgrade, BEFORE)
+    assert count('shows') == 2
+    migrate(upgrade, 'head')
+    assert count('shows') == 2
+    months = [month for month, _, _ in partitions(db)]
+    assert old in months and this_month in months
+    assert count(DEFAULT_PARTITION) == 0
+
+    # the exclusion constraint holds on every partition
+    db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=old + timedelta(days=3, hours=1)))
+    with pytest.raises(Exception, match='venue_no_overlap'):
+        db.session.commit()
+    db.session.rollback()
+
+    # a month past the created ones lands in shows_default until `create`
+    # moves it out
+    later = this_month + relativedelta(months=30)
+    db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=later + timedelta(days=1)))
+    db.session.commit()
+    assert count(DEFAULT_PARTITION) == 1
+    result = runner.invoke(args=['partitions', 'create'])
+    assert result.exit_code == 0, result.output
+    assert '%s created, 1 shows moved' % partition_name(later) in result.output
+    assert count(DEFAULT_PARTITION) == 0
+    assert count(partition_name(later)) == 1
+
+    # `archive` detaches the old month, and the pages that showed it change
+    page_cache.enabled = True
+    try:
+        page_cache.set('page:/venues/%d?' % venue_id, 'page', ['venue:%d' % venue_id])
+        touched_before = db.session.query(Venue.updated_at).filter(Venue.id == venue_id).scalar()
+        db.session.remove()
+        result = runner.invoke(args=['partitions', 'archive', '--older-than', '12'])
+        assert result.exit_code == 0, result.output
+        assert '%s moved to %s' % (partition_name(old), ARCHIVE_SCHEMA) in result.output
+        assert page_cache.get('page:/venues/%d?' % venue_id) is None
+    finally:
+        page_cache.enabled = False
+    assert db.session.query(Venue.updated_at).filter(Venue.id == venue_id).scalar() > touched_before
+    assert count('shows') == 2
+    assert count('%s.%s' % (ARCHIVE_SCHEMA, partition_name(old))) == 1
+
+    # downgrade keeps the attached partitions' rows
+    migrate(downgrade, BEFORE)
+    assert count('shows') == 2
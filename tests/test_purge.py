@@ -0,0 +1,58 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db, purger
+from models import Venue, Artist, Show
+
+
+@pytest.fixture
+def shows(client, monkeypatch):
+    # two venues with five shows each, all by one artist; the venues' ids
+    monkeypatch.setattr(purger, 'batch_size', 2)
+    monkeypatch.setattr(purger, 'pause', 0)
+    artist = Artist(name='Band', city='Austin', state='TX')
+    venues = [Venue(name='Hall %d' % i, city='Austin', state='TX') for i in range(2)]
+    db.session.add_all([artist] + venues)
+    db.session.flush()
+    start = datetime.now() + timedelta(days=1)
+    for venue in venues:
+        db.session.add_all([Show(venue_id=venue.id, artist_id=artist.id, start_time=start + timedelta(days=day))
+                            for day in range(5)])
+    db.session.commit()
+    return [venue.id for venue in venues]
+
+
+def shows_at(venue_id):
+    return Show.query.filter_by(venue_id=venue_id).count()
+
+
+def test_delete_leaves_a_tombstone_and_the_shows_for_the_purge(client, shows, count_queries):
+    gone, kept = shows
+    assert count_queries(lambda: client.delete('/venues/%d' % gone)) == 1
+    assert Venue.query.get(gone).deleted_at is not None
+    assert shows_at(gone) == 5
+    assert client.get('/venues/%d' % gone).status_code == 404
+
+
+def test_purge_runs_in_batches_and_spares_live_venues(client, shows):
+    gone, kept = shows
+    client.delete('/venues/%d' % gone)
+    assert purger.purge(max_batches=1) == 2
+    assert shows_at(gone) == 3
+    result = client.application.test_cli_runner().invoke(args=['purge'])
+    assert '3 shows deleted' in result.output
+    assert (shows_at(gone), shows_at(kept)) == (0, 5)
+    assert purger.purge() == 0
+
+
+def test_delete_wakes_the_background_purge(client, shows, monkeypatch):
+    gone, kept = shows
+    monkeypatch.setattr(purger, 'background', True)
+    client.delete('/venues/%d' % gone)
+    deadline = time.time() + 5
+    while purger.stats()['running'] and time.time() < deadline:
+        time.sleep(0.01)
+    assert not purger.stats()['running']
+    assert (shows_at(gone), shows_at(kept)) == (0, 5)
@@ -0,0 +1,39 @@
+import re
+
+from extensions import db
+from models import Venue, Artist, Genre
+
+
+def search(client, kind, term):
+    # (total, names in result order) of the search page
+    page = client.post('/%s/search' % kind, data={'search_term': term}).data.decode()
+    total = int(re.search(r'search results for ".*": (\d+)', page).group(1))
+    return total, re.findall(r'<h5>([^<]*)</h5>', page)
+
+
+def test_name_prefix_ranks_before_substring_then_city_and_genre(client):
+    hip_hop = Genre(name='Hip Hop')
+    db.session.add_all([Venue(name='The Musical Hop', city='Austin', state='TX'),
+                        Venue(name='Hop Shop', city='Austin', state='TX'),
+                        Venue(name='Barn', city='Hopkinsville', state='KY'),
+                        Venue(name='Cellar', city='Austin', state='TX', genres=[hip_hop]),
+                        Venue(name='Dunes', city='Austin', state='TX')])
+    db.session.commit()
+    assert search(client, 'venues', 'HOP') == (4, ['Hop Shop', 'The Musical Hop', 'Barn', 'Cellar'])
+
+
+def test_wildcards_in_the_term_match_themselves(client):
+    db.session.add_all([Artist(name='100% Live', city='Austin', state='TX'),
+                        Artist(name='1000 Cuts', city='Austin', state='TX'),
+                        Artist(name='snake_case', city='Austin', state='TX'),
+                        Artist(name='snakes', city='Austin', state='TX')])
+    db.session.commit()
+    assert search(client, 'artists', '100%') == (1, ['100% Live'])
+    assert search(client, 'artists', 'snake_') == (1, ['snake_case'])
+
+
+def test_total_counts_past_the_result_limit(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'SEARCH_RESULT_LIMIT', 2)
+    db.session.add_all([Venue(name='Hall %d' % i, city='Austin', state='TX') for i in range(5)])
+    db.session.commit()
+    assert search(client, 'venues', 'hall') == (5, ['Hall 0', 'Hall 1'])
@@ -0,0 +1,39 @@
+from sqlalchemy import func
+
+from benchmarks.seed import seed
+from extensions import db
+from models import Venue, Artist, Show
+
+
+def generated():
+    # what seed() wrote, leaving out the start times, which follow the clock
+    return (db.session.query(Venue.id, Venue.name, Venue.city).order_by(Venue.id).all(),
+            db.session.query(Artist.id, Artist.name, Artist.city).order_by(Artist.id).all(),
+            db.session.query(Show.venue_id, Show.artist_id).order_by(Show.id).all())
+
+
+def test_seed_writes_the_requested_counts_without_overlaps(client):
+    seed(venues=20, artists=30, shows=500)
+    assert (Venue.query.count(), Artist.query.count(), Show.query.count()) == (20, 30, 500)
+    slots = db.session.query(Show.venue_id, Show.start_time).distinct().count()
+    assert slots == 500
+    assert all(venue.genres for venue in Venue.query)
+
+
+def test_seed_is_deterministic_and_skewed(client):
+    seed(venues=20, artists=30, shows=500, seed=7)
+    first = generated()
+    db.drop_all()
+    db.create_all()
+    seed(venues=20, artists=30, shows=500, seed=7)
+    assert generated() == first
+    busiest = db.session.query(func.count(Show.id)).group_by(Show.venue_id) \
+                        .order_by(func.count(Show.id).desc()).first()[0]
+    assert busiest > 3 * 500 / 20
+
+
+def test_seed_appends_after_existing_rows(client):
+    seed(venues=5, artists=5, shows=10)
+    seed(venues=5, artists=5, shows=10, seed=1)
+    assert db.session.query(func.max(Venue.id)).scalar() == 10
+    assert Show.query.count() == 20
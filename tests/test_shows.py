@@ -0,0 +1,101 @@
+import html
+import re
+from datetime import datetime
+
+from extensions import db
+from models import Venue, Artist, Show
+
+
+def add_venues_and_artists():
+    rows = [Venue(name='Hall', city='Austin', state='TX'), Venue(name='Club', city='Austin', state='TX'),
+            Artist(name='Band', city='Austin', state='TX'), Artist(name='Duo', city='Austin', state='TX')]
+    db.session.add_all(rows)
+    db.session.commit()
+    return [row.id for row in rows]
+
+
+def post_show(client, venue_id, artist_id, start_time, duration=None):
+    form = {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time}
+    if duration:
+        form['duration'] = duration
+    return client.post('/shows/create', data=form).data
+
+
+def test_overlapping_show_is_rejected(client):
+    hall, club, band, duo = add_venues_and_artists()
+    assert b'successfully listed' in post_show(client, hall, band, '2030-01-01 20:00:00', 90)
+    assert Show.query.one().end_time == datetime(2030, 1, 1, 21, 30)
+    # the venue, then the artist, is already booked
+    assert b'the venue already has a show' in post_show(client, hall, duo, '2030-01-01 21:00:00')
+    assert b'the artist already has a show' in post_show(client, club, band, '2030-01-01 19:00:00')
+    assert Show.query.count() == 1
+    # back to back is fine
+    assert b'successfully listed' in post_show(client, hall, duo, '2030-01-01 21:30:00')
+    assert Show.query.count() == 2
+
+
+def test_show_of_a_deleted_venue_is_rejected(client):
+    hall, club, band, duo = add_venues_and_artists()
+    Venue.query.filter_by(id=hall).update({'deleted_at': datetime.now()})
+    db.session.commit()
+    assert b'could not be listed' in post_show(client, hall, band, '2030-01-01 20:00:00')
+    assert Show.query.count() == 0
+
+
+def test_availability_search_leaves_out_booked_venues(client):
+    hall, club, band, duo = add_venues_and_artists()
+    post_show(client, hall, band, '2030-01-01 20:00:00')
+    window = {'city': 'Austin', 'state': 'TX', 'from': '2030-01-01 21:00', 'to': '2030-01-01 23:00'}
+    body = client.get('/api/v1/venues/available', query_string=window).get_json()
+    assert [venue['id'] for venue in body['data']] == [club]
+    window['from'] = '2030-01-01 22:00'
+    body = client.get('/api/v1/venues/available', query_string=window).get_json()
+    assert [venue['id'] for venue in body['data']] == [hall, club]
+
+
+def test_availability_window_with_an_offset_or_out_of_range(client):
+    hall, club, band, duo = add_venues_and_artists()
+    post_show(client, hall, band, '2030-01-01 20:00:00')
+    # 21:00 UTC, inside the booked show
+    window = {'city': 'Austin', 'state': 'TX', 'from': '2030-01-01T16:00-05:00', 'to': '2030-01-01 23:00'}
+    for path in ('/venues/available', '/api/v1/venues/available'):
+        assert client.get(path, query_string=window).status_code == 200
+    body = client.get('/api/v1/venues/available', query_string=window).get_json()
+    assert [venue['id'] for venue in body['data']] == [club]
+    for start, end in (('0001-01-01', '0001-01-05'), ('9999-12-31T23:00-05:00', '9999-12-31')):
+        window.update({'from': start, 'to': end})
+        for path in ('/venues/available', '/api/v1/venues/available'):
+            assert client.get(path, query_string=window).status_code == 400
+
+
+def walk_shows(client, path):
+    # the artist names of every /shows page from path on, following the
+    # "Later" links, and the number of pages
+    names, pages = [], 0
+    while path:
+        page = client.get(path).data.decode()
+        names.extend(re.findall(r'<a href="/artists/\d+">([^<]*)</a>', page))
+        path = re.search(r'<li class="next"><a href="([^"]*)"', page)
+        path = path and html.unescape(path.group(1))
+        pages += 1
+    return names, pages
+
+
+def test_shows_pages_on_start_time_and_id(app, client, count_queries, monkeypatch):
+    monkeypatch.setitem(app.config, 'SHOWS_PER_PAGE', 3)
+    hall, club, band, duo = add_venues_and_artists()
+    artists = [Artist(name='Artist %d' % i, city='Austin', state='TX') for i in range(7)]
+    db.session.add_all(artists)
+    db.session.flush()
+    # the third and fourth start together, on either side of a page boundary
+    for artist, day in zip(artists, [1, 2, 3, 3, 5, 6, 7]):
+        db.session.add(Show(venue_id=hall if artist.name != 'Artist 3' else club, artist_id=artist.id,
+                            start_time=datetime(2030, 1, day, 20, 0)))
+    db.session.commit()
+    names, pages = walk_shows(client, '/shows')
+    assert names == ['Artist %d' % i for i in range(7)]
+    assert pages == 3
+    first = count_queries(lambda: client.get('/shows'))
+    cursor = re.search(r'after=([^"&]*)', client.get('/shows').data.decode()).group(1)
+    assert count_queries(lambda: client.get('/shows?after=' + cursor)) == first
+    assert client.get('/shows?after=not-a-cursor').status_code == 400
@@ -0,0 +1,66 @@
+import os
+
+from jinja2 import DictLoader, Environment
+
+from template_cache import FragmentCache, FragmentCacheExtension, SharedBytecodeCache
+
+TEMPLATES = {
+    'tiles.html': '{% for show in shows %}{% cache show.id, show.updated_at %}'
+                  '[{{ show.id }}:{{ rendered(show) }}]{% endcache %}{% endfor %}',
+    'twice.html': '{% cache 1 %}a{{ rendered(none) }}{% endcache %}\n'
+                  '{% cache 1 %}b{{ rendered(none) }}{% endcache %}',
+}
+
+
+def environment(fragments, **options):
+    # a Jinja environment with the {% cache %} tag and a counter of the
+    # fragment bodies it rendered
+    env = Environment(loader=DictLoader(TEMPLATES), extensions=[FragmentCacheExtension], **options)
+    env.fragment_cache = fragments
+    env.renders = []
+    env.globals['rendered'] = lambda show: env.renders.append(show) or ''
+    return env
+
+
+def test_fragment_body_renders_once_per_key():
+    env = environment(FragmentCache())
+    template = env.get_template('tiles.html')
+    shows = [{'id': 1, 'updated_at': 1}, {'id': 2, 'updated_at': 1}]
+    assert template.render(shows=shows) == '[1:][2:]'
+    assert template.render(shows=shows) == '[1:][2:]'
+    assert len(env.renders) == 2
+    # a new version of a row is a new key
+    shows[0]['updated_at'] = 2
+    template.render(shows=shows)
+    assert len(env.renders) == 3
+    assert env.fragment_cache.stats()['hits'] == 3
+
+
+def test_same_key_in_two_tags_is_two_fragments():
+    env = environment(FragmentCache())
+    assert env.get_template('twice.html').render() == 'a\nb'
+    assert env.get_template('twice.html').render() == 'a\nb'
+    assert len(env.renders) == 2
+
+
+def test_disabled_cache_renders_every_time():
+    fragments = FragmentCache()
+    fragments.enabled = False
+    env = environment(fragments)
+    for _ in range(2):
+        env.get_template('tiles.html').render(shows=[{'id': 1, 'updated_at': 1}])
+    assert len(env.renders) == 2
+    assert fragments.stats()['entries'] == 0
+
+
+def test_compiled_templates_are_shared_through_the_directory(tmp_path):
+    directory = str(tmp_path)
+    environment(None, bytecode_cache=SharedBytecodeCache(directory)).get_template('tiles.html')
+    written = os.listdir(directory)
+    assert len(written) == 1 and not written[0].endswith('.tmp')
+    # another worker loads the compiled code instead of compiling again
+    env = environment(None, bytecode_cache=SharedBytecodeCache(directory))
+    compiled = []
+    env.compile = lambda *args, **kwargs: compiled.append(args) or Environment.compile(env, *args, **kwargs)
+    assert env.get_template('tiles.html').render(shows=[{'id': 1, 'updated_at': 1}]) == '[1:]'
+    assert compiled == []
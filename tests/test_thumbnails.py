@@ -0,0 +1,148 @@
+import io
+import os
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from flask import Flask
+
+import thumbnails
+from extensions import thumbnails as proxy
+
+
+def serve(host, handler):
+    server = HTTPServer((host, 0), handler)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def handler(redirect=None):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.server.requests.append(self.path)
+            if redirect and self.path == '/redirect':
+                self.send_response(302)
+                self.send_header('Location', redirect)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b'image')
+
+        def log_message(self, *args):
+            pass
+    return Handler
+
+
+@pytest.mark.parametrize('address', ['127.0.0.1', '10.1.2.3', '192.168.0.1', '169.254.169.254',
+                                     '0.0.0.0', '::1', '::ffff:127.0.0.1', 'fe80::1%eth0', '224.0.0.1'])
+def test_non_public_addresses(address):
+    assert not thumbnails.public_address(address)
+
+
+def test_public_address():
+    assert thumbnails.public_address('93.184.216.34')
+
+
+def test_loopback_source_is_never_contacted(app):
+    server = serve('127.0.0.1', handler())
+    try:
+        with pytest.raises(ValueError, match='not a public address'):
+            proxy.fetch('http://127.0.0.1:%d/image.jpg' % server.server_port)
+        assert server.requests == []
+    finally:
+        server.shutdown()
+
+
+def test_redirect_to_a_private_address_is_refused(app, monkeypatch):
+    # 127.0.0.1 stands in for a public host, 127.0.0.2 for an internal one
+    monkeypatch.setattr(thumbnails, 'public_address', lambda address: address == '127.0.0.1')
+    internal = serve('127.0.0.2', handler())
+    public = serve('127.0.0.1', handler(redirect='http://127.0.0.2:%d/' % internal.server_port))
+    try:
+        assert proxy.fetch('http://127.0.0.1:%d/image.jpg' % public.server_port) == b'image'
+        with pytest.raises(ValueError, match='not a public address'):
+            proxy.fetch('http://127.0.0.1:%d/redirect' % public.server_port)
+        assert internal.requests == []
+    finally:
+        public.shutdown()
+        internal.shutdown()
+
+
+def test_failed_sources_are_bounded(app):
+    with app.app_context():
+        assert proxy.original('http://127.0.0.1:9/image.jpg') is None
+    assert proxy.failed.get('http://127.0.0.1:9/image.jpg')
+    assert proxy.failed.max_entries == app.config['THUMBNAIL_FAILED_MAX_ENTRIES']
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    # a Thumbnails of its own, reading local files into a cache under tmp_path
+    pytest.importorskip('PIL')
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', THUMBNAIL_CACHE_DIR=str(tmp_path / 'cache'),
+                      THUMBNAIL_SOURCE_SCHEMES=('file',))
+    pipeline = thumbnails.Thumbnails()
+    pipeline.init_app(app)
+    pipeline.app = app
+    return pipeline
+
+
+def image_file(path, color):
+    # a 640x400 PNG, twice the tile box
+    from PIL import Image
+    Image.new('RGB', (640, 400), color).save(str(path), 'PNG')
+    return 'file://' + str(path)
+
+
+def cached_files(pipeline, suffix):
+    return sorted(name for _, _, names in os.walk(pipeline.cache.root) for name in names if name.endswith(suffix))
+
+
+def get_thumbnail(pipeline, src, size='tile', fmt='jpg'):
+    with pipeline.app.test_request_context():
+        url = pipeline.url(src, size, fmt)
+    return pipeline.app.test_client().get(url)
+
+
+def test_thumbnail_is_fetched_resized_and_cached(pipeline, tmp_path):
+    from PIL import Image
+    src = image_file(tmp_path / 'a.png', (200, 40, 40))
+    response = get_thumbnail(pipeline, src)
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    with Image.open(io.BytesIO(response.data)) as image:
+        assert image.size == thumbnails.SIZES['tile']
+    assert len(cached_files(pipeline, '.orig')) == 1
+    assert len(cached_files(pipeline, '-tile.jpg')) == 1
+    # served from the cache once the source is gone
+    os.remove(str(tmp_path / 'a.png'))
+    assert get_thumbnail(pipeline, src).data == response.data
+
+
+def test_same_image_under_two_urls_is_stored_once(pipeline, tmp_path):
+    first = image_file(tmp_path / 'a.png', (40, 200, 40))
+    shutil.copy(str(tmp_path / 'a.png'), str(tmp_path / 'b.png'))
+    second = 'file://' + str(tmp_path / 'b.png')
+    assert get_thumbnail(pipeline, first).data == get_thumbnail(pipeline, second).data
+    assert len(cached_files(pipeline, '.src')) == 2
+    assert len(cached_files(pipeline, '.orig')) == 1
+    assert len(cached_files(pipeline, '-tile.jpg')) == 1
+
+
+def test_cache_evicts_past_max_bytes(pipeline, tmp_path):
+    sources = [image_file(tmp_path / ('%d.png' % i), (i * 40, 40, 40)) for i in range(6)]
+    assert get_thumbnail(pipeline, sources[0]).status_code == 200
+    # room for about two images with their thumbnails
+    footprint = sum(size for _, size, _ in pipeline.cache._files())
+    pipeline.cache.max_bytes = footprint * 2.5
+    for src in sources[1:]:
+        assert get_thumbnail(pipeline, src).status_code == 200
+    assert pipeline.cache.evictions > 0
+    assert sum(size for _, size, _ in pipeline.cache._files()) <= pipeline.cache.max_bytes
+    assert len(cached_files(pipeline, '.orig')) < len(sources)
+    # an evicted image is fetched again
+    assert get_thumbnail(pipeline, sources[0]).status_code == 200
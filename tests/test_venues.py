@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Venue, Artist, Show
+
+
+def add_venues(count, first=0):
+    # venues first..first+count-1 over three areas, each with an upcoming show
+    artist = Artist(name='Artist', city='Austin', state='TX')
+    db.session.add(artist)
+    db.session.flush()
+    start = datetime.now() + timedelta(days=1)
+    for i in range(first, first + count):
+        venue = Venue(name='Venue %d' % i, city=['Austin', 'Boston', 'Denver'][i % 3], state='XX')
+        db.session.add(venue)
+        db.session.flush()
+        db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=start + timedelta(days=i)))
+    db.session.commit()
+
+
+def test_venues_query_count_does_not_grow_with_venues(client, count_queries):
+    add_venues(5)
+    few = count_queries(lambda: client.get('/venues'))
+    add_venues(45, first=5)
+    many = count_queries(lambda: client.get('/venues'))
+    assert many == few == 1
+    assert b'Venue 49' in client.get('/venues').data
+
+
+def test_venues_leaves_out_deleted_venues(client):
+    add_venues(3)
+    Venue.query.filter_by(name='Venue 1').update({'deleted_at': datetime.now()})
+    db.session.commit()
+    response = client.get('/venues')
+    assert b'Venue 0' in response.data
+    assert b'Venue 1' not in response.data
+
+
+def test_calendar_window_with_an_offset_is_read_as_utc(client):
+    add_venues(1)
+    venue_id = Venue.query.first().id
+    for path in ('/venues/%d/calendar', '/api/v1/venues/%d/calendar'):
+        response = client.get(path % venue_id, query_string={'from': '2030-01-01T05:00+05:00', 'to': '2030-01-05'})
+        assert response.status_code == 200
+    assert response.get_json()['data']['from'] == '2030-01-01T00:00:00'
+
+
+def test_calendar_window_past_the_calendar_is_a_bad_request(client):
+    add_venues(1)
+    venue_id = Venue.query.first().id
+    for window in ({'from': '9999-12-15'}, {'from': '9999-12-31T23:00-05:00'}):
+        for path in ('/venues/%d/calendar', '/api/v1/venues/%d/calendar'):
+            assert client.get(path % venue_id, query_string=window).status_code == 400
+    # the window itself is fine, but the page links to the month before it
+    assert client.get('/venues/%d/calendar' % venue_id, query_string={'from': '0001-01-01'}).status_code == 400
+
+
+def test_calendar_counts_the_window_day_by_day(client, count_queries):
+    venue = Venue(name='Hall', city='Austin', state='TX')
+    band, gone = Artist(name='Band', city='Austin', state='TX'), Artist(name='Gone', city='Austin', state='TX')
+    db.session.add_all([venue, band, gone])
+    db.session.flush()
+    for artist, start in ((band, datetime(2030, 1, 2, 20)), (band, datetime(2030, 1, 2, 23)),
+                          (band, datetime(2030, 1, 9, 20)), (band, datetime(2030, 2, 1, 20)),
+                          (gone, datetime(2030, 1, 3, 20))):
+        db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=start))
+    gone.deleted_at = datetime.now()
+    db.session.commit()
+    venue_id = venue.id
+    path = '/api/v1/venues/%d/calendar?from=2030-01-01&to=2030-02-01' % venue_id
+    data = client.get(path).get_json()['data']
+    assert data['days'] == [{'date': '2030-01-02', 'count': 2}, {'date': '2030-01-09', 'count': 1}]
+    assert [show['start_time'] for show in data['shows']] == \
+        ['2030-01-02T20:00:00', '2030-01-02T23:00:00', '2030-01-09T20:00:00']
+    # a month overview leaves the shows unread
+    overview = count_queries(lambda: client.get(path + '&fields=days'))
+    assert overview == count_queries(lambda: client.get(path)) - 1
+    page = client.get('/venues/%d/calendar?from=2030-01-01&to=2030-02-01' % venue_id).data
+    assert b'from=2029-12-01&amp;to=2030-01-01' in page
+    assert b'from=2030-02-01&amp;to=2030-03-01' in page
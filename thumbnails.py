@@ -0,0 +1,413 @@
+#----------------------------------------------------------------------------#
+# Thumbnails.
+#
+# The venue and artist pages used to hot-link every image_link at full size,
+# one third-party fetch per tile. The templates' src|thumbnail(size, alt)
+# now renders a lazily loaded <picture> (WebP or JPEG, 1x and 2x) pointing at
+# /thumbnails/<size>/<signature>.<jpg|webp>?src=..., which fetches the source
+# once, keeps it and its resized copies in a disk cache, and serves those.
+# The signature is an HMAC of src under SECRET_KEY, so only images the app
+# itself linked can be fetched through it. image_link is user input, though,
+# so a source is only fetched from public addresses: the host is resolved by
+# the connection itself and refused if any of its addresses is loopback,
+# private, link-local or otherwise not global, on every redirect too.
+#
+# The cache is content-addressed: a source URL maps (<url hash>.src) to the
+# hash of the image it served (<hash>.orig), and thumbnails are named after
+# that hash (<hash>-tile@2x.webp), so the same picture linked from two URLs
+# is resized once. Files are evicted least recently used first when the
+# cache grows past THUMBNAIL_CACHE_MAX_BYTES; an evicted original is fetched
+# again on the next miss. Several workers can share the directory: files
+# are written under a temporary name and renamed into place.
+#
+#   flask thumbnails warm    # fetch and resize every image_link ahead of time
+#
+# Needs Pillow; without it the pages keep linking the images themselves.
+#----------------------------------------------------------------------------#
+
+import hashlib
+import hmac
+import http.client
+import importlib.util
+import io
+import ipaddress
+import os
+import socket
+import threading
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import click
+from flask import abort, current_app, request, send_file, url_for
+from markupsafe import Markup
+from flask.cli import with_appcontext
+
+from cache import LRUBackend
+
+# name -> (width, height) box the image is fitted into, at 1x; every size
+# also exists at twice that as <name>@2x for high-density screens
+SIZES = {
+    'tile': (320, 200),
+    'detail': (560, 500),
+}
+
+# url extension -> (Pillow format, mimetype, save options)
+FORMATS = {
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+}
+
+# what thumbnail() renders; the plain <img> alone when src can't have a thumbnail
+IMG = '<img src="%(src)s" alt="%(alt)s" loading="lazy" />'
+IMG_2X = '<img src="%(src)s" srcset="%(srcset)s" alt="%(alt)s" loading="lazy" />'
+PICTURE = '<picture><source type="image/webp" srcset="%(webp)s">%(img)s</picture>'
+
+USER_AGENT = 'fyyur-thumbnails/1.0'
+
+
+def public_address(address):
+    address = ipaddress.ip_address(address.split('%', 1)[0])
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+def public_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    # socket.create_connection() that refuses hosts with a non-public address;
+    # it connects to the addresses it checked, so a second DNS answer can't
+    # swap in another one
+    host, port = address
+    addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    if not addresses or not all(public_address(sockaddr[0]) for _, _, _, _, sockaddr in addresses):
+        raise ValueError('%s is not a public address' % host)
+    error = None
+    for family, kind, proto, _, sockaddr in addresses:
+        sock = socket.socket(family, kind, proto)
+        try:
+            if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                sock.settimeout(timeout)
+            if source_address:
+                sock.bind(source_address)
+            sock.connect(sockaddr)
+            return sock
+        except OSError as caught:
+            error = caught
+            sock.close()
+    raise error
+
+
+class PublicHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = public_connection
+
+
+class PublicHTTPSConnection(http.client.HTTPSConnection):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = public_connection
+
+
+class PublicHTTPHandler(urllib.request.HTTPHandler):
+
+    def http_open(self, req):
+        return self.do_open(PublicHTTPConnection, req)
+
+
+class PublicHTTPSHandler(urllib.request.HTTPSHandler):
+
+    def https_open(self, req):
+        return self.do_open(PublicHTTPSConnection, req, context=self._context)
+
+
+class PublicRedirectHandler(urllib.request.HTTPRedirectHandler):
+    # the default one follows redirects to ftp:// as well
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if urllib.parse.urlsplit(newurl).scheme not in ('http', 'https'):
+            raise ValueError('redirected to %s' % newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# no ProxyHandler: through a proxy the address checked would be the proxy's
+opener = urllib.request.build_opener(urllib.request.ProxyHandler({}), PublicHTTPHandler,
+                                     PublicHTTPSHandler, PublicRedirectHandler)
+
+
+class DiskCache(object):
+    # files under `root`, evicted least recently used (by mtime, touched on
+    # every hit) first, down to 90% of max_bytes
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None  # bytes on disk, counted on the first write
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, name):
+        return os.path.join(self.root, name[:2], name)
+
+    def get(self, name):
+        path = self.path(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, name, content):
+        path = self.path(name)
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._files())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+        with open(partial, 'wb') as out:
+            out.write(content)
+        os.replace(partial, path)
+        with self._lock:
+            self._size += len(content)
+            full = self._size > self.max_bytes
+        if full:
+            self.evict()
+        return path
+
+    def _files(self):
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def evict(self):
+        # recounts from disk, so the other workers' writes are included
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        with self._lock:
+            self._size = total
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'bytes': self._size, 'max_bytes': self.max_bytes}
+
+
+class Thumbnails(object):
+
+    def __init__(self):
+        self.enabled = False
+        self.cache = None
+        self._lock = threading.Lock()
+        self._fetching = {}
+        self.failed = None  # sources that failed, not fetched again until they expire
+
+    def init_app(self, app):
+        self.enabled = app.config.get('THUMBNAILS_ENABLED', True) and \
+            importlib.util.find_spec('PIL') is not None
+        self.cache = DiskCache(app.config.get('THUMBNAIL_CACHE_DIR') or os.path.join(app.instance_path, 'thumbnails'),
+                               app.config.get('THUMBNAIL_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+        self.schemes = tuple(app.config.get('THUMBNAIL_SOURCE_SCHEMES', ('http', 'https')))
+        self.timeout = app.config.get('THUMBNAIL_FETCH_TIMEOUT', 5)
+        self.max_source_bytes = app.config.get('THUMBNAIL_MAX_SOURCE_BYTES', 20 * 1024 * 1024)
+        self.retry_after = app.config.get('THUMBNAIL_RETRY_AFTER', 300)
+        self.failed = LRUBackend(app.config.get('THUMBNAIL_FAILED_MAX_ENTRIES', 10000), ttl=self.retry_after)
+        self.max_age = app.config.get('THUMBNAIL_MAX_AGE', 7 * 24 * 3600)
+        self.sizes = {}
+        for name, (width, height) in SIZES.items():
+            self.sizes[name] = (width, height)
+            self.sizes[name + '@2x'] = (width * 2, height * 2)
+        self._tags = lru_cache(maxsize=app.config.get('THUMBNAIL_TAG_CACHE_SIZE', 4096))(self._build_tag)
+        app.jinja_env.globals['thumbnail_url'] = self.url
+        app.jinja_env.filters['thumbnail'] = self.tag
+        app.cli.add_command(thumbnails_command)
+        if self.enabled:
+            app.add_url_rule('/thumbnails/<size>/<signature>.<fmt>', 'thumbnail', self.send_thumbnail)
+
+    def sign(self, src):
+        key = current_app.config['SECRET_KEY']
+        key = key.encode('utf-8') if isinstance(key, str) else key
+        return hmac.new(key, src.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+    def linkable(self, src):
+        return self.enabled and src and urllib.parse.urlsplit(src).scheme in self.schemes
+
+    def url(self, src, size, fmt='jpg'):
+        # the thumbnail of src; src itself when it can't have one
+        if not self.linkable(src):
+            return src
+        return url_for('thumbnail', size=size, signature=self.sign(src), fmt=fmt, src=src)
+
+    def tag(self, src, size, alt):
+        # the markup of src's thumbnail: a <picture> offering WebP, with a 2x
+        # candidate for each format, or the plain <img> when src can't have
+        # one. A filter rather than a Jinja macro or global (which cost ~20us
+        # a call on pages with a thousand tiles), and kept in an LRU -- a page
+        # links the same images on every render -- per script root, for
+        # url_for's sake
+        script_root = request.script_root if self.linkable(src) else None
+        return self._tags(script_root, src, size, alt)
+
+    def _build_tag(self, script_root, src, size, alt):
+        if script_root is None:
+            return Markup(IMG) % {'src': src or '', 'alt': alt}
+        signature = self.sign(src)
+        urls = {fmt: [url_for('thumbnail', size=name, signature=signature, fmt=fmt, src=src)
+                      for name in (size, size + '@2x')]
+                for fmt in FORMATS}
+        return Markup(PICTURE) % {
+            'webp': '%s, %s 2x' % tuple(urls['webp']),
+            'img': Markup(IMG_2X) % {'src': urls['jpg'][0], 'srcset': '%s 2x' % urls['jpg'][1], 'alt': alt},
+        }
+
+    # sources
+
+    def fetch(self, src):
+        if urllib.parse.urlsplit(src).scheme not in self.schemes:
+            raise ValueError('not an allowed scheme')
+        source = urllib.request.Request(src, headers={'User-Agent': USER_AGENT})
+        with opener.open(source, timeout=self.timeout) as response:
+            content = response.read(self.max_source_bytes + 1)
+        if len(content) > self.max_source_bytes:
+            raise ValueError('larger than THUMBNAIL_MAX_SOURCE_BYTES')
+        return content
+
+    def original(self, src):
+        # (content hash, path) of the source image, fetching it on a miss;
+        # None if it can't be fetched (retried after THUMBNAIL_RETRY_AFTER)
+        key = hashlib.sha256(src.encode('utf-8')).hexdigest()
+        found = self._cached_original(key)
+        if found is not None:
+            return found
+        if self.failed.get(src):
+            return None
+        # one fetch per source at a time in this worker
+        with self._lock:
+            lock = self._fetching.setdefault(key, threading.Lock())
+        with lock:
+            try:
+                found = self._cached_original(key)
+                if found is not None:
+                    return found
+                try:
+                    content = self.fetch(src)
+                except (OSError, ValueError) as error:
+                    current_app.logger.info('thumbnail source %s: %s', src, error)
+                    if self.retry_after:
+                        self.failed.set(src, True)
+                    return None
+                digest = hashlib.sha256(content).hexdigest()
+                path = self.cache.put(digest + '.orig', content)
+                self.cache.put(key + '.src', digest.encode('ascii'))
+                return digest, path
+            finally:
+                with self._lock:
+                    self._fetching.pop(key, None)
+
+    def _cached_original(self, key):
+        index = self.cache.get(key + '.src')
+        if index is None:
+            return None
+        with open(index) as source:
+            digest = source.read().strip()
+        path = self.cache.get(digest + '.orig')
+        return (digest, path) if path is not None else None
+
+    # thumbnails
+
+    def resize(self, path, size, fmt):
+        from PIL import Image, ImageOps
+        width, height = self.sizes[size]
+        pil_format, _, options = FORMATS[fmt]
+        with Image.open(path) as image:
+            # JPEGs can be decoded at a fraction of their size directly
+            image.draft('RGB', (width, height))
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA') or pil_format == 'JPEG':
+                image = image.convert('RGB')
+            image.thumbnail((width, height), Image.LANCZOS)
+            out = io.BytesIO()
+            image.save(out, pil_format, **options)
+        return out.getvalue()
+
+    def render(self, src, size, fmt):
+        # path of the thumbnail file, or None without a usable source
+        found = self.original(src)
+        if found is None:
+            return None
+        digest, original = found
+        name = '%s-%s.%s' % (digest, size, fmt)
+        path = self.cache.get(name)
+        if path is None:
+            from PIL import Image
+            try:
+                content = self.resize(original, size, fmt)
+            except (OSError, ValueError, Image.DecompressionBombError) as error:
+                current_app.logger.info('thumbnail source %s: %s', src, error)
+                return None
+            path = self.cache.put(name, content)
+        return path
+
+    def send_thumbnail(self, size, signature, fmt):
+        src = request.args.get('src', '')
+        if size not in self.sizes or fmt not in FORMATS or not hmac.compare_digest(signature, self.sign(src)):
+            abort(404)
+        path = self.render(src, size, fmt)
+        if path is None:
+            abort(404)
+        return send_file(path, mimetype=FORMATS[fmt][1], max_age=self.max_age, etag=True)
+
+    def stats(self):
+        return dict(self.cache.stats(), enabled=self.enabled)
+
+
+@click.group('thumbnails')
+def thumbnails_command():
+    """Thumbnails of the venue and artist images."""
+
+
+@thumbnails_command.command('warm')
+@click.option('--workers', default=8, show_default=True, help='parallel fetches')
+@with_appcontext
+def warm_command(workers):
+    """Fetch and resize every venue and artist image_link."""
+    from extensions import db, thumbnails
+    from models import Venue, Artist
+    if not thumbnails.enabled:
+        raise click.ClickException('thumbnails are disabled (is Pillow installed?)')
+    sources = set()
+    for model in (Venue, Artist):
+        sources.update(src for src, in db.session.query(model.image_link).distinct() if src)
+    app = current_app._get_current_object()
+
+    def warm(src):
+        with app.app_context():
+            return all(thumbnails.render(src, size, fmt) is not None
+                       for size in thumbnails.sizes for fmt in FORMATS)
+
+    with ThreadPoolExecutor(workers) as pool:
+        done = sum(pool.map(warm, sorted(sources)))
+    click.echo('%d of %d images cached, %d failed' % (done, len(sources), len(sources) - done))
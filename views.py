@@ -0,0 +1,1158 @@
+#----------------------------------------------------------------------------#
+# Views.
+#
+# The HTML pages, the CSV/NDJSON export and the metrics endpoints, plus the
+# query helpers the JSON API (api.py) shares. Imported by create_app() only
+# when it builds the web app.
+#----------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+import hashlib
+import itertools
+import dateutil.parser
+from dateutil.relativedelta import relativedelta
+from flask import current_app, render_template, request, Response, flash, redirect, url_for, abort, jsonify, make_response, stream_with_context
+from sqlalchemy import func, and_, or_, case, exists, tuple_, bindparam
+from sqlalchemy.ext import baked
+from sqlalchemy.orm import selectinload
+from forms import *
+
+from datetime import datetime, timedelta, timezone
+
+from cache import add_cache_tags
+from extensions import db, page_cache, sql_metrics, date_formatter, template_cache, thumbnails, purger
+from models import venue_genres, artist_genres, Genre, Venue, Artist, Show, DEFAULT_SHOW_DURATION, MAX_SHOW_DURATION, \
+  lock_live
+
+#----------------------------------------------------------------------------#
+# Routes.
+#----------------------------------------------------------------------------#
+
+class Routes(object):
+  # collects view functions the way app.route would and adds them to an app
+  # in register(), so endpoint names stay the plain function names
+  def __init__(self):
+      self.rules = []
+
+  def __call__(self, rule, **options):
+      def decorator(view):
+          self.rules.append((rule, view, options))
+          return view
+      return decorator
+
+  def register(self, app):
+      for rule, view, options in self.rules:
+          app.add_url_rule(rule, view_func=view, **options)
+
+route = Routes()
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+def format_datetime(value, format='medium'):
+  # strings (e.g. from forms) are parsed as before; the patterns are compiled
+  # once and repeated timestamps come from a bounded cache (see formatting.py)
+  return date_formatter.format(value, format)
+
+def label_start_times(*show_lists, format='full'):
+  # batch version of |datetime for the show tiles: sets start_time_label on
+  # every show dict in one pass instead of one filter call per tile
+  for shows in show_lists:
+      labels = date_formatter.format_many([show['start_time'] for show in shows], format)
+      for show, label in zip(shows, labels):
+          show['start_time_label'] = label
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+def page_validators(*parts):
+  # (etag, last_modified) from whatever the page depends on. last_modified is
+  # the newest of the datetime parts, as an aware UTC datetime.
+  etag = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+  stamps = [part for part in parts if isinstance(part, datetime)]
+  last_modified = max(stamps).astimezone(timezone.utc) if stamps else None
+  return etag, last_modified
+
+def is_fresh(etag, last_modified):
+  # True when the client's If-None-Match / If-Modified-Since still hold
+  if request.if_none_match:
+      return request.if_none_match.contains(etag)
+  since = request.if_modified_since
+  if since is not None and last_modified is not None:
+      if since.tzinfo is None:
+          since = since.replace(tzinfo=timezone.utc)
+      return last_modified.replace(microsecond=0) <= since
+  return False
+
+def conditional_response(etag, last_modified, render):
+  # answer 304 without calling render() when the client is up to date;
+  # otherwise render and attach the validators
+  if is_fresh(etag, last_modified):
+      response = Response(status=304)
+  else:
+      response = make_response(render())
+  response.set_etag(etag)
+  if last_modified is not None:
+      response.last_modified = last_modified
+  response.cache_control.no_cache = True
+  return response
+
+def detail_validators(model, fk_column, other, other_fk, entity_id):
+  # one aggregate over the entity, its shows and their counterparts. the
+  # latest start_time already in the past is included because a show moving
+  # from upcoming to past changes the page without any row being written.
+  now = datetime.now()
+  row = db.session.query(func.max(model.updated_at),
+                         func.max(Show.updated_at),
+                         func.max(other.updated_at),
+                         func.count(Show.id),
+                         func.max(case([(Show.start_time < now, Show.start_time)]))) \
+                  .select_from(model) \
+                  .outerjoin(Show, fk_column == model.id) \
+                  .outerjoin(other, other.id == other_fk) \
+                  .filter(model.id == entity_id, model.deleted_at.is_(None)) \
+                  .one()
+  if row[0] is None:
+      return None
+  return page_validators(model.__tablename__, entity_id, *row)
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def search_entities(model, search_term, columns=()):
+  # case-insensitive partial match on name, city and genre names, ranked by relevance.
+  # on postgres the ILIKEs are served by the pg_trgm GIN indexes (see migration
+  # 5c1e7a9d2b40) and ties are broken by trigram similarity; other backends
+  # (sqlite in tests) fall back to the portable prefix/contains ranking alone.
+  # returns (total_matches, [(id, name, *columns), ...]) capped at SEARCH_RESULT_LIMIT.
+  escaped = search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+  contains = '%' + escaped + '%'
+  rank = case([(model.name.ilike(escaped + '%', escape='\\'), 0),
+               (model.name.ilike(contains, escape='\\'), 1)],
+              else_=2)
+  order = [rank]
+  if db.session.bind.dialect.name == 'postgresql':
+      order.append(func.similarity(model.name, search_term).desc())
+  order.extend([model.name, model.id])
+  rows = db.session.query(model.id, model.name, *columns) \
+                   .add_columns(func.count().over().label('total')) \
+                   .filter(model.deleted_at.is_(None),
+                           or_(model.name.ilike(contains, escape='\\'),
+                               model.city.ilike(contains, escape='\\'),
+                               model.genres.any(Genre.name.ilike(contains, escape='\\')))) \
+                   .order_by(*order) \
+                   .limit(current_app.config['SEARCH_RESULT_LIMIT']) \
+                   .all()
+  total = rows[0].total if rows else 0
+  return total, rows
+
+def upcoming_show_counts(fk_column, ids):
+  # number of upcoming shows for each of the given venue/artist ids, in one query
+  if not ids:
+      return {}
+  rows = db.session.query(fk_column, func.count(Show.id)) \
+                   .filter(fk_column.in_(ids), Show.start_time > datetime.now()) \
+                   .group_by(fk_column) \
+                   .all()
+  return dict(rows)
+
+def genres_from_names(names):
+  # Genre rows for the submitted names, creating any that don't exist yet
+  names = list(dict.fromkeys(name for name in names if name))
+  if not names:
+      return []
+  existing = {genre.name: genre for genre in Genre.query.filter(Genre.name.in_(names))}
+  return [existing.get(name) or Genre(name=name) for name in names]
+
+def soft_delete(model, entity_id):
+  # sets deleted_at on a venue/artist that isn't deleted yet and commits;
+  # False if there was none. its shows are left to the purger
+  now = datetime.now()
+  deleted = model.query.filter(model.id == entity_id, model.deleted_at.is_(None)) \
+                       .update({'deleted_at': now, 'updated_at': now}, synchronize_session=False)
+  db.session.commit()
+  return deleted > 0
+
+def live(model, entity_id):
+  # the filter of a venue/artist with that id that isn't deleted
+  return and_(model.id == entity_id, model.deleted_at.is_(None))
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@route('/')
+def index():
+  return render_template('pages/home.html')
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@route('/venues')
+@page_cache.cached('venues')
+def venues():
+  # TODO: replace with real venues data.
+  #       num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
+  # done.
+  # one grouped query: every venue with its upcoming show count, ordered by area
+  # so the city/state groups can be built in a single pass.
+  now = datetime.now()
+  rows = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state,
+                          func.count(Show.id).label('num_upcoming_shows')) \
+                   .outerjoin(Show, and_(Show.venue_id == Venue.id, Show.start_time > now)) \
+                   .filter(Venue.deleted_at.is_(None)) \
+                   .group_by(Venue.id, Venue.name, Venue.city, Venue.state) \
+                   .order_by(Venue.city, Venue.state, Venue.id) \
+                   .all()
+  ans = []
+  for row in rows:
+      if not ans or ans[-1]['city'] != row.city or ans[-1]['state'] != row.state:
+          ans.append( {'city': row.city, 'state': row.state, 'venues': []} )
+      ans[-1]['venues'].append( {'id': row.id,
+                                 'name': row.name,
+                                 'num_upcoming_shows': row.num_upcoming_shows} )
+
+  return render_template('pages/venues.html', areas=ans);
+
+@route('/venues/search', methods=['POST'])
+def search_venues():
+  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # seach for Hop should return "The Musical Hop".
+  # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+  # done.
+  response = {}
+  search_term = request.form.get('search_term', '')
+  total, venues = search_entities(Venue, search_term)
+  upcoming = upcoming_show_counts(Show.venue_id, [venue.id for venue in venues])
+  data = []
+  for venue in venues:
+      data.append( {"id": venue.id, 
+                    'name': venue.name, 
+                    'num_upcoming_shows': upcoming.get(venue.id, 0)} )
+  response['count'] = total
+  response['data'] = data
+  return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+@route('/venues/<int:venue_id>')
+@page_cache.cached()
+def show_venue(venue_id):
+  # shows the venue page with the given venue_id
+  # TODO: replace with real venue data from the venues table, using venue_id
+  # done.
+  validators = detail_validators(Venue, Show.venue_id, Artist, Show.artist_id, venue_id)
+  if validators is None:
+      abort(404)
+
+  def render():
+      venue = venue_detail(venue_id)
+      label_start_times(venue['past_shows'], venue['upcoming_shows'])
+      return render_template('pages/show_venue.html', venue=venue)
+  return conditional_response(*validators, render=render)
+
+def venue_detail(venue_id):
+  # view-model of the venue page, shared with the JSON API.
+  # the venue and its genres take two queries; the shows come back as plain
+  # column rows in a third, in start_time order off the
+  # ix_shows_venue_id_start_time_artist_id index. hydrating Show/Artist objects for a
+  # busy venue's hundreds of shows cost more than everything else here.
+  venue = Venue.query.options(selectinload(Venue.genres)) \
+                     .filter_by(id=venue_id, deleted_at=None).first_or_404()
+  genres = [genre.name for genre in venue.genres]
+  data = {"id": venue.id,
+         "name": venue.name,
+         "genres": genres,
+         "address": venue.address,
+         "city": venue.city,
+         "state": venue.state,
+         "phone": venue.phone,
+         "website": venue.website_link,
+         "facebook_link": venue.facebook_link,
+         "seeking_talent": venue.seeking_talent,
+         "seeking_description": venue.seeking_description,
+         "image_link": venue.image_link,
+         "past_shows": [],
+         "upcoming_shows": [],
+         "past_shows_count": 0,
+         "upcoming_shows_count": 0,
+   }
+  # split past/upcoming in one pass against a single snapshot of now
+  now = datetime.now()
+  past_shows_list = []
+  future_shows_list = []
+  add_cache_tags('venue:%d' % venue.id)
+  shows = db.session.query(Show.id, Show.artist_id, Artist.name, Artist.image_link, Show.start_time,
+                           Show.updated_at, Artist.updated_at) \
+                    .join(Artist, Show.artist_id == Artist.id) \
+                    .filter(Show.venue_id == venue.id, Artist.deleted_at.is_(None)) \
+                    .order_by(Show.start_time)
+  # plain Core rows: the ORM's keyed tuples cost more than the page's SQL
+  rows = db.session.execute(shows.statement).fetchall()
+  add_cache_tags(*set('artist:%d' % row[1] for row in rows))
+  for show_id, artist_id, artist_name, artist_image_link, start_time, show_updated_at, artist_updated_at in rows:
+      # id and updated_at (of the show or its artist, whichever is newer) key the tile's fragment
+      entry = {'id': show_id, 'artist_id': artist_id, 'artist_name': artist_name, 'artist_image_link': artist_image_link ,'start_time': start_time,
+               'updated_at': max(show_updated_at, artist_updated_at)}
+      if start_time < now:
+          past_shows_list.append(entry)
+      else:
+          future_shows_list.append(entry)
+  data['past_shows'] = past_shows_list
+  data['upcoming_shows'] = future_shows_list
+  data['past_shows_count'] = len(past_shows_list)
+  data['upcoming_shows_count'] = len(future_shows_list)
+  return data
+
+#  Venue calendar
+#  ----------------------------------------------------------------
+
+def calendar_window():
+  # the [from, to) window of a calendar request. ?from= defaults to the first
+  # of this month and ?to= to a month after from; 400 when to isn't after
+  # from, the window spans more than CALENDAR_MAX_DAYS or a month after from
+  # is past year 9999
+  start = parse_date_arg('from')
+  if start is None:
+      start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+  try:
+      end = parse_date_arg('to') or start + relativedelta(months=1)
+  except (ValueError, OverflowError):
+      abort(400)
+  if end <= start or end - start > timedelta(days=current_app.config['CALENDAR_MAX_DAYS']):
+      abort(400)
+  return start, end
+
+def venue_calendar(venue_id, start, end, shows=True):
+  # view-model of the venue calendar, shared with the JSON API: the shows
+  # starting in [start, end) and how many there are on each day of it. both
+  # queries are a range scan of ix_shows_venue_id_start_time_artist_id, so
+  # years of history behind the window cost nothing, and the per-day counts
+  # are grouped in SQL straight off the index. the shows are only read when
+  # asked for; a month overview only needs the counts.
+  venue = db.session.query(Venue.id, Venue.name).filter(live(Venue, venue_id)).first()
+  if venue is None:
+      abort(404)
+  add_cache_tags('venue:%d' % venue.id)
+  in_window = and_(Show.venue_id == venue.id, Show.start_time >= start, Show.start_time < end,
+                   Artist.deleted_at.is_(None))
+  day = func.date(Show.start_time)
+  counts = db.session.query(day, func.count(Show.id)) \
+                     .join(Artist, Show.artist_id == Artist.id) \
+                     .filter(in_window) \
+                     .group_by(day) \
+                     .order_by(day)
+  # sqlite's date() is a string, postgres' a date
+  days = [{'date': date if isinstance(date, str) else date.isoformat(), 'count': count}
+          for date, count in counts]
+  data = {'id': venue.id, 'name': venue.name, 'from': start, 'to': end,
+          'days': days, 'shows': [], 'shows_count': sum(entry['count'] for entry in days)}
+  if not shows:
+      return data
+  rows = db.session.query(Show.id, Show.artist_id, Artist.name, Artist.image_link, Show.start_time,
+                          Show.updated_at, Artist.updated_at) \
+                   .join(Artist, Show.artist_id == Artist.id) \
+                   .filter(in_window) \
+                   .order_by(Show.start_time, Show.id)
+  for show_id, artist_id, artist_name, artist_image_link, start_time, show_updated_at, artist_updated_at in rows:
+      add_cache_tags('artist:%d' % artist_id)
+      data['shows'].append({'id': show_id, 'artist_id': artist_id, 'artist_name': artist_name,
+                            'artist_image_link': artist_image_link, 'start_time': start_time,
+                            'updated_at': max(show_updated_at, artist_updated_at)})
+  return data
+
+@route('/venues/<int:venue_id>/calendar')
+@page_cache.cached()
+def venue_calendar_page(venue_id):
+  # the venue's shows in a window (this month by default), day by day, with
+  # links to the month before and the one after; 400 for a window at the
+  # edge of the calendar (year 1 or 9999), which has no month to link to
+  start, end = calendar_window()
+  try:
+      prev_url = url_for('venue_calendar_page', venue_id=venue_id,
+                         **{'from': (start - relativedelta(months=1)).date().isoformat(),
+                            'to': start.date().isoformat()})
+      next_url = url_for('venue_calendar_page', venue_id=venue_id,
+                         **{'from': end.date().isoformat(),
+                            'to': (end + relativedelta(months=1)).date().isoformat()})
+  except (ValueError, OverflowError):
+      abort(400)
+  calendar = venue_calendar(venue_id, start, end)
+  label_start_times(calendar['shows'])
+  # the shows are in start_time order, so each day's are consecutive
+  shows = itertools.groupby(calendar['shows'], key=lambda show: show['start_time'].date().isoformat())
+  shows = dict((date, list(group)) for date, group in shows)
+  for entry in calendar['days']:
+      entry['shows'] = shows.get(entry['date'], [])
+  return render_template('pages/venue_calendar.html', calendar=calendar, prev_url=prev_url, next_url=next_url)
+
+#  Venue availability
+#  ----------------------------------------------------------------
+
+def availability_args():
+  # (city, state, start, end) of an availability search; 400 unless all four
+  # are given and to is after from, and for a from so close to year 1 that
+  # the overlap test can't look MAX_SHOW_DURATION back from it
+  city = request.args.get('city', '').strip()
+  state = request.args.get('state', '').strip()
+  start, end = parse_date_arg('from'), parse_date_arg('to')
+  if not (city and state and start and end) or end <= start \
+          or start < datetime.min + MAX_SHOW_DURATION:
+      abort(400)
+  return city, state, start, end
+
+def available_venues(columns, city, state, start, end, after, limit):
+  # up to limit + 1 venues of the area, in id order after `after`, with no
+  # show overlapping [start, end). the venues are read in order off
+  # ix_venues_live_city_state_id, and each one costs a single range lookup on
+  # the shows' (venue_id, start_time) index. the work grows with the venues
+  # looked at before the page is full, not with the shows the area has had.
+  busy = exists().where(Show.overlapping(Show.venue_id, Venue.id, start, end))
+  return db.session.query(Venue.id, *columns) \
+                   .filter(Venue.deleted_at.is_(None), Venue.city == city, Venue.state == state,
+                           Venue.id > after, ~busy) \
+                   .order_by(Venue.id) \
+                   .limit(limit + 1) \
+                   .all()
+
+@route('/venues/available')
+@page_cache.cached('shows', 'venues')
+def venues_available():
+  # the search form, and with ?city=&state=&from=&to= the venues that have
+  # nothing booked in that window; ?after=<id> pages on
+  if not request.args:
+      return render_template('pages/venues_available.html', venues=None, next_url=None)
+  city, state, start, end = availability_args()
+  per_page = current_app.config['SEARCH_RESULT_LIMIT']
+  rows = available_venues([Venue.name, Venue.address], city, state, start, end,
+                          request.args.get('after', 0, type=int), per_page)
+  next_url = None
+  if len(rows) > per_page:
+      rows = rows[:per_page]
+      next_url = url_for('venues_available', after=rows[-1].id,
+                         **dict((name, request.args[name]) for name in ('city', 'state', 'from', 'to')))
+  return render_template('pages/venues_available.html', venues=rows, next_url=next_url)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@route('/venues/create', methods=['GET'])
+def create_venue_form():
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+  # done.
+  try:      
+    venue = Venue(name = request.form['name'],
+                  city = request.form['city'],
+                  state = request.form['state'],
+                  address = request.form['address'],
+                  phone = request.form['phone'],
+                  image_link = request.form['image_link'],
+                  facebook_link = request.form['facebook_link'],
+                  genres = genres_from_names(request.form.getlist('genres')),
+                  website_link = request.form['website_link'],
+                  seeking_talent = request.form.get('seeking_talent') == 'y',
+                  seeking_description = request.form['seeking_description'] )
+    db.session.add(venue)
+    db.session.commit()          
+    page_cache.invalidate('venues')
+    # on successful db insert, flash success
+    flash('Venue ' + request.form['name'] + ' was successfully listed!')
+  except:
+    db.session.rollback()
+    flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+  finally:
+    db.session.close()
+  return render_template('pages/home.html')
+
+@route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  # TODO: Complete this endpoint for taking a venue_id, and using
+  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+  # done.
+  # soft delete: one UPDATE, however many shows the venue has; the purger
+  # deletes those in the background (see purger.py)
+  try:
+      if soft_delete(Venue, venue_id):
+          page_cache.invalidate('venues', 'venue:%s' % venue_id)
+          purger.wake()
+  except:
+      db.session.rollback()
+  finally:
+      db.session.close()
+
+  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+  # clicking that button delete it from the db then redirect the user to the homepage
+  # please check show_venue.html for details
+  return render_template('pages/home.html')
+
+#  Artists
+#  ----------------------------------------------------------------
+@route('/artists')
+@page_cache.cached('artists')
+def artists():
+  # TODO: replace with real data returned from querying the database
+  # done.
+  data = Artist.query.filter(Artist.deleted_at.is_(None)).all()
+  artists = []
+  for art in data:
+      artists.append( {'id': art.id, 'name': art.name} )
+  return render_template('pages/artists.html', artists=artists)
+
+@route('/artists/search', methods=['POST'])
+def search_artists():
+  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+  # search for "band" should return "The Wild Sax Band".
+  # done.
+  response = {}
+  search_term = request.form.get('search_term', '')
+  total, artists = search_entities(Artist, search_term)
+  upcoming = upcoming_show_counts(Show.artist_id, [artist.id for artist in artists])
+  data = []
+  for artist in artists:
+      data.append( {"id": artist.id, 
+                    'name': artist.name, 
+                    'num_upcoming_shows': upcoming.get(artist.id, 0)} )
+  response['count'] = total
+  response['data'] = data
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+@route('/artists/<int:artist_id>')
+@page_cache.cached()
+def show_artist(artist_id):
+  # shows the artist page with the given artist_id
+  # TODO: replace with real artist data from the artist table, using artist_id
+  # done.
+  validators = detail_validators(Artist, Show.artist_id, Venue, Show.venue_id, artist_id)
+  if validators is None:
+      abort(404)
+
+  def render():
+      artist = artist_detail(artist_id)
+      label_start_times(artist['past_shows'], artist['upcoming_shows'])
+      return render_template('pages/show_artist.html', artist=artist)
+  return conditional_response(*validators, render=render)
+
+def artist_detail(artist_id):
+  # view-model of the artist page, shared with the JSON API.
+  # same three queries as venue_detail: the artist, its genres, and its shows
+  # as column rows off ix_shows_artist_id_start_time
+  artist = Artist.query.options(selectinload(Artist.genres)) \
+                       .filter_by(id=artist_id, deleted_at=None).first_or_404()
+  genres = [genre.name for genre in artist.genres]
+  data = {"id": artist.id,
+         "name": artist.name,
+         "genres": genres,
+         "city": artist.city,
+         "state": artist.state,
+         "phone": artist.phone,
+         "website": artist.website_link,
+         "facebook_link": artist.facebook_link,
+         "seeking_venue": artist.seeking_venue,
+         "seeking_description": artist.seeking_description,
+         "image_link": artist.image_link,
+         "past_shows": [],
+         "upcoming_shows": [],
+         "past_shows_count": 0,
+         "upcoming_shows_count": 0,
+   }
+  
+  # split past/upcoming in one pass against a single snapshot of now
+  now = datetime.now()
+  past_shows_list = []
+  future_shows_list = []
+  add_cache_tags('artist:%d' % artist.id)
+  shows = db.session.query(Show.id, Show.venue_id, Venue.name, Venue.image_link, Show.start_time,
+                           Show.updated_at, Venue.updated_at) \
+                    .join(Venue, Show.venue_id == Venue.id) \
+                    .filter(Show.artist_id == artist.id, Venue.deleted_at.is_(None)) \
+                    .order_by(Show.start_time)
+  # plain Core rows: the ORM's keyed tuples cost more than the page's SQL
+  rows = db.session.execute(shows.statement).fetchall()
+  add_cache_tags(*set('venue:%d' % row[1] for row in rows))
+  for show_id, venue_id, venue_name, venue_image_link, start_time, show_updated_at, venue_updated_at in rows:
+      # id and updated_at (of the show or its venue, whichever is newer) key the tile's fragment
+      entry = {'id': show_id, 'venue_id': venue_id, 'venue_name': venue_name, 'venue_image_link': venue_image_link ,'start_time': start_time,
+               'updated_at': max(show_updated_at, venue_updated_at)}
+      if start_time < now:
+          past_shows_list.append(entry)
+      else:
+          future_shows_list.append(entry)
+  data['past_shows'] = past_shows_list
+  data['upcoming_shows'] = future_shows_list
+  data['past_shows_count'] = len(past_shows_list)
+  data['upcoming_shows_count'] = len(future_shows_list)
+  return data
+
+#  Update
+#  ----------------------------------------------------------------
+@route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  # TODO: populate form with fields from artist with ID <artist_id>
+  # done.
+  data = Artist.query.filter_by(id=artist_id, deleted_at=None).first_or_404()
+  artist={
+      "id": data.id,
+      "name": data.name,
+      "genres": [genre.name for genre in data.genres],
+      "city": data.city,
+      "state": data.state,
+      "phone": data.phone,
+      "website": data.website_link,
+      "facebook_link": data.facebook_link,
+      "seeking_venue": data.seeking_venue,
+      "seeking_description": data.seeking_description,
+      "image_link": data.image_link
+    }
+  form = ArtistForm(name=data.name,
+                    genres=artist['genres'],
+                    city=data.city,
+                    state=data.state,
+                    phone=data.phone,
+                    facebook_link=data.facebook_link,
+                    website_link=data.website_link,
+                    image_link=data.image_link,
+                    seeking_venue=data.seeking_venue,
+                    seeking_description=data.seeking_description)
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  # TODO: take values from the form submitted, and update existing
+  # artist record with ID <artist_id> using the new attributes
+  # done.
+  try:
+    artist = Artist.query.filter_by(id=artist_id, deleted_at=None).one()
+    artist.name = request.form['name']
+    artist.city =request.form['city']
+    artist.state = request.form['state']
+    artist.phone = request.form['phone']
+    artist.image_link = request.form['image_link']
+    artist.facebook_link = request.form['facebook_link']
+    artist.genres = genres_from_names(request.form.getlist('genres'))
+    artist.website_link = request.form['website_link']
+    artist.seeking_venue = request.form.get('seeking_venue') == 'y'
+    artist.seeking_description = request.form['seeking_description']
+    artist.updated_at = datetime.now()
+    db.session.commit()          
+    page_cache.invalidate('artists', 'artist:%d' % artist_id)
+    # on successful db insert, flash success
+    flash('Aritst ' + str(artist_id) + ' was successfully updated!')
+  except:
+    db.session.rollback()
+    flash('An error occurred. Artist ' + str(artist_id) + ' could not be updated.')
+  finally:
+    db.session.close()
+  return redirect(url_for('show_artist', artist_id=artist_id))
+
+@route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  # TODO: populate form with values from venue with ID <venue_id>
+  # done.
+  data = Venue.query.filter_by(id=venue_id, deleted_at=None).first_or_404()
+  venue={
+    "id": data.id,
+    "name": data.name,
+    "genres": [genre.name for genre in data.genres],
+    "address": data.address,
+    "city": data.city,
+    "state": data.state,
+    "phone": data.phone,
+    "website": data.website_link,
+    "facebook_link": data.facebook_link,
+    "seeking_talent": data.seeking_talent,
+    "seeking_description": data.seeking_description,
+    "image_link": data.image_link
+  }
+  form = VenueForm( name=data.name,
+                    genres=venue['genres'],
+                    city=data.city,
+                    state=data.state,
+                    address=data.address,
+                    phone=data.phone,
+                    facebook_link=data.facebook_link,
+                    website_link=data.website_link,
+                    image_link=data.image_link,
+                    seeking_talent=data.seeking_talent,
+                    seeking_description=data.seeking_description)
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  # TODO: take values from the form submitted, and update existing
+  # venue record with ID <venue_id> using the new attributes
+  # done.
+  try:
+    venue = Venue.query.filter_by(id=venue_id, deleted_at=None).one()
+    venue.name = request.form['name']
+    venue.city =request.form['city']
+    venue.state = request.form['state']
+    venue.address = request.form['address']
+    venue.phone = request.form['phone']
+    venue.image_link = request.form['image_link']
+    venue.facebook_link = request.form['facebook_link']
+    venue.genres = genres_from_names(request.form.getlist('genres'))
+    venue.website_link = request.form['website_link']
+    venue.seeking_talent = request.form.get('seeking_talent') == 'y'
+    venue.seeking_description = request.form['seeking_description']
+    venue.updated_at = datetime.now()
+    db.session.commit()          
+    page_cache.invalidate('venues', 'venue:%d' % venue_id)
+    # on successful db insert, flash success
+    flash('Venue ' + str(venue_id) + ' was successfully updated!')
+  except:
+    db.session.rollback()
+    flash('An error occurred. Venue ' + str(venue_id) + ' could not be updated.')
+  finally:
+    db.session.close()
+  return redirect(url_for('show_venue', venue_id=venue_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@route('/artists/create', methods=['GET'])
+def create_artist_form():
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  # called upon submitting the new artist listing form
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+
+  try:      
+    artist = Artist(name = request.form['name'],
+                    city = request.form['city'],
+                    state = request.form['state'],
+                    phone = request.form['phone'],
+                    image_link = request.form['image_link'],
+                    facebook_link = request.form['facebook_link'],
+                    genres = genres_from_names(request.form.getlist('genres')),
+                    website_link = request.form['website_link'],
+                    seeking_venue = request.form.get('seeking_venue') == 'y',
+                    seeking_description = request.form['seeking_description'] )
+    db.session.add(artist)
+    db.session.commit()          
+    page_cache.invalidate('artists')
+    # # on successful db insert, flash success
+    flash('Artist ' + request.form['name'] + ' was successfully listed!')
+  except:
+    db.session.rollback()
+    flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+  finally:
+    db.session.close()
+  return render_template('pages/home.html')
+
+@route('/artists/<artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+  # same soft delete as delete_venue
+  try:
+      if soft_delete(Artist, artist_id):
+          page_cache.invalidate('artists', 'artist:%s' % artist_id)
+          purger.wake()
+  except:
+      db.session.rollback()
+  finally:
+      db.session.close()
+  return render_template('pages/home.html')
+
+
+#  Genres
+#  ----------------------------------------------------------------
+
+@route('/genres/<name>')
+def show_genre(name):
+  # artists and venues tagged with a genre, through the genre_id indexes
+  # on the association tables
+  genre = Genre.query.filter_by(name=name).first_or_404()
+  artists = db.session.query(Artist.id, Artist.name) \
+                      .join(artist_genres, artist_genres.c.artist_id == Artist.id) \
+                      .filter(artist_genres.c.genre_id == genre.id, Artist.deleted_at.is_(None)) \
+                      .order_by(Artist.name) \
+                      .all()
+  venues = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state) \
+                     .join(venue_genres, venue_genres.c.venue_id == Venue.id) \
+                     .filter(venue_genres.c.genre_id == genre.id, Venue.deleted_at.is_(None)) \
+                     .order_by(Venue.name) \
+                     .all()
+  return render_template('pages/show_genre.html', genre=genre.name, artists=artists, venues=venues)
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+def encode_show_cursor(start_time, show_id):
+  # keyset cursor for the /shows feed: the (start_time, id) of a boundary row
+  return '%s_%d' % (start_time.strftime('%Y%m%dT%H%M%S%f'), show_id)
+
+def decode_show_cursor(cursor):
+  try:
+      start_time, show_id = cursor.rsplit('_', 1)
+      return datetime.strptime(start_time, '%Y%m%dT%H%M%S%f'), int(show_id)
+  except ValueError:
+      abort(400)
+
+def parse_date_arg(name):
+  # the ?name= date/time, naive like the stored times: one with an offset
+  # (2030-01-01T00:00Z) is converted to UTC. None if not given; 400 if it
+  # doesn't parse
+  value = request.args.get(name)
+  if not value:
+      return None
+  try:
+      value = dateutil.parser.parse(value)
+      if value.tzinfo is not None:
+          value = value.astimezone(timezone.utc).replace(tzinfo=None)
+      return value
+  except (ValueError, OverflowError):
+      abort(400)
+
+def show_rows():
+  # shows with their venue and artist columns, in one SELECT
+  return db.session.query(Show.id, Show.start_time, Show.end_time,
+                          Show.venue_id, Venue.name.label('venue_name'),
+                          Show.artist_id, Artist.name.label('artist_name'),
+                          Artist.image_link.label('artist_image_link'),
+                          Show.updated_at, Venue.updated_at.label('venue_updated_at'),
+                          Artist.updated_at.label('artist_updated_at')) \
+                   .join(Venue, Show.venue_id == Venue.id) \
+                   .join(Artist, Show.artist_id == Artist.id) \
+                   .filter(Venue.deleted_at.is_(None), Artist.deleted_at.is_(None))
+
+# shows_page() runs on every /shows and /api/v1/shows request, in a handful
+# of shapes (window filters, paging direction, page size). baked, its Query
+# is built and its SQL compiled once per shape; the request's values go in as
+# parameters, so the lambdas below must not capture any of them
+shows_bakery = baked.bakery()
+
+def shows_page(per_page):
+  # one keyset page on (start_time, id) for the request's arguments:
+  # ?after=<cursor> pages forward, ?before=<cursor> pages back, ?upcoming=1
+  # and ?from=/&to= narrow the window. artist and venue columns come back in
+  # the same SELECT. returns (rows, filters, prev_cursor, next_cursor) where
+  # filters are the arguments to carry over into the prev/next links.
+  after = request.args.get('after')
+  before = request.args.get('before')
+  filters = {}
+  params = {}
+  query = shows_bakery(lambda session: show_rows())
+  if request.args.get('upcoming'):
+      filters['upcoming'] = 1
+      params['now'] = datetime.now()
+      query += lambda q: q.filter(Show.start_time > bindparam('now'))
+  date_from = parse_date_arg('from')
+  if date_from:
+      filters['from'] = request.args['from']
+      params['date_from'] = date_from
+      query += lambda q: q.filter(Show.start_time >= bindparam('date_from'))
+  date_to = parse_date_arg('to')
+  if date_to:
+      filters['to'] = request.args['to']
+      params['date_to'] = date_to
+      query += lambda q: q.filter(Show.start_time < bindparam('date_to'))
+
+  if before or after:
+      params['cursor_start'], params['cursor_id'] = decode_show_cursor(before or after)
+  if before:
+      query += lambda q: q.filter(tuple_(Show.start_time, Show.id) < show_cursor_params()) \
+                          .order_by(Show.start_time.desc(), Show.id.desc())
+  else:
+      if after:
+          query += lambda q: q.filter(tuple_(Show.start_time, Show.id) > show_cursor_params())
+      query += lambda q: q.order_by(Show.start_time, Show.id)
+  # one extra row tells us whether there is another page in that direction;
+  # the page size is part of the cache key
+  query.add_criteria(lambda q: q.limit(per_page + 1), per_page)
+  rows = query(db.session()).params(**params).all()
+  has_more = len(rows) > per_page
+  rows = rows[:per_page]
+  if before:
+      rows.reverse()
+
+  prev_cursor = next_cursor = None
+  if rows:
+      if (before and has_more) or after:
+          prev_cursor = encode_show_cursor(rows[0].start_time, rows[0].id)
+      if (not before and has_more) or before:
+          next_cursor = encode_show_cursor(rows[-1].start_time, rows[-1].id)
+  return rows, filters, prev_cursor, next_cursor
+
+def show_cursor_params():
+  # the (start_time, id) cursor of shows_page(), as bound parameters
+  return tuple_(bindparam('cursor_start', type_=Show.start_time.type),
+                bindparam('cursor_id', type_=Show.id.type))
+
+@route('/shows')
+@page_cache.cached('shows')
+def shows():
+  # displays list of shows at /shows
+  # TODO: replace with real venues data.
+  # done.
+  rows, filters, prev_cursor, next_cursor = shows_page(current_app.config['SHOWS_PER_PAGE'])
+  data = []
+  for row in rows:
+      add_cache_tags('venue:%d' % row.venue_id, 'artist:%d' % row.artist_id)
+      data.append( {"id": row.id,
+                    "venue_id": row.venue_id,
+                    "venue_name": row.venue_name,
+                    "artist_id": row.artist_id,
+                    "artist_name": row.artist_name,
+                    "artist_image_link": row.artist_image_link,
+                    "start_time": row.start_time,
+                    "updated_at": max(row.updated_at, row.venue_updated_at, row.artist_updated_at)} )
+  prev_url = prev_cursor and url_for('shows', before=prev_cursor, **filters)
+  next_url = next_cursor and url_for('shows', after=next_cursor, **filters)
+
+  # validators come from the page rows themselves, so a 304 skips rendering
+  parts = [request.full_path, prev_cursor, next_cursor]
+  for row in rows:
+      parts.extend([row.id, row.updated_at, row.venue_updated_at, row.artist_updated_at])
+  etag, last_modified = page_validators(*parts)
+
+  def render():
+      label_start_times(data)
+      return render_template('pages/shows.html', shows=data, prev_url=prev_url, next_url=next_url)
+  return conditional_response(etag, last_modified, render=render)
+
+@route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@route('/shows/create', methods=['POST'])
+def create_show_submission():
+  # called to create new shows in the db, upon submitting new show listing form
+  # TODO: insert form data as a new Show record in the db, instead
+  # done.
+  try:
+      start_time = dateutil.parser.parse(request.form['start_time'])
+      duration = timedelta(minutes=int(request.form.get('duration') or DEFAULT_SHOW_DURATION.total_seconds() // 60))
+      if not timedelta(0) < duration <= MAX_SHOW_DURATION:
+          raise ValueError('duration out of range')
+      show = Show( artist_id  = int(request.form['artist_id']),
+                 venue_id   = int(request.form['venue_id']),
+                 start_time = start_time,
+                 end_time   = start_time + duration )
+      # the foreign keys don't catch a deleted venue or artist, whose shows
+      # the purger may already have passed over. the rows are also locked
+      # (FOR UPDATE, venue first, then artist, as `flask import` does) so
+      # bookings of the same venue or artist run one at a time: the overlap
+      # probe below is a new statement, which sees a show committed by a
+      # booking we waited for. sqlite has no row locks and ignores this
+      if lock_live(Venue, [show.venue_id]) != [show.venue_id] \
+              or lock_live(Artist, [show.artist_id]) != [show.artist_id]:
+          raise ValueError('deleted venue or artist')
+      # range scans of the per-venue and per-artist start_time indexes, in
+      # one query
+      venue_busy, artist_busy = db.session.query(
+          exists().where(Show.overlapping(Show.venue_id, show.venue_id, show.start_time, show.end_time)),
+          exists().where(Show.overlapping(Show.artist_id, show.artist_id, show.start_time, show.end_time))).one()
+      if venue_busy or artist_busy:
+          flash('Show could not be listed: the %s already has a show at that time.'
+                % ('venue' if venue_busy else 'artist'))
+          return render_template('pages/home.html')
+      db.session.add(show)
+      db.session.commit()          
+      page_cache.invalidate('shows', 'venues', 'venue:%s' % show.venue_id, 'artist:%s' % show.artist_id)
+      # on successful db insert, flash success
+      flash('Show was successfully listed!')
+  except:
+      db.session.rollback()
+      flash('An error occurred. Show could not be listed.')
+  finally:
+      db.session.close()
+  return render_template('pages/home.html')
+
+#  Export
+#  ----------------------------------------------------------------
+
+EXPORT_COLUMNS = {
+  'venues': ['id', 'name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+             'website_link', 'seeking_talent', 'seeking_description', 'genres',
+             'created_at', 'updated_at', 'deleted_at'],
+  'artists': ['id', 'name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+              'website_link', 'seeking_venue', 'seeking_description', 'genres',
+              'created_at', 'updated_at', 'deleted_at'],
+  'shows': ['id', 'start_time', 'end_time', 'venue_id', 'venue_name', 'artist_id', 'artist_name',
+            'created_at', 'updated_at', 'deleted_at'],
+}
+
+def export_query(kind, since, after):
+  # rows ordered by (updated_at, id) -- the ix_*_updated_at_id indexes serve
+  # both the cursor and the order. the cursor is the (updated_at, id) of the
+  # last row a client got, as ?since=&after=: updated_at isn't unique, so a
+  # strict updated_at > since would skip the rest of a run of equal
+  # timestamps. without after= rows at since itself are repeated
+  if kind == 'shows':
+      model = Show
+      query = db.session.query(Show.id, Show.start_time, Show.end_time,
+                               Show.venue_id, Venue.name.label('venue_name'),
+                               Show.artist_id, Artist.name.label('artist_name'),
+                               Show.created_at, Show.updated_at, db.null().label('deleted_at')) \
+                        .join(Venue, Show.venue_id == Venue.id) \
+                        .join(Artist, Show.artist_id == Artist.id) \
+                        .filter(Venue.deleted_at.is_(None), Artist.deleted_at.is_(None))
+  else:
+      model = Venue if kind == 'venues' else Artist
+      query = db.session.query(*[getattr(model, column) for column in EXPORT_COLUMNS[kind]
+                                 if column != 'genres'])
+  if since:
+      query = query.filter(model.updated_at >= since)
+      if after is not None:
+          query = query.filter(db.or_(model.updated_at > since, model.id > after))
+  return query.order_by(model.updated_at, model.id)
+
+def export_tombstones(since):
+  # the shows feed leaves out the shows of deleted venues and artists, and
+  # the purger deletes them. one row per venue/artist deleted at or after
+  # since stands for all of them: only venue_id or artist_id is set, with
+  # its deleted_at. both come from one UNION ALL
+  queries = []
+  for model in (Venue, Artist):
+      venue = model is Venue
+      query = db.session.query(model.id if venue else db.null(), model.name if venue else db.null(),
+                               db.null() if venue else model.id, db.null() if venue else model.name,
+                               model.updated_at, model.deleted_at) \
+                        .filter(model.deleted_at.isnot(None))
+      if since:
+          query = query.filter(model.deleted_at >= since)
+      queries.append(query)
+  tombstones = []
+  for venue_id, venue_name, artist_id, artist_name, updated_at, deleted_at in queries[0].union_all(queries[1]):
+      row = dict((column, None) for column in EXPORT_COLUMNS['shows'])
+      row.update(venue_id=venue_id, venue_name=venue_name, artist_id=artist_id, artist_name=artist_name,
+                 updated_at=updated_at, deleted_at=deleted_at)
+      tombstones.append(row)
+  return sorted(tombstones, key=lambda row: row['deleted_at'])
+
+def genre_names(kind, ids):
+  # {owner id: [genre names]} for a batch of venues or artists, in one query.
+  # the ids go in as one expanding parameter: a literal IN list of a
+  # thousand ids costs more to build and compile than the query takes to run
+  association = venue_genres if kind == 'venues' else artist_genres
+  key = association.c.venue_id if kind == 'venues' else association.c.artist_id
+  genres = {}
+  rows = db.session.query(key, Genre.name) \
+                   .join(Genre, Genre.id == association.c.genre_id) \
+                   .filter(key.in_(bindparam('ids', expanding=True))) \
+                   .order_by(Genre.name) \
+                   .params(ids=list(ids))
+  for owner_id, name in rows:
+      genres.setdefault(owner_id, []).append(name)
+  return genres
+
+def export_batches(kind, since, after):
+  # batches of row dicts read through a server-side cursor, so memory stays
+  # flat whatever the table size. the shows feed starts with the tombstones,
+  # so its last row is still a show to take the next cursor from
+  batch_size = current_app.config['EXPORT_BATCH_SIZE']
+  if kind == 'shows':
+      tombstones = export_tombstones(since)
+      for start in range(0, len(tombstones), batch_size):
+          yield tombstones[start:start + batch_size]
+  rows = export_query(kind, since, after).execution_options(stream_results=True).yield_per(batch_size)
+  rows = iter(rows)
+  while True:
+      batch = [row._asdict() for row in itertools.islice(rows, batch_size)]
+      if not batch:
+          return
+      if kind != 'shows':
+          genres = genre_names(kind, [row['id'] for row in batch])
+          for row in batch:
+              row['genres'] = ';'.join(genres.get(row['id'], []))
+      yield batch
+
+def export_value(value):
+  return value.isoformat() if isinstance(value, datetime) else value
+
+@route('/export/<any(venues, artists, shows):kind>')
+def export(kind):
+  # streams the whole catalog (or the rows past the ?since=&after= cursor) as
+  # CSV or, with ?format=ndjson, as one JSON object per line
+  fmt = request.args.get('format', 'csv')
+  if fmt not in ('csv', 'ndjson'):
+      abort(400)
+  since = parse_date_arg('since')
+  after = request.args.get('after', type=int)
+  columns = EXPORT_COLUMNS[kind]
+
+  def generate():
+      buffer = io.StringIO()
+      writer = csv.writer(buffer)
+      if fmt == 'csv':
+          writer.writerow(columns)
+      for batch in export_batches(kind, since, after):
+          for row in batch:
+              if fmt == 'csv':
+                  writer.writerow([export_value(row[column]) for column in columns])
+              else:
+                  buffer.write(json.dumps(dict((column, export_value(row[column])) for column in columns)))
+                  buffer.write('\n')
+          yield buffer.getvalue()
+          buffer.seek(0)
+          buffer.truncate()
+      yield buffer.getvalue()
+
+  mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+  response = Response(stream_with_context(generate()), mimetype=mimetype)
+  response.headers['Content-Disposition'] = 'attachment; filename=%s.%s' % (kind, 'csv' if fmt == 'csv' else 'ndjson')
+  return response
+
+
+#  Metrics
+#  ----------------------------------------------------------------
+
+@route('/_cache/stats')
+def cache_stats():
+  # hit/miss/eviction counters for sizing CACHE_MAX_ENTRIES / CACHE_TTL
+  return jsonify(page_cache.stats())
+
+@route('/_metrics')
+def metrics():
+  # per-endpoint SQL aggregates and pool checkout waits since the worker started
+  return jsonify({'endpoints': sql_metrics.metrics(), 'cache': page_cache.stats(),
+                  'pool': db.pool_report(), 'fragments': template_cache.stats(),
+                  'thumbnails': thumbnails.stats(), 'purger': purger.stats()})
+
+def api_error(status, message):
+    # imported here: api imports this module
+    from api import api_response
+    return api_response({'error': message}, status)
+
+def bad_request_error(error):
+    if request.path.startswith('/api/'):
+        return api_error(400, 'bad request')
+    return error
+
+def not_found_error(error):
+    if request.path.startswith('/api/'):
+        return api_error(404, 'not found')
+    return render_template('errors/404.html'), 404
+
+def server_error(error):
+    if request.path.startswith('/api/'):
+        return api_error(500, 'internal server error')
+    return render_template('errors/500.html'), 500
+
+
+def init_app(app):
+  route.register(app)
+  app.jinja_env.filters['datetime'] = format_datetime
+  app.register_error_handler(400, bad_request_error)
+  app.register_error_handler(404, not_found_error)
+  app.register_error_handler(500, server_error)